@@ -289,8 +289,12 @@ async function sendTransaction(recipientAddress, amount) {
             throw new Error('Amount must be a positive number');
         }
 
+        // One key per transfer: retries of this request are replayed, not re-sent
         const response = await fetchWithAuth('/send/', {
             method: 'POST',
+            headers: {
+                'Idempotency-Key': crypto.randomUUID()
+            },
             body: JSON.stringify({
                 recipient: recipientAddress,
                 amount: numAmount
@@ -2,6 +2,19 @@ const API_URL = 'http://localhost:8000';
 let allReports = [];
 let currentReportId = null;
 let currentFilter = 'all';
+let nextCursor = null;   // next (older) page of the current listing
+let syncCursor = null;   // position of the latest change we have seen
+const PAGE_SIZE = 100;
+const SYNC_PAGE_SIZE = 500;
+const REPORT_TYPES = {
+    tax_payment: { label: 'Tax Payment', badge: 'bg-purple-100 text-purple-800' },
+    citizen_portal: { label: 'Citizen Portal', badge: 'bg-green-100 text-green-800' },
+    automated: { label: 'Automated', badge: 'bg-red-100 text-red-800' }
+};
+
+function reportType(report) {
+    return REPORT_TYPES[report.report_type] || REPORT_TYPES.citizen_portal;
+}
 
 // Load reports on page load
 window.addEventListener('DOMContentLoaded', () => {
@@ -13,36 +26,54 @@ window.addEventListener('DOMContentLoaded', () => {
     loadReports();
 });
 
-async function loadReports() {
+async function fetchReports(params) {
     const token = localStorage.getItem('access_token');
-    
-    try {
-        const response = await fetch(`${API_URL}/reports`, {
-            headers: {
-                'Authorization': `Bearer ${token}`
-            }
-        });
+    const response = await fetch(`${API_URL}/reports?${new URLSearchParams(params)}`, {
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    });
 
-        if (!response.ok) {
-            if (response.status === 403) {
-                alert('Access Denied: Only Finance Office can access reports');
-                window.location.href = 'index.html';
-                return;
-            }
-            throw new Error('Failed to load reports');
+    if (!response.ok) {
+        if (response.status === 403) {
+            alert('Access Denied: Only Finance Office can access reports');
+            window.location.href = 'index.html';
         }
+        throw new Error('Failed to load reports');
+    }
+    return response.json();
+}
 
-        const data = await response.json();
+function listingParams(extra = {}) {
+    const params = { limit: PAGE_SIZE, ...extra };
+    if (currentFilter !== 'all') {
+        params.status = currentFilter;
+    }
+    return params;
+}
+
+function updateStatistics(data) {
+    document.getElementById('totalReports').textContent = data.total_reports;
+    document.getElementById('pendingReports').textContent = data.pending_count;
+    document.getElementById('reviewedReports').textContent = data.reviewed_count;
+    document.getElementById('resolvedReports').textContent = data.resolved_count;
+}
+
+function updateLoadMoreButton() {
+    document.getElementById('loadMoreReports').classList.toggle('hidden', !nextCursor);
+}
+
+// First page of the current filter; also resets the polling position
+async function loadReports() {
+    try {
+        const data = await fetchReports(listingParams());
         allReports = data.reports;
-        
-        // Update statistics
-        document.getElementById('totalReports').textContent = data.total_reports;
-        document.getElementById('pendingReports').textContent = data.pending_count;
-        document.getElementById('reviewedReports').textContent = data.reviewed_count;
-        document.getElementById('resolvedReports').textContent = data.resolved_count;
-        
-        // Display reports
+        nextCursor = data.next_cursor;
+        syncCursor = data.sync_cursor;
+
+        updateStatistics(data);
         displayReports(allReports);
+        updateLoadMoreButton();
     } catch (error) {
         console.error('Error loading reports:', error);
         document.getElementById('reportsTable').innerHTML = `
@@ -56,6 +87,69 @@ async function loadReports() {
     }
 }
 
+async function loadMoreReports() {
+    if (!nextCursor) return;
+
+    try {
+        const data = await fetchReports(listingParams({ cursor: nextCursor }));
+        allReports = allReports.concat(data.reports.filter(r => !allReports.some(loaded => loaded.id === r.id)));
+        nextCursor = data.next_cursor;
+
+        updateStatistics(data);
+        displayReports(allReports);
+        updateLoadMoreButton();
+    } catch (error) {
+        console.error('Error loading more reports:', error);
+    }
+}
+
+function newestFirst(a, b) {
+    return b.created_at.localeCompare(a.created_at) || b.id - a.id;
+}
+
+// Merge a report that was created or changed into the loaded list
+function applyChange(report) {
+    const index = allReports.findIndex(r => r.id === report.id);
+    const matches = currentFilter === 'all' || report.status === currentFilter;
+
+    if (index !== -1) {
+        if (matches) {
+            allReports[index] = report;
+        } else {
+            allReports.splice(index, 1);
+        }
+        return;
+    }
+
+    // Reports older than the loaded pages arrive with "Load more"
+    const oldestLoaded = allReports[allReports.length - 1];
+    if (matches && (!nextCursor || !oldestLoaded || newestFirst(report, oldestLoaded) < 0)) {
+        allReports.push(report);
+        allReports.sort(newestFirst);
+    }
+}
+
+// Fetch only what changed since the last load or poll
+async function pollReports() {
+    if (!syncCursor) {
+        return loadReports();
+    }
+
+    try {
+        let data;
+        do {
+            data = await fetchReports({ updated_after: syncCursor, limit: SYNC_PAGE_SIZE });
+            data.reports.forEach(applyChange);
+            syncCursor = data.sync_cursor;
+        } while (data.reports.length === SYNC_PAGE_SIZE);
+
+        updateStatistics(data);
+        displayReports(allReports);
+    } catch (error) {
+        console.error('Error refreshing reports:', error);
+    }
+}
+
 function displayReports(reports) {
     const tableBody = document.getElementById('reportsTable');
     
@@ -76,8 +170,8 @@ function displayReports(reports) {
             <td class="px-6 py-4 text-sm font-medium text-gray-900">#${report.id}</td>
             <td class="px-6 py-4 text-sm text-gray-600">${formatDate(report.created_at)}</td>
             <td class="px-6 py-4 text-sm">
-                <span class="px-2 py-1 rounded-full text-xs font-semibold ${report.report_type === 'tax_payment' ? 'bg-purple-100 text-purple-800' : 'bg-green-100 text-green-800'}">
-                    ${report.report_type === 'tax_payment' ? 'Tax Payment' : 'Citizen Portal'}
+                <span class="px-2 py-1 rounded-full text-xs font-semibold ${reportType(report).badge}">
+                    ${reportType(report).label}
                 </span>
             </td>
             <td class="px-6 py-4 text-sm text-gray-900">${report.reported_by}</td>
@@ -119,12 +213,8 @@ function filterReports(status) {
         }
     });
     
-    // Filter reports
-    const filtered = status === 'all' 
-        ? allReports 
-        : allReports.filter(r => r.status === status);
-    
-    displayReports(filtered);
+    // Filtering happens on the server so pages and counts stay exact
+    loadReports();
 }
 
 function viewReport(reportId) {
@@ -146,7 +236,7 @@ function viewReport(reportId) {
                 </div>
                 <div>
                     <p class="text-sm text-gray-500">Report Type</p>
-                    <p class="font-semibold">${report.report_type === 'tax_payment' ? 'Tax Payment' : 'Citizen Portal'}</p>
+                    <p class="font-semibold">${reportType(report).label}</p>
                 </div>
                 <div>
                     <p class="text-sm text-gray-500">Status</p>
@@ -253,12 +343,12 @@ async function updateReport() {
 
         alert('Report updated successfully!');
         closeReportModal();
-        loadReports(); // Reload reports
+        pollReports(); // Pick up the change
     } catch (error) {
         console.error('Error updating report:', error);
         alert('Failed to update report. Please try again.');
     }
 }
 
-// Auto-refresh every 30 seconds
-setInterval(loadReports, 30000);
+// Poll for new or changed reports every 30 seconds
+setInterval(pollReports, 30000);
@@ -0,0 +1,222 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Activity log
+class ActivityLog:
+    """Append-only JSONL activity log with size-based rotation.
+
+    Callers only enqueue entries; a background thread appends them to the
+    active file in batches. When the active file grows past `max_bytes` it is
+    renamed to `<path>.<seq>` and a fresh file is started, keeping at most
+    `backup_count` rotated segments.
+
+    Readers page through the log with a cursor of the form "<seq>:<offset>"
+    (segment number and byte offset), so a page never needs more than `limit`
+    entries in memory. Lines that are not valid JSON are skipped and counted
+    in `corrupt_lines`.
+    """
+
+    def __init__(self, path: str = "activity_log.jsonl", max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 10, batch_size: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()  # guards rotation against readers
+        self.corrupt_lines = 0
+        self._seq = self._next_seq()
+        self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---- Writing ----
+
+    def log(self, entry: Dict[str, Any]):
+        """Queue an entry for writing; never touches the disk on the caller's thread."""
+        self._queue.put(entry)
+
+    def close(self):
+        """Flush everything queued so far and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry) + "\n" for entry in batch)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+                size = f.tell()
+            if size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        os.replace(self.path, self._segment_path(self._seq))
+        self._seq += 1
+        stale = self._segment_seqs()[:-self.backup_count] if self.backup_count else self._segment_seqs()
+        for seq in stale:
+            try:
+                os.remove(self._segment_path(seq))
+            except FileNotFoundError:
+                pass
+
+    # ---- Segments ----
+
+    def _segment_path(self, seq: int) -> str:
+        return f"{self.path}.{seq:06d}"
+
+    def _segment_seqs(self) -> List[int]:
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        seqs = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                seqs.append(int(name[len(prefix):]))
+        return sorted(seqs)
+
+    def _next_seq(self) -> int:
+        seqs = self._segment_seqs()
+        return seqs[-1] + 1 if seqs else 1
+
+    def _next_segment(self, after: int) -> Optional[int]:
+        """The first segment after `after` (the active file's seq last), or None."""
+        with self._lock:
+            later = [s for s in self._segment_seqs() if s > after]
+            if later:
+                return later[0]
+            return self._seq if self._seq > after else None
+
+    def _open_segment(self, seq: int):
+        """Open segment `seq`, or None if it was removed.
+
+        Opened under the rotation lock: the handle stays on the same file
+        even if the log rotates while it is being read, so an offset from a
+        cursor always refers to the file it was taken in.
+        """
+        with self._lock:
+            path = self.path if seq == self._seq else self._segment_path(seq)
+            try:
+                return open(path, "rb"), path == self.path
+            except FileNotFoundError:
+                return None, False
+
+    @staticmethod
+    def _last_timestamp(path: str) -> Optional[str]:
+        """Timestamp of the final entry in a segment, read from the file tail."""
+        try:
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                f.seek(max(0, end - 4096))
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        for line in reversed(lines):
+            try:
+                return json.loads(line).get("timestamp")
+            except ValueError:
+                continue
+        return None
+
+    # ---- Reading ----
+
+    def read(self, username: Optional[str] = None, since: Optional[str] = None,
+             until: Optional[str] = None, cursor: Optional[str] = None,
+             limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return up to `limit` entries in chronological order plus the next cursor.
+
+        `since` and `until` are ISO-8601 timestamps compared against each
+        entry's "timestamp". Rotated segments that end before `since` are
+        skipped without being scanned. Raises ValueError for a cursor this
+        log did not hand out.
+        """
+        start_seq, start_offset = 0, 0
+        if cursor:
+            seq_part, _, offset_part = cursor.partition(":")
+            try:
+                start_seq, start_offset = int(seq_part), int(offset_part or 0)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+            if start_seq < 0 or start_offset < 0:
+                raise ValueError(f"Invalid cursor: {cursor!r}")
+
+        entries: List[Dict[str, Any]] = []
+        seq = start_seq if start_seq else self._next_segment(0)
+        first = True
+        while seq is not None:
+            offset = start_offset if first and seq == start_seq else 0
+            first = False
+            f, active = self._open_segment(seq)
+            if f is None:
+                seq = self._next_segment(seq)
+                continue  # rotated away or not created yet
+            if since and not active:
+                last = self._last_timestamp(f.name)
+                if last is not None and last < since:
+                    f.close()
+                    seq = self._next_segment(seq)
+                    continue
+            with f:
+                if offset:
+                    # A cursor always points just past a newline
+                    f.seek(offset - 1)
+                    if f.read(1) != b"\n":
+                        raise ValueError(f"Invalid cursor: {cursor!r}")
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # entry still being written
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        self.corrupt_lines += 1
+                        continue
+                    if not isinstance(entry, dict):
+                        self.corrupt_lines += 1
+                        continue
+                    timestamp = entry.get("timestamp", "")
+                    if until and timestamp > until:
+                        return entries, None
+                    if since and timestamp < since:
+                        continue
+                    if username and entry.get("username") != username:
+                        continue
+                    entries.append(entry)
+                    if len(entries) >= limit:
+                        return entries, f"{seq}:{offset}"
+            seq = self._next_segment(seq)
+        return entries, None
+
+    def migrate_legacy(self, legacy_path: str):
+        """Append entries from an old JSON-array log once, then set it aside."""
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r") as f:
+                logs = json.load(f)
+        except ValueError:
+            logs = []
+        if logs:
+            self._write(logs)
+        os.replace(legacy_path, legacy_path + ".migrated")
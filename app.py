@@ -1,12 +1,15 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from typing import Optional, Dict
 from datetime import datetime, timedelta
-import json
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 from gok import Blockchain, TransactionType
+from activity_log import ActivityLog
 
 # Initialize FastAPI app
 app = FastAPI(title="Government Blockchain API")
@@ -16,18 +19,27 @@ SECRET_KEY = "your-secret-key-here"  # Change this to a secure secret key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (bcrypt runs on a small bounded pool, never on the event loop)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASHING_MAX_PENDING = int(os.getenv("HASHING_MAX_PENDING", "64"))  # queued + running jobs
+hashing_executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix="hashing")
+hashing_pending = 0  # only touched on the event loop
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Initialize blockchain
-blockchain = Blockchain(save_file="blockchain.json")
+# Initialize blockchain; validator reputations are written at least this often
+VALIDATOR_FLUSH_SECONDS = float(os.getenv("VALIDATOR_FLUSH_SECONDS", "30"))
+blockchain = Blockchain(save_file="blockchain.json", validator_flush_interval=VALIDATOR_FLUSH_SECONDS)
 
 # User database (replace with actual database in production)
 users_db = {}
 
-# Activity log file
-ACTIVITY_LOG_FILE = "activity_log.json"
+# Activity log (append-only JSONL, written by a background thread)
+ACTIVITY_LOG_FILE = "activity_log.jsonl"
+LEGACY_ACTIVITY_LOG_FILE = "activity_log.json"
+activity_log = ActivityLog(ACTIVITY_LOG_FILE)
+activity_log.migrate_legacy(LEGACY_ACTIVITY_LOG_FILE)
 
 # Pydantic models
 class User(BaseModel):
@@ -64,12 +76,32 @@ def get_user(username: str):
         return UserInDB(**user_dict)
     return None
 
-def authenticate_user(username: str, password: str):
+async def run_hashing(fn, *args):
+    """Run a bcrypt call on the hashing pool; 503 once HASHING_MAX_PENDING jobs are waiting or running."""
+    global hashing_pending
+    if hashing_pending >= HASHING_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    hashing_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hashing_executor, fn, *args)
+    finally:
+        hashing_pending -= 1
+
+async def authenticate_user(username: str, password: str):
     user = get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # verify_and_update also returns a new hash when the bcrypt cost has changed
+    valid, new_hash = await run_hashing(pwd_context.verify_and_update, password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        users_db[username]["hashed_password"] = new_hash
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -83,24 +115,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def log_activity(username: str, activity: str):
-    timestamp = datetime.utcnow().isoformat()
-    log_entry = {
-        "timestamp": timestamp,
+    activity_log.log({
+        "timestamp": datetime.utcnow().isoformat(),
         "username": username,
         "activity": activity
-    }
-    try:
-        with open(ACTIVITY_LOG_FILE, "r+") as f:
-            try:
-                logs = json.load(f)
-            except json.JSONDecodeError:
-                logs = []
-            logs.append(log_entry)
-            f.seek(0)
-            json.dump(logs, f, indent=4)
-    except FileNotFoundError:
-        with open(ACTIVITY_LOG_FILE, "w") as f:
-            json.dump([log_entry], f, indent=4)
+    })
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
@@ -124,7 +143,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 # API endpoints
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -216,7 +235,7 @@ async def register_user(user: User, password: str):
             detail="Username already registered"
         )
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await run_hashing(get_password_hash, password)
     user_dict = user.dict()
     user_dict["hashed_password"] = hashed_password
     users_db[user.username] = user_dict
@@ -224,10 +243,40 @@ async def register_user(user: User, password: str):
     return {"status": "success", "message": "User registered successfully"}
 
 @app.get("/admin/activity-log")
-async def get_activity_log():
+def get_activity_log(
+    username: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Page through the activity log. Pass `next_cursor` back as `cursor` for the next page."""
     try:
-        with open(ACTIVITY_LOG_FILE, "r") as f:
-            logs = json.load(f)
-        return logs
-    except FileNotFoundError:
-        return []
\ No newline at end of file
+        entries, next_cursor = activity_log.read(
+            username=username,
+            since=since.isoformat() if since else None,
+            until=until.isoformat() if until else None,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"entries": entries, "next_cursor": next_cursor}
+
+async def flush_validators_periodically():
+    while True:
+        await asyncio.sleep(VALIDATOR_FLUSH_SECONDS)
+        blockchain.flush_validators(force=False)
+
+@app.on_event("startup")
+async def start_validator_flush():
+    app.state.validator_flush_task = asyncio.create_task(flush_validators_periodically())
+
+@app.on_event("shutdown")
+def flush_activity_log():
+    activity_log.close()
+
+@app.on_event("shutdown")
+async def flush_validators():
+    app.state.validator_flush_task.cancel()
+    blockchain.flush_validators()
@@ -1,6 +1,7 @@
 import hashlib
+import heapq
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from enum import Enum
 import random
@@ -22,6 +23,188 @@ class Validator:
     last_validation: float = 0
     reputation: float = 1.0
 
+# Validator scheduler
+class ValidatorScheduler:
+    """Reputation-weighted validator selection.
+
+    Weights live in a Fenwick (binary indexed) tree so that picking a
+    validator and changing its weight both cost O(log n), however many
+    validators are registered. A validator that has just sealed a block is
+    parked for `cooldown` seconds by zeroing its weight; when every weight
+    is zero the scheduler falls back to plain round-robin.
+
+    Reputation changes are only marked dirty here. The owner decides when
+    to persist them (see `needs_flush`), so validators.json is rewritten in
+    batches instead of after every block, but never later than
+    `flush_interval` seconds after a change.
+    """
+
+    def __init__(self, cooldown: float = 0.0, flush_every: int = 10, flush_interval: float = 30.0,
+                 min_reputation: float = 0.0, max_reputation: float = 10.0,
+                 reward: float = 0.1, penalty: float = 0.5):
+        self.cooldown = cooldown
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.min_reputation = min_reputation
+        self.max_reputation = max_reputation
+        self.reward = reward
+        self.penalty = penalty
+
+        self._addresses: List[str] = []          # index -> address
+        self._index: Dict[str, int] = {}         # address -> index
+        self._weights: List[float] = []          # effective weight per index
+        self._tree: List[float] = [0.0]          # 1-based Fenwick tree
+        self._cooling: List[tuple] = []          # heap of (ready_at, index)
+        self._validators: Dict[str, Validator] = {}
+        self._rr_cursor = 0
+        self._dirty = 0
+        self._flushed_at = time.time()
+
+    # ---- Fenwick tree helpers ----
+
+    def _prefix_sum(self, i: int) -> float:
+        total = 0.0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _add(self, i: int, delta: float):
+        n = len(self._tree) - 1
+        while i <= n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _append(self, weight: float):
+        # A new node i covers (i - lowbit(i), i], so its value is the new
+        # weight plus the weights already stored in that range.
+        i = len(self._tree)
+        lowbit = i & -i
+        self._tree.append(weight + self._prefix_sum(i - 1) - self._prefix_sum(i - lowbit))
+
+    def _set_weight(self, index: int, weight: float):
+        delta = weight - self._weights[index]
+        if delta:
+            self._weights[index] = weight
+            self._add(index + 1, delta)
+
+    def _find(self, target: float) -> int:
+        """Return the 0-based index whose cumulative weight range holds target."""
+        n = len(self._tree) - 1
+        pos = 0
+        step = 1 << (n.bit_length() - 1) if n else 0
+        while step:
+            nxt = pos + step
+            if nxt <= n and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+    # ---- Public API ----
+
+    @property
+    def total_weight(self) -> float:
+        return self._prefix_sum(len(self._tree) - 1)
+
+    def weight_for(self, validator: Validator) -> float:
+        return max(0.0, validator.reputation)
+
+    def add(self, validator: Validator, now: Optional[float] = None):
+        """Register a validator, honouring a cooldown left over from disk."""
+        now = time.time() if now is None else now
+        if validator.address in self._index:
+            self._validators[validator.address] = validator
+            self.update_reputation(validator.address, validator.reputation, now=now)
+            return
+        index = len(self._addresses)
+        self._addresses.append(validator.address)
+        self._index[validator.address] = index
+        self._validators[validator.address] = validator
+        ready_at = validator.last_validation + self.cooldown
+        if self.cooldown and ready_at > now:
+            self._weights.append(0.0)
+            self._append(0.0)
+            heapq.heappush(self._cooling, (ready_at, index))
+        else:
+            weight = self.weight_for(validator)
+            self._weights.append(weight)
+            self._append(weight)
+
+    def _release_cooled(self, now: float):
+        while self._cooling and self._cooling[0][0] <= now:
+            _, index = heapq.heappop(self._cooling)
+            if self._is_cooling(index, now):
+                continue  # stale entry, validator was picked again since
+            validator = self._validators[self._addresses[index]]
+            self._set_weight(index, self.weight_for(validator))
+
+    def _is_cooling(self, index: int, now: float) -> bool:
+        validator = self._validators[self._addresses[index]]
+        return bool(self.cooldown) and validator.last_validation + self.cooldown > now
+
+    def select(self, now: Optional[float] = None) -> str:
+        """Pick a validator with probability proportional to its weight."""
+        if not self._addresses:
+            raise ValueError("No validators registered")
+        now = time.time() if now is None else now
+        self._release_cooled(now)
+
+        total = self.total_weight
+        if total > 0:
+            return self._addresses[self._find(random.random() * total)]
+
+        # Round-robin fallback: everyone is cooling down or has no reputation.
+        # Prefer someone who is off cooldown, otherwise just take the next one.
+        count = len(self._addresses)
+        for offset in range(count):
+            index = (self._rr_cursor + offset) % count
+            if not self._is_cooling(index, now):
+                break
+        else:
+            index = self._rr_cursor % count
+        self._rr_cursor = (index + 1) % count
+        return self._addresses[index]
+
+    def update_reputation(self, address: str, reputation: float, now: Optional[float] = None):
+        """Set a validator's reputation and refresh its weight in O(log n)."""
+        now = time.time() if now is None else now
+        validator = self._validators[address]
+        validator.reputation = min(self.max_reputation, max(self.min_reputation, reputation))
+        index = self._index[address]
+        if not self._is_cooling(index, now):
+            self._set_weight(index, self.weight_for(validator))
+        self._dirty += 1
+
+    def record_validation(self, address: str, success: bool = True, now: Optional[float] = None):
+        """Reward or penalise a validator after it sealed (or failed to seal) a block."""
+        now = time.time() if now is None else now
+        validator = self._validators[address]
+        validator.last_validation = now
+        if success:
+            reputation = validator.reputation + self.reward
+        else:
+            reputation = validator.reputation * self.penalty
+        self.update_reputation(address, reputation, now=now)
+        if self.cooldown:
+            index = self._index[address]
+            self._set_weight(index, 0.0)
+            heapq.heappush(self._cooling, (now + self.cooldown, index))
+
+    @property
+    def pending_updates(self) -> int:
+        return self._dirty
+
+    def needs_flush(self, now: Optional[float] = None) -> bool:
+        if not self._dirty:
+            return False
+        now = time.time() if now is None else now
+        return self._dirty >= self.flush_every or now - self._flushed_at >= self.flush_interval
+
+    def mark_flushed(self, now: Optional[float] = None):
+        self._dirty = 0
+        self._flushed_at = time.time() if now is None else now
+
 # Block class
 class Block:
     def __init__(self, block_id: str, timestamp: str, previous_hash: str, ministry: Dict[str, Any], 
@@ -88,12 +271,17 @@ class Blockchain:
 
         return balances
     
-    def __init__(self, save_file: str = "blockchain.json", validators_file: str = "validators.json"):
+    def __init__(self, save_file: str = "blockchain.json", validators_file: str = "validators.json",
+                 validator_cooldown: float = 0.0, validator_flush_every: int = 10,
+                 validator_flush_interval: float = 30.0):
         self.chain: List[Block] = []
         self.pending_transactions: List[Dict[str, Any]] = []
         self.validators: Dict[str, Validator] = {}  # Key: wallet address, Value: Validator object
         self.save_file = save_file
         self.validators_file = validators_file
+        self.scheduler = ValidatorScheduler(cooldown=validator_cooldown,
+                                            flush_every=validator_flush_every,
+                                            flush_interval=validator_flush_interval)
         
         # Fixed nodes (ministries, parastatals, and national government)
         self.fixed_nodes = {
@@ -209,6 +397,17 @@ class Blockchain:
             # Convert validators to a dictionary
             validators_data = {address: validator.__dict__ for address, validator in self.validators.items()}
             json.dump(validators_data, f, indent=4)
+        self.scheduler.mark_flushed()
+
+    def flush_validators(self, force: bool = True):
+        """Persist reputation changes that the scheduler has batched up.
+
+        With `force=False` only when the batch is full or older than the
+        scheduler's flush interval; call it that way from a periodic task,
+        and with the default on shutdown.
+        """
+        if self.scheduler.pending_updates if force else self.scheduler.needs_flush():
+            self.save_validators()
 
     def load_validators(self):
         """Load validators from a file."""
@@ -218,6 +417,7 @@ class Blockchain:
                 for address, validator_data in validators_data.items():
                     # Convert dictionaries back to Validator objects
                     self.validators[address] = Validator(**validator_data)
+                    self.scheduler.add(self.validators[address])
         except FileNotFoundError:
             # If the file doesn't exist, start with an empty validators dictionary
             self.validators = {}
@@ -233,6 +433,7 @@ class Blockchain:
             print(f"Validator with address {address} already exists.")
             return
         self.validators[address] = Validator(address=address)
+        self.scheduler.add(self.validators[address])
         self.save_validators()  # Save validators to file
         print(f"Registered validator {address}.")
 
@@ -241,11 +442,44 @@ class Blockchain:
         return self.validators
 
     def select_validator(self) -> str:
+        """Pick the next validator, weighted by reputation (see ValidatorScheduler)."""
         if not self.validators:
             raise ValueError("No validators registered")
-        return random.choice(list(self.validators.keys()))
+        return self.scheduler.select()
 
-    def validate_transaction(self, transaction: Dict[str, Any]) -> bool:
+    def update_validator_reputation(self, address: str, reputation: float):
+        """Change a validator's reputation; persisted with the next batch."""
+        self.scheduler.update_reputation(address, reputation)
+        if self.scheduler.needs_flush():
+            self.save_validators()
+
+    def verify_block(self, block: Block) -> bool:
+        """Check a sealed block before it is appended.
+
+        Covers what the proposer can get wrong: the block must extend the
+        current tip and carry its proof of work, and its transactions must
+        pass the ministry rules with every sender covering all of its
+        spends in the block (each was only checked on its own when queued).
+        """
+        tip = self.chain[-1].current_hash if self.chain else "0"
+        if (block.previous_hash != tip
+                or block.current_hash != block.calculate_hash()
+                or not block.current_hash.startswith('0')):
+            return False
+        balances = self.get_all_wallet_balances()
+        for transaction in block.transactions:
+            if not self.passes_rules(transaction):
+                return False
+            sender, amount = transaction["sender"], transaction["amount"]
+            # SYSTEM is the funding account and has no balance to check
+            if sender != "SYSTEM" and balances.get(sender, 0.0) < amount:
+                return False
+            balances[sender] = balances.get(sender, 0.0) - amount
+            balances[transaction["recipient"]] = balances.get(transaction["recipient"], 0.0) + amount
+        return True
+
+    def passes_rules(self, transaction: Dict[str, Any]) -> bool:
+        """Ministry and parastatal limits on a transaction's amount and type."""
         # Check ministry rules (if applicable)
         if transaction.get("ministry_code") in self.ministry_rules:
             rules = self.ministry_rules[transaction["ministry_code"]]
@@ -261,6 +495,11 @@ class Blockchain:
                 return False
             if "allowed_types" in rules and transaction["type"] not in rules["allowed_types"]:
                 return False
+        return True
+
+    def validate_transaction(self, transaction: Dict[str, Any]) -> bool:
+        if not self.passes_rules(transaction):
+            return False
         
         # Check if the sender has sufficient balance
         sender_balance = self.calculate_wallet_balance(transaction["sender"])
@@ -312,10 +551,24 @@ class Blockchain:
             validator=validator_address
         )
 
-        while not new_block.current_hash.startswith('0'):
-            new_block.nonce += 1
-            new_block.current_hash = new_block.calculate_hash()
+        # The validator is rewarded for a block that checks out, penalised otherwise;
+        # reputations are written out in batches
+        try:
+            while not new_block.current_hash.startswith('0'):
+                new_block.nonce += 1
+                new_block.current_hash = new_block.calculate_hash()
+            if not self.verify_block(new_block):
+                # Drop the rejected block's transactions so they don't fail every later block
+                self.pending_transactions = []
+                raise ValueError(f"Block {new_block.block_id} sealed by {validator_address} failed verification")
+        except Exception:
+            self.scheduler.record_validation(validator_address, success=False)
+            self.flush_validators(force=False)
+            raise
 
         self.chain.append(new_block)
         self.pending_transactions = []
-        self.save_blockchain()  # Save the blockchain after mining a new block
\ No newline at end of file
+        self.save_blockchain()  # Save the blockchain after mining a new block
+
+        self.scheduler.record_validation(validator_address, success=True)
+        self.flush_validators(force=False)
\ No newline at end of file
@@ -13,6 +13,7 @@ sys.path.append(str(Path(__file__).parents[1]))
 # Import Base and models
 from models import Base
 from models import UserDB  # Make sure to import all your models
+from database import configure_sqlite_engine
 
 # This is the Alembic Config object
 config = context.config
@@ -45,6 +46,8 @@ def run_migrations_online() -> None:
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
+    # Same pragmas as the app, so migrations leave the file in WAL mode
+    configure_sqlite_engine(connectable)
 
     with connectable.connect() as connection:
         context.configure(
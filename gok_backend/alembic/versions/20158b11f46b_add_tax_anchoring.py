@@ -0,0 +1,56 @@
+"""Add tax payment anchoring tables
+
+Revision ID: 20158b11f46b
+Revises: f637499cc0bb
+Create Date: 2026-10-19 13:20:44.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '20158b11f46b'
+down_revision: Union[str, None] = 'f637499cc0bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tax_anchors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('merkle_root', sa.String(length=64), nullable=False),
+        sa.Column('leaf_count', sa.Integer(), nullable=False),
+        sa.Column('first_payment_id', sa.Integer(), nullable=False),
+        sa.Column('last_payment_id', sa.Integer(), nullable=False),
+        sa.Column('block_id', sa.String(length=50), nullable=False),
+        sa.Column('block_hash', sa.String(length=64), nullable=False),
+        sa.Column('transaction_id', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('merkle_root')
+    )
+    op.create_index(op.f('ix_tax_anchors_id'), 'tax_anchors', ['id'], unique=False)
+    op.create_index(op.f('ix_tax_anchors_last_payment_id'), 'tax_anchors', ['last_payment_id'], unique=False)
+    op.create_table(
+        'tax_payment_proofs',
+        sa.Column('payment_id', sa.Integer(), nullable=False),
+        sa.Column('anchor_id', sa.Integer(), nullable=False),
+        sa.Column('leaf_index', sa.Integer(), nullable=False),
+        sa.Column('leaf_hash', sa.String(length=64), nullable=False),
+        sa.Column('proof', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['anchor_id'], ['tax_anchors.id'], ),
+        sa.ForeignKeyConstraint(['payment_id'], ['tax_payments.id'], ),
+        sa.PrimaryKeyConstraint('payment_id')
+    )
+    op.create_index(op.f('ix_tax_payment_proofs_anchor_id'), 'tax_payment_proofs', ['anchor_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tax_payment_proofs_anchor_id'), table_name='tax_payment_proofs')
+    op.drop_table('tax_payment_proofs')
+    op.drop_index(op.f('ix_tax_anchors_last_payment_id'), table_name='tax_anchors')
+    op.drop_index(op.f('ix_tax_anchors_id'), table_name='tax_anchors')
+    op.drop_table('tax_anchors')
@@ -0,0 +1,50 @@
+"""Add indexes for hot query paths
+
+Revision ID: 3085502d7e0a
+Revises: a539a4336ede
+Create Date: 2026-10-19 10:12:41.503217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3085502d7e0a'
+down_revision: Union[str, None] = 'a539a4336ede'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns) - keep in sync with __table_args__ in models.py
+INDEXES = [
+    ('ix_projects_ministry_id_status', 'projects', ['ministry_id', 'status']),
+    ('ix_expense_requests_ministry_id_status_requested_at', 'expense_requests',
+     ['ministry_id', 'status', 'requested_at']),
+    ('ix_expense_requests_ministry_id_requested_at', 'expense_requests', ['ministry_id', 'requested_at']),
+    ('ix_tax_payments_created_at', 'tax_payments', ['created_at']),
+    ('ix_tax_payments_tax_type_created_at', 'tax_payments', ['tax_type', 'created_at']),
+    ('ix_tax_payments_status_created_at', 'tax_payments', ['status', 'created_at']),
+    ('ix_reports_created_at', 'reports', ['created_at']),
+    ('ix_reports_status_created_at', 'reports', ['status', 'created_at']),
+]
+
+
+def _existing_indexes(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Databases built with create_all() after this change already have them
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""Add tax revenue counter tables
+
+Revision ID: 4702c23c741c
+Revises: 3085502d7e0a
+Create Date: 2026-10-19 11:02:17.844190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '4702c23c741c'
+down_revision: Union[str, None] = '3085502d7e0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tax_revenue_by_type',
+        sa.Column('tax_type', sa.String(length=50), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('tax_type')
+    )
+    op.create_table(
+        'tax_revenue_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    # Counters start empty; backfill with `python tax_stats.py rebuild`
+
+
+def downgrade() -> None:
+    op.drop_table('tax_revenue_daily')
+    op.drop_table('tax_revenue_by_type')
@@ -0,0 +1,43 @@
+"""Add tax anchor block height
+
+Revision ID: a7c3e91d5f08
+Revises: f2b8d4a61c37
+Create Date: 2026-10-19 19:20:44.861302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e91d5f08'
+down_revision: Union[str, None] = 'f2b8d4a61c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tax_anchors', sa.Column('block_height', sa.Integer(), nullable=True))
+    # Block ids are their position in the chain
+    op.execute('UPDATE tax_anchors SET block_height = CAST(block_id AS INTEGER)')
+    # Anchored payments pointed at the block hash; point them at the anchor transaction instead
+    op.execute(
+        'UPDATE tax_payments SET transaction_hash = ('
+        'SELECT tax_anchors.transaction_id FROM tax_payment_proofs '
+        'JOIN tax_anchors ON tax_anchors.id = tax_payment_proofs.anchor_id '
+        'WHERE tax_payment_proofs.payment_id = tax_payments.id) '
+        'WHERE id IN (SELECT payment_id FROM tax_payment_proofs)'
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        'UPDATE tax_payments SET transaction_hash = ('
+        'SELECT tax_anchors.block_hash FROM tax_payment_proofs '
+        'JOIN tax_anchors ON tax_anchors.id = tax_payment_proofs.anchor_id '
+        'WHERE tax_payment_proofs.payment_id = tax_payments.id) '
+        'WHERE id IN (SELECT payment_id FROM tax_payment_proofs)'
+    )
+    with op.batch_alter_table('tax_anchors') as batch_op:
+        batch_op.drop_column('block_height')
@@ -0,0 +1,32 @@
+"""Add report updated_at
+
+Revision ID: b71e0c5d93a2
+Revises: 20158b11f46b
+Create Date: 2026-10-19 14:05:37.618240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e0c5d93a2'
+down_revision: Union[str, None] = '20158b11f46b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing reports count as last changed when they were filed
+    op.execute('UPDATE reports SET updated_at = created_at WHERE updated_at IS NULL')
+    op.create_index('ix_reports_report_type_created_at', 'reports', ['report_type', 'created_at'], unique=False)
+    op.create_index('ix_reports_updated_at', 'reports', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reports_updated_at', table_name='reports')
+    op.drop_index('ix_reports_report_type_created_at', table_name='reports')
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,36 @@
+"""Add report change sequence
+
+Revision ID: c81d47e2b6a9
+Revises: a7c3e91d5f08
+Create Date: 2026-10-19 21:05:12.418730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d47e2b6a9'
+down_revision: Union[str, None] = 'a7c3e91d5f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('change_seq', sa.Integer(), nullable=True))
+    # Number existing reports in the order the old updated_at cursor saw them
+    op.execute(
+        'UPDATE reports SET change_seq = ('
+        'SELECT seq FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY updated_at, id) AS seq FROM reports) AS numbered '
+        'WHERE numbered.id = reports.id)'
+    )
+    op.create_index('ix_reports_change_seq', 'reports', ['change_seq'], unique=True)
+    op.drop_index('ix_reports_updated_at', table_name='reports')
+
+
+def downgrade() -> None:
+    op.create_index('ix_reports_updated_at', 'reports', ['updated_at'], unique=False)
+    op.drop_index('ix_reports_change_seq', table_name='reports')
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_column('change_seq')
@@ -0,0 +1,29 @@
+"""Allow pending idempotency keys
+
+Revision ID: d4e8b1f63a27
+Revises: c81d47e2b6a9
+Create Date: 2026-10-19 21:48:37.205614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8b1f63a27'
+down_revision: Union[str, None] = 'c81d47e2b6a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A key is claimed with no response until its request finishes
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.alter_column('response', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute('DELETE FROM idempotency_keys WHERE response IS NULL')
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.alter_column('response', existing_type=sa.Text(), nullable=False)
@@ -0,0 +1,39 @@
+"""Add spending rollups
+
+Revision ID: d93b6e27a4f1
+Revises: c4f2a9d81e60
+Create Date: 2026-10-19 15:48:52.130584
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b6e27a4f1'
+down_revision: Union[str, None] = 'c4f2a9d81e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'spending_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('ministry_id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.Column('min_amount', sa.Float(), nullable=False),
+        sa.Column('max_amount', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'ministry_id', 'project_id', 'category')
+    )
+    op.create_index('ix_spending_daily_ministry_id_day', 'spending_daily', ['ministry_id', 'day'], unique=False)
+    # Rollups start empty; backfill with `python spending.py rebuild`
+
+
+def downgrade() -> None:
+    op.drop_index('ix_spending_daily_ministry_id_day', table_name='spending_daily')
+    op.drop_table('spending_daily')
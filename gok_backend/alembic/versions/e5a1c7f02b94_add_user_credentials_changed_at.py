@@ -0,0 +1,28 @@
+"""Add user credentials_changed_at
+
+Revision ID: e5a1c7f02b94
+Revises: d93b6e27a4f1
+Create Date: 2026-10-19 18:02:37.514210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7f02b94'
+down_revision: Union[str, None] = 'd93b6e27a4f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('credentials_changed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_users_credentials_changed_at', 'users', ['credentials_changed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_credentials_changed_at', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('credentials_changed_at')
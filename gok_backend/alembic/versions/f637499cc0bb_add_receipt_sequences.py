@@ -0,0 +1,30 @@
+"""Add receipt sequences
+
+Revision ID: f637499cc0bb
+Revises: 4702c23c741c
+Create Date: 2026-10-19 11:48:05.210377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f637499cc0bb'
+down_revision: Union[str, None] = '4702c23c741c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'receipt_sequences',
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('next_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('year')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('receipt_sequences')
@@ -0,0 +1,174 @@
+# anchoring.py
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from audit import get_logger
+from models import TaxAnchorDB, TaxPaymentDB, TaxPaymentProofDB
+
+logger = get_logger("anchoring")
+
+ANCHOR_INTERVAL_SECONDS = float(os.getenv("ANCHOR_INTERVAL_SECONDS", "60"))
+ANCHOR_BATCH_SIZE = int(os.getenv("ANCHOR_BATCH_SIZE", "10000"))
+
+# Chain account the anchor transactions are addressed to
+ANCHOR_RECIPIENT = "TAX_ANCHOR"
+
+# Domain separation so a leaf can never be passed off as an inner node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+Proof = List[Tuple[str, str]]  # [(sibling hash, "L" if the sibling is on the left else "R")]
+
+# The background task and the manual endpoint must not anchor the same range twice
+_anchor_lock = asyncio.Lock()
+
+def payment_leaf(payment: TaxPaymentDB) -> str:
+    """Hash of the fields a receipt vouches for; any later edit changes it."""
+    record = {
+        "id": payment.id,
+        "receipt_number": payment.receipt_number,
+        "taxpayer_name": payment.taxpayer_name,
+        "id_number": payment.id_number,
+        "tax_type": payment.tax_type,
+        "amount": repr(float(payment.amount)),
+        "payment_method": payment.payment_method,
+        "status": payment.status,
+        "created_at": payment.created_at.isoformat() if payment.created_at else None,
+    }
+    encoded = json.dumps(record, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(LEAF_PREFIX + encoded).hexdigest()
+
+def _node(left: str, right: str) -> str:
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def merkle_tree(leaves: List[str]) -> Tuple[str, List[Proof]]:
+    """Return (root, proof per leaf).
+
+    An odd node at the end of a level is carried up unchanged rather than
+    paired with a copy of itself, so two different leaf lists can never
+    share a root.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    proofs: List[Proof] = [[] for _ in leaves]
+    positions = list(range(len(leaves)))  # index of each leaf's ancestor in the current level
+    level = list(leaves)
+    while len(level) > 1:
+        parents = []
+        for i in range(0, len(level) - 1, 2):
+            parents.append(_node(level[i], level[i + 1]))
+        if len(level) % 2:
+            parents.append(level[-1])
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append((level[sibling], "L" if sibling < position else "R"))
+            positions[leaf] = position // 2
+        level = parents
+    return level[0], proofs
+
+def verify_proof(leaf: str, proof: Proof, root: str) -> bool:
+    current = leaf
+    for sibling, side in proof:
+        current = _node(sibling, current) if side == "L" else _node(current, sibling)
+    return current == root
+
+async def anchor_pending_payments(db: AsyncSession, blockchain, batch_size: int = ANCHOR_BATCH_SIZE) -> Optional[TaxAnchorDB]:
+    """Anchor the next batch of unanchored payments; returns the anchor, or None if none were pending.
+
+    Payments are taken in id order after the last anchored id, hashed into
+    a Merkle tree, and the root goes on the chain as one SYSTEM ->
+    TAX_ANCHOR transaction. The anchor row records the root with the
+    block's hash and height; each payment gets the anchor transaction's id
+    in `transaction_hash` and its inclusion proof in `tax_payment_proofs`.
+    """
+    async with _anchor_lock:
+        return await _anchor_next_batch(db, blockchain, batch_size)
+
+async def _anchor_next_batch(db: AsyncSession, blockchain, batch_size: int) -> Optional[TaxAnchorDB]:
+    last_anchored = (await db.execute(select(func.max(TaxAnchorDB.last_payment_id)))).scalar() or 0
+    payments = (await db.execute(
+        select(TaxPaymentDB).where(TaxPaymentDB.id > last_anchored).order_by(TaxPaymentDB.id).limit(batch_size)
+    )).scalars().all()
+    if not payments:
+        return None
+
+    leaves = [payment_leaf(payment) for payment in payments]
+    root, proofs = merkle_tree(leaves)
+    first_id, last_id = payments[0].id, payments[-1].id
+
+    transaction = {
+        "sender": "SYSTEM",
+        "recipient": ANCHOR_RECIPIENT,
+        "amount": 0.0,
+        "purpose": "Tax payment anchor",
+        "approved_by": "SYSTEM",
+        "extra_info": json.dumps({
+            "merkle_root": root,
+            "leaf_count": len(leaves),
+            "first_payment_id": first_id,
+            "last_payment_id": last_id,
+        }),
+        "category": "tax_anchor"
+    }
+    if not blockchain.add_transaction(transaction, require_funds=False):
+        raise RuntimeError("Blockchain rejected the anchor transaction")
+    block = await blockchain.mine_block("SYSTEM", {})
+    anchor_tx = next(tx for tx in block.transactions if tx.get("category") == "tax_anchor"
+                     and json.loads(tx["extra_info"])["merkle_root"] == root)
+
+    anchor = TaxAnchorDB(
+        merkle_root=root,
+        leaf_count=len(leaves),
+        first_payment_id=first_id,
+        last_payment_id=last_id,
+        block_id=block.block_id,
+        block_height=int(block.block_id),  # blocks are numbered by their position in the chain
+        block_hash=block.current_hash,
+        transaction_id=anchor_tx["transaction_id"]
+    )
+    db.add(anchor)
+    await db.flush()
+
+    await db.execute(insert(TaxPaymentProofDB), [
+        {
+            "payment_id": payment.id,
+            "anchor_id": anchor.id,
+            "leaf_index": index,
+            "leaf_hash": leaf,
+            "proof": json.dumps(proof),
+        }
+        for index, (payment, leaf, proof) in enumerate(zip(payments, leaves, proofs))
+    ])
+    await db.execute(
+        update(TaxPaymentDB)
+        .where(TaxPaymentDB.id >= first_id, TaxPaymentDB.id <= last_id)
+        .values(transaction_hash=anchor_tx["transaction_id"])
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    logger.info("Anchored %d tax payments (ids %d-%d) with root %s", len(leaves), first_id, last_id,
+                root, extra={"event": "tax_anchor", "block_id": block.block_id})
+    return anchor
+
+async def run_anchoring(session_factory, blockchain, interval: float = ANCHOR_INTERVAL_SECONDS):
+    """Background loop: anchor everything pending, then sleep `interval` seconds."""
+    while True:
+        try:
+            anchored = True
+            while anchored:
+                # Fresh session per batch so anchored payments don't pile up in memory
+                async with session_factory() as db:
+                    anchored = await anchor_pending_payments(db, blockchain) is not None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Tax anchoring failed: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,324 @@
+# anomalies.py
+# Streaming anomaly detection over sealed blocks. Unusual transfers are
+# filed as ReportDB rows with report_type="automated", next to the
+# citizens' reports. The CLI replays a /blockchain export through the same
+# detector to backtest the thresholds.
+#
+# Usage: python anomalies.py backtest chain.json          # export of GET /blockchain
+#        python anomalies.py backtest chain.json --show 50
+
+import argparse
+import asyncio
+import calendar
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from audit import get_logger
+from models import ReportDB
+
+logger = get_logger("anomalies")
+
+ANOMALY_FLUSH_SECONDS = float(os.getenv("ANOMALY_FLUSH_SECONDS", "1"))
+# Weight of the newest transfer in a wallet's moving averages
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))
+# Transfers a wallet must have made before its own history is used as a baseline
+WARMUP_TRANSFERS = 20
+# Standard deviations (of log amount) above the wallet's average that count as a spike
+AMOUNT_Z = 3.5
+# Smallest spread assumed, so wallets that always pay the same don't flag small changes
+MIN_SPREAD = 0.5
+# Activity counters decay with these time constants: the recent burst vs the wallet's usual pace
+VELOCITY_WINDOW_SECONDS = 3600
+VELOCITY_BASELINE_SECONDS = 30 * 24 * 3600
+VELOCITY_FACTOR = 5
+VELOCITY_MIN_TRANSFERS = 10
+# Distinct recipients remembered per wallet (least recently paid forgotten first);
+# a recipient outside these counts as new
+COUNTERPARTY_MEMORY = int(os.getenv("ANOMALY_COUNTERPARTY_MEMORY", "256"))
+ROUND_AMOUNT_UNIT = 10000
+ROUND_AMOUNT_MIN = 100000
+# This many transfers to one recipient within the window, together worth a spike,
+# look like one payment split up
+SPLIT_COUNT = 3
+SPLIT_WINDOW_SECONDS = 3600
+# Recipients that stand for many payees, so repeats and newness say nothing
+SINKS = {"EXPENSE_PAID", "TAX_ANCHOR"}
+
+# A transfer is reported once its signals add up to REPORT_SCORE
+SIGNAL_WEIGHTS = {
+    "amount_spike": 2,
+    "velocity": 2,
+    "split_payment": 2,
+    "new_counterparty": 1,
+    "round_amount": 1,
+}
+REPORT_SCORE = 2
+DETECTOR_NAME = "anomaly-detector"
+
+def block_time(timestamp: str) -> float:
+    """Seconds since the epoch for a block timestamp ("%Y-%m-%dT%H:%M:%SZ")."""
+    return float(calendar.timegm(time.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")))
+
+class WalletStats:
+    """Running statistics of one wallet's outgoing transfers."""
+
+    __slots__ = ("transfers", "mean", "variance", "first_seen", "last_seen", "recent", "usual",
+                 "counterparties", "split_recipient", "split_start", "split_count", "split_total")
+
+    def __init__(self):
+        self.transfers = 0
+        self.mean = 0.0  # EWMA of log(1 + amount)
+        self.variance = 0.0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.recent = 0.0  # transfers in roughly the last VELOCITY_WINDOW_SECONDS
+        self.usual = 0.0  # transfers in roughly the last VELOCITY_BASELINE_SECONDS
+        self.counterparties: "OrderedDict[str, None]" = OrderedDict()  # LRU, oldest first
+        self.split_recipient: Optional[str] = None
+        self.split_start = 0.0
+        self.split_count = 0
+        self.split_total = 0.0
+
+class AnomalyDetector:
+    """Scores each transfer against its sender's own history.
+
+    Per wallet it keeps exponentially weighted averages of the (log)
+    amount, two decaying transfer counters (the last hour, the last
+    month), its COUNTERPARTY_MEMORY most recently paid recipients, and
+    the current run of transfers to one recipient. Each transfer is checked and folded in in O(1), so the
+    detector keeps up with the chain and can replay it in bulk.
+
+    Signals: an amount far above the wallet's usual, a burst of transfers
+    well above its usual pace, several transfers to one recipient in a
+    short time (a payment split to stay under a limit), a new recipient
+    and a large round amount. Each has a weight in SIGNAL_WEIGHTS; the
+    last two only count together with something else.
+    """
+
+    def __init__(self, alpha: float = ANOMALY_ALPHA):
+        self.alpha = alpha
+        self.wallets: Dict[str, WalletStats] = {}
+
+    def observe(self, transaction: Dict[str, Any], moment: float) -> List[str]:
+        """Fold a transfer into its sender's statistics; returns the signals it raised."""
+        sender, recipient = transaction["sender"], transaction["recipient"]
+        amount = float(transaction["amount"])
+        if sender == "SYSTEM" or amount <= 0:
+            return []
+        stats = self.wallets.get(sender)
+        if stats is None:
+            stats = self.wallets[sender] = WalletStats()
+
+        if stats.last_seen is None:
+            stats.first_seen = moment
+        else:
+            elapsed = max(moment - stats.last_seen, 0.0)
+            stats.recent *= math.exp(-elapsed / VELOCITY_WINDOW_SECONDS)
+            stats.usual *= math.exp(-elapsed / VELOCITY_BASELINE_SECONDS)
+        stats.recent += 1
+        stats.usual += 1
+        stats.last_seen = moment
+
+        signals = []
+        value = math.log1p(amount)
+        warm = stats.transfers >= WARMUP_TRANSFERS
+        spike_above = stats.mean + AMOUNT_Z * max(math.sqrt(stats.variance), MIN_SPREAD)
+        if warm:
+            if value > spike_above:
+                signals.append("amount_spike")
+            # Transfers the wallet usually makes per VELOCITY_WINDOW_SECONDS, over its lifetime if shorter
+            period = min(max(moment - stats.first_seen, VELOCITY_WINDOW_SECONDS), VELOCITY_BASELINE_SECONDS)
+            expected = stats.usual * VELOCITY_WINDOW_SECONDS / period
+            if stats.recent >= VELOCITY_MIN_TRANSFERS and stats.recent > VELOCITY_FACTOR * expected:
+                signals.append("velocity")
+            if recipient not in SINKS and recipient not in stats.counterparties:
+                signals.append("new_counterparty")
+        if amount >= ROUND_AMOUNT_MIN and amount % ROUND_AMOUNT_UNIT == 0:
+            signals.append("round_amount")
+        if recipient not in SINKS:
+            if recipient == stats.split_recipient and moment - stats.split_start <= SPLIT_WINDOW_SECONDS:
+                stats.split_count += 1
+                stats.split_total += amount
+            else:
+                stats.split_recipient, stats.split_start = recipient, moment
+                stats.split_count, stats.split_total = 1, amount
+            # Once per run: the transfer that makes it add up
+            if (warm and stats.split_count >= SPLIT_COUNT and "amount_spike" not in signals
+                    and math.log1p(stats.split_total) > spike_above):
+                signals.append("split_payment")
+                stats.split_recipient = None
+
+        deviation = value - stats.mean
+        if stats.transfers == 0:
+            stats.mean = value
+        else:
+            stats.mean += self.alpha * deviation
+            stats.variance = (1 - self.alpha) * (stats.variance + self.alpha * deviation * deviation)
+        stats.transfers += 1
+        if recipient not in SINKS:
+            stats.counterparties[recipient] = None
+            stats.counterparties.move_to_end(recipient)
+            if len(stats.counterparties) > COUNTERPARTY_MEMORY:
+                stats.counterparties.popitem(last=False)
+        return signals
+
+    def observe_block(self, block_id: str, block_hash: str, timestamp: str,
+                      transactions: Iterable[Dict[str, Any]]) -> List[dict]:
+        """Score a block's transfers; returns one finding per sender with reportable transfers."""
+        moment = block_time(timestamp)
+        findings: Dict[str, dict] = {}
+        for transaction in transactions:
+            signals = self.observe(transaction, moment)
+            if sum(SIGNAL_WEIGHTS[signal] for signal in signals) < REPORT_SCORE:
+                continue
+            sender = transaction["sender"]
+            finding = findings.get(sender)
+            if finding is None:
+                finding = findings[sender] = {
+                    "wallet": sender,
+                    "block_id": block_id,
+                    "block_hash": block_hash,
+                    "timestamp": timestamp,
+                    "signals": Counter(),
+                    "transactions": [],
+                }
+            finding["signals"].update(signals)
+            finding["transactions"].append({
+                "transaction_id": transaction.get("transaction_id"),
+                "recipient": transaction["recipient"],
+                "amount": float(transaction["amount"]),
+                "signals": signals,
+            })
+        return list(findings.values())
+
+    def replay(self, chain: Iterable) -> List[dict]:
+        """Run blocks already on a chain through the detector, e.g. to warm it up at startup."""
+        findings = []
+        for block in chain:
+            findings.extend(self.observe_block(block.block_id, block.current_hash, block.timestamp, block.transactions))
+        return findings
+
+def finding_report(finding: dict) -> ReportDB:
+    transactions = finding["transactions"]
+    lines = [
+        f"Block {finding['block_id']} ({finding['timestamp']}), signals: "
+        + ", ".join(f"{signal} x{count}" for signal, count in sorted(finding["signals"].items())),
+        "",
+    ]
+    lines.extend(
+        f"- {transaction['transaction_id']}: {transaction['amount']:.2f} to {transaction['recipient']} "
+        f"({', '.join(transaction['signals'])})"
+        for transaction in transactions
+    )
+    return ReportDB(
+        report_type="automated",
+        reported_by=DETECTOR_NAME,
+        subject=f"Unusual transfers from {finding['wallet']}: {len(transactions)} totalling "
+                f"{sum(t['amount'] for t in transactions):.2f}",
+        description="\n".join(lines),
+        transaction_hash=transactions[0]["transaction_id"],
+        status="pending"
+    )
+
+class AnomalyReporter:
+    """Block listener that files the detector's findings as reports.
+
+    Detection runs inline when a block is sealed; the reports are written
+    by `run` in the background, like the spending rollups.
+    """
+
+    def __init__(self, detector: Optional[AnomalyDetector] = None):
+        self.detector = detector or AnomalyDetector()
+        self._queue: deque = deque()
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def on_block(self, block):
+        findings = self.detector.observe_block(block.block_id, block.current_hash, block.timestamp, block.transactions)
+        if findings:
+            self._queue.extend(findings)
+            self._wake.set()
+
+    async def flush(self, session_factory) -> int:
+        if not self._queue:
+            return 0
+        batch = list(self._queue)
+        self._queue.clear()
+        try:
+            async with session_factory() as db:
+                db.add_all(finding_report(finding) for finding in batch)
+                await db.commit()
+        except Exception:
+            self._queue.extendleft(reversed(batch))
+            raise
+        for finding in batch:
+            logger.warning("Unusual transfers from %s in block %s: %s", finding["wallet"], finding["block_id"],
+                           ", ".join(finding["signals"]), extra={"event": "anomaly", "wallet_address": finding["wallet"],
+                                                                 "block_id": finding["block_id"]})
+        return len(batch)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    async def run(self, session_factory, interval: float = ANOMALY_FLUSH_SECONDS):
+        self._stopping = False
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush(session_factory)
+            except Exception as e:
+                logger.exception("Anomaly report flush failed: %s", e)
+
+# Shared reporter, registered on the API's chain at startup
+anomaly_reporter = AnomalyReporter()
+
+def backtest(export: dict, show: int = 20):
+    """Replay a /blockchain export and print what would have been reported."""
+    detector = AnomalyDetector()
+    findings = []
+    transfers = 0
+    started = time.perf_counter()
+    for block in export["chain"]:
+        transfers += len(block["transactions"])
+        findings.extend(detector.observe_block(block["block_id"], block["hash"], block["timestamp"],
+                                               block["transactions"]))
+    elapsed = time.perf_counter() - started
+
+    signals = Counter()
+    for finding in findings:
+        signals.update(finding["signals"])
+    print(f"Replayed {len(export['chain'])} blocks, {transfers} transfers, "
+          f"{len(detector.wallets)} wallets in {elapsed:.2f}s")
+    print(f"{len(findings)} reports would be filed")
+    for signal, count in signals.most_common():
+        print(f"  {signal}: {count}")
+    for finding in findings[:show]:
+        report = finding_report(finding)
+        print(f"\n{report.subject}\n{report.description}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the anomaly detector on a chain export")
+    parser.add_argument("command", choices=["backtest"])
+    parser.add_argument("export", help="JSON saved from GET /blockchain, or - for stdin")
+    parser.add_argument("--show", type=int, default=20, help="findings to print in full")
+    args = parser.parse_args()
+
+    if args.export == "-":
+        export = json.load(sys.stdin)
+    else:
+        with open(args.export) as f:
+            export = json.load(f)
+    backtest(export, args.show)
+
+if __name__ == "__main__":
+    main()
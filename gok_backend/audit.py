@@ -0,0 +1,154 @@
+# audit.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import List
+
+# Audit log settings
+LOG_DIR = "logs"
+AUDIT_LOG_FILE = os.path.join(LOG_DIR, "audit.jsonl")
+AUDIT_LOG_MAX_BYTES = 10 * 1024 * 1024
+AUDIT_LOG_BACKUP_COUNT = 10
+AUDIT_BATCH_SIZE = 500
+
+# Fields copied from `extra=` into the JSON record when present
+STRUCTURED_FIELDS = ("event", "office_name", "wallet_address", "amount", "recipient", "block_id")
+
+class JsonFormatter(logging.Formatter):
+    """Format a log record as a single JSON line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.utcfromtimestamp(record.created).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that can write many records with one write and flush."""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        text = "".join(self.format(record) + self.terminator for record in records)
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self.stream.tell() + len(text) >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(text)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+class BatchQueueListener:
+    """Background thread that drains queued log records in batches.
+
+    Request handlers only pay for a queue put; all file I/O happens here.
+    """
+
+    _sentinel = None
+
+    def __init__(self, log_queue: "queue.SimpleQueue", file_handler: BatchRotatingFileHandler,
+                 *handlers: logging.Handler, batch_size: int = AUDIT_BATCH_SIZE):
+        self.queue = log_queue
+        self.file_handler = file_handler
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self.queue.put(self._sentinel)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self._sentinel in batch:
+                stopping = True
+                batch = [record for record in batch if record is not self._sentinel]
+            if not batch:
+                continue
+            self.file_handler.emit_batch(batch)
+            for handler in self.handlers:
+                for record in batch:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_listener = None
+_queue_handler = None
+
+def setup_logging():
+    """Route every `gok.*` logger through the queue. Safe to call more than once.
+
+    Called by the app's startup hook only; until then (and in scripts)
+    `gok.*` records fall through to the standard library's default handling.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    file_handler = BatchRotatingFileHandler(
+        AUDIT_LOG_FILE, maxBytes=AUDIT_LOG_MAX_BYTES, backupCount=AUDIT_LOG_BACKUP_COUNT,
+        encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s [%(name)s] %(message)s"))
+
+    root = logging.getLogger("gok")
+    root.setLevel(logging.INFO)
+    root.propagate = False
+    _queue_handler = logging.handlers.QueueHandler(_log_queue)
+    root.addHandler(_queue_handler)
+
+    _listener = BatchQueueListener(_log_queue, file_handler, console_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Detach the queue, flush queued records to disk and stop the writer thread."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        # Nothing drains the queue after this, so stop feeding it
+        root = logging.getLogger("gok")
+        root.removeHandler(_queue_handler)
+        root.propagate = True
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener.file_handler.close()
+        _listener = None
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the `gok` namespace (queue-backed once setup_logging() has run)."""
+    return logging.getLogger(f"gok.{name}")
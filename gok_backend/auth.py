@@ -1,16 +1,24 @@
 # auth.py
 
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Set, Tuple
 from jose import JWTError, jwt
 import bcrypt
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import AsyncSessionLocal, get_async_db, get_async_read_db
 from models import UserDB
+from audit import get_logger
+from hashing import hashing_pool
+from revocation import revocation_store, token_id
 import os
 import secrets
+import time
 
 # Security settings
 SECRET_KEY = "your-secret-key"  # Change this in production
@@ -18,12 +26,181 @@ REFRESH_SECRET_KEY = "your-refresh-secret-key"  # Separate key for refresh token
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # raising this rehashes passwords on next login
+
+# Audit logger (queue-backed, written by a background thread)
+audit_logger = get_logger("audit")
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Token blacklist
-revoked_tokens = set()
+# Principal cache settings
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 300
+# How often a worker looks for principals changed by other workers
+PRINCIPAL_SYNC_INTERVAL_SECONDS = 1.0
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, as request handlers see it.
+
+    Carries the fields endpoints read from `current_user` so that
+    authorization can be answered from token claims without a database
+    round trip.
+    """
+    id: Optional[int]
+    office_name: str
+    wallet_address: str
+    role: str
+    ministry_id: Optional[int] = None
+
+    @classmethod
+    def from_user(cls, user: UserDB) -> "Principal":
+        return cls(
+            id=user.id,
+            office_name=user.office_name,
+            wallet_address=user.wallet_address,
+            role=user.role,
+            ministry_id=user.ministry_id,
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        """Build a principal from access-token claims, or None for tokens without them."""
+        if "role" not in payload or "wallet" not in payload:
+            return None
+        return cls(
+            id=payload.get("uid"),
+            office_name=payload["sub"],
+            wallet_address=payload["wallet"],
+            role=payload["role"],
+            ministry_id=payload.get("ministry_id"),
+        )
+
+class PrincipalCache:
+    """TTL + LRU cache of authenticated principals keyed by token id (jti).
+
+    Entries never outlive their token. `invalidate(subject)` drops a user's
+    cached entries and marks every token issued before now as stale, so
+    claims in those tokens are re-checked against the database once.
+
+    Changes made by other worker processes are picked up from
+    `users.credentials_changed_at`, polled (at most once per `sync_interval`)
+    the same way the revocation store polls `revoked_tokens`. A change is
+    forgotten once it is older than `token_lifetime`, since every token
+    issued before it has expired by then.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS,
+                 sync_interval: float = PRINCIPAL_SYNC_INTERVAL_SECONDS,
+                 token_lifetime: float = ACCESS_TOKEN_EXPIRE_MINUTES * 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.token_lifetime = token_lifetime
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._tokens_by_subject: Dict[str, Set[str]] = {}
+        # Oldest change first, so expired changes can be dropped from the front
+        self._changed_at: "OrderedDict[str, float]" = OrderedDict()
+        self._synced_through: Optional[datetime] = None
+        self._last_sync = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Principal]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return principal
+
+    def put(self, key: str, principal: Principal, token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        self._entries[key] = (expires_at, principal)
+        self._entries.move_to_end(key)
+        self._tokens_by_subject.setdefault(principal.office_name, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str):
+        _, principal = self._entries.pop(key)
+        keys = self._tokens_by_subject.get(principal.office_name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tokens_by_subject[principal.office_name]
+
+    def discard(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate(self, subject: str, changed_at: Optional[float] = None):
+        """Forget everything cached for a user whose role, ministry or wallet changed."""
+        changed_at = changed_at or time.time()
+        if changed_at > self._changed_at.get(subject, 0.0):
+            self._changed_at[subject] = changed_at
+            self._changed_at.move_to_end(subject)
+        self._forget_expired_changes()
+        for token in list(self._tokens_by_subject.get(subject, ())):
+            self._remove(token)
+
+    async def sync(self, db: AsyncSession, force: bool = False):
+        """Invalidate users changed since the last sync, including by other workers."""
+        now = time.time()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        if self._synced_through is None:
+            # Changes older than the longest-lived access token can't matter
+            self._synced_through = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        # Re-read a little behind the last change seen, in case a slower commit lands late
+        since = self._synced_through - timedelta(seconds=self.sync_interval)
+        rows = (await db.execute(
+            select(UserDB.office_name, UserDB.credentials_changed_at)
+            .where(UserDB.credentials_changed_at > since)
+        )).all()
+        for office_name, changed_at in rows:
+            self.invalidate(office_name, _epoch(changed_at))
+            self._synced_through = max(self._synced_through, changed_at)
+
+    def _forget_expired_changes(self):
+        horizon = time.time() - self.token_lifetime
+        while self._changed_at:
+            subject, changed_at = next(iter(self._changed_at.items()))
+            if changed_at >= horizon:
+                break
+            del self._changed_at[subject]
+
+    def claims_are_stale(self, subject: str, issued_at: Optional[float]) -> bool:
+        changed_at = self._changed_at.get(subject)
+        if changed_at is None:
+            return False
+        return issued_at is None or issued_at <= changed_at
+
+principal_cache = PrincipalCache()
+
+def _epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+def invalidate_principal(user: UserDB):
+    """Call when changing a user's role, ministry, wallet or password; commit afterwards.
+
+    Stamps `credentials_changed_at` so every worker re-checks tokens issued
+    before the change, and drops this worker's cached entries right away.
+    """
+    changed_at = datetime.utcnow()
+    user.credentials_changed_at = changed_at
+    principal_cache.invalidate(user.office_name, _epoch(changed_at))
 
 # Utility functions
 def generate_wallet_address():
@@ -33,7 +210,7 @@ def generate_wallet_address():
 def get_password_hash(password: str) -> str:
     """Generate password hash using bcrypt."""
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -43,27 +220,69 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     hashed_bytes = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different bcrypt cost than BCRYPT_ROUNDS."""
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    parts = hashed_password.split("$")
+    return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != BCRYPT_ROUNDS
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool instead of the event loop."""
+    return await hashing_pool.run(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool instead of the event loop."""
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
 def get_user(db: Session, office_name: str):
     """Get user from database."""
     return db.query(UserDB).filter(UserDB.office_name == office_name).first()
 
-def authenticate_user(db: Session, office_name: str, password: str):
-    """Authenticate user."""
-    user = get_user(db, office_name)
+async def get_user_async(db: AsyncSession, office_name: str):
+    """Get user from database without blocking the event loop."""
+    result = await db.execute(select(UserDB).where(UserDB.office_name == office_name))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, office_name: str, password: str,
+                            write_session_factory=AsyncSessionLocal):
+    """Authenticate user, upgrading the stored hash if the bcrypt cost changed.
+
+    `db` only reads, so it can be a read-only session; a writer session is
+    opened (after hashing) just for the rehash update.
+    """
+    user = await get_user_async(db, office_name)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
+    if password_needs_rehash(user.hashed_password):
+        hashed_password = await get_password_hash_async(password)
+        async with write_session_factory() as writer:
+            await writer.execute(
+                update(UserDB).where(UserDB.id == user.id).values(hashed_password=hashed_password)
+            )
+            await writer.commit()
     return user
 
+def access_token_claims(user: UserDB) -> dict:
+    """Claims embedded in access tokens so authorization can skip the database."""
+    return {
+        "sub": user.office_name,
+        "uid": user.id,
+        "role": user.role,
+        "ministry_id": user.ministry_id,
+        "wallet": user.wallet_address,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create access token."""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now, "jti": secrets.token_hex(16)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -74,39 +293,69 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=7)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": secrets.token_hex(16)})
     encoded_jwt = jwt.encode(to_encode, REFRESH_SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current user from access token."""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)):
+    """Get current user from access token.
+
+    Returns a `Principal`. Cached principals and tokens carrying role claims
+    are resolved without touching the database.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    if token in revoked_tokens:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        office_name: str = payload.get("sub")
+        if office_name is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+
+    jti = token_id(payload, token)
+    if await revocation_store.is_revoked(jti):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    await principal_cache.sync(db)
+    principal = principal_cache.get(jti)
+    if principal is not None:
+        return principal
+
+    if not principal_cache.claims_are_stale(office_name, payload.get("iat")):
+        principal = Principal.from_claims(payload)
+    if principal is None:
+        # Older token without claims, or the user changed since it was issued
+        user = await get_user_async(db, office_name=office_name)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+    principal_cache.put(jti, principal, payload.get("exp"))
+    return principal
+
+async def revoke_access_token(token: str) -> bool:
+    """Revoke an access token until it expires. Returns False if it was already revoked."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        office_name: str = payload.get("sub")
-        if office_name is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-
-    user = get_user(db, office_name=office_name)
-    if user is None:
-        raise credentials_exception
-    return user
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    jti = token_id(payload, token)
+    principal_cache.discard(jti)
+    return await revocation_store.revoke(jti, payload.get("exp"))
 
-async def get_current_user_from_refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def get_current_user_from_refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_read_db)):
     """Get current user from refresh token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -114,13 +363,6 @@ async def get_current_user_from_refresh_token(refresh_token: str, db: Session =
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    if refresh_token in revoked_tokens:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Refresh token has been revoked",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     try:
         payload = jwt.decode(refresh_token, REFRESH_SECRET_KEY, algorithms=[ALGORITHM])
         office_name: str = payload.get("sub")
@@ -128,26 +370,28 @@ async def get_current_user_from_refresh_token(refresh_token: str, db: Session =
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+
+    if await revocation_store.is_revoked(token_id(payload, refresh_token)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
         
-    user = get_user(db, office_name=office_name)
+    user = await get_user_async(db, office_name=office_name)
     if user is None:
         raise credentials_exception
     return user
 
 def log_user_activity(office_name: str, activity: str):
-    """Log user activity."""
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    with open(f"{log_dir}/user_logs.txt", "a") as f:
-        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-        f.write(f"{timestamp} - {office_name}: {activity}\n")
+    """Log user activity. Only enqueues the record; never blocks on disk I/O."""
+    audit_logger.info(activity, extra={"event": "user_activity", "office_name": office_name})
 
 # Role-Based Access Control
 
 def require_role(allowed_roles: List[str]):
     """Decorator to require specific roles for endpoint access."""
-    async def role_checker(current_user: UserDB = Depends(get_current_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -156,7 +400,7 @@ def require_role(allowed_roles: List[str]):
         return current_user
     return role_checker
 
-async def require_super_admin(current_user: UserDB = Depends(get_current_user)):
+async def require_super_admin(current_user: Principal = Depends(get_current_user)):
     """Require super admin role."""
     if current_user.role != "super_admin":
         raise HTTPException(
@@ -165,7 +409,16 @@ async def require_super_admin(current_user: UserDB = Depends(get_current_user)):
         )
     return current_user
 
-async def require_ministry_admin(current_user: UserDB = Depends(get_current_user)):
+async def require_finance_office(current_user: Principal = Depends(get_current_user)):
+    """Require the Finance Office account or a super admin."""
+    if current_user.role != "super_admin" and current_user.office_name != "FinanceOffice":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Finance Office access required"
+        )
+    return current_user
+
+async def require_ministry_admin(current_user: Principal = Depends(get_current_user)):
     """Require ministry admin or super admin role."""
     if current_user.role not in ["super_admin", "ministry_admin"]:
         raise HTTPException(
@@ -174,7 +427,7 @@ async def require_ministry_admin(current_user: UserDB = Depends(get_current_user
         )
     return current_user
 
-async def require_ministry_access(current_user: UserDB = Depends(get_current_user)):
+async def require_ministry_access(current_user: Principal = Depends(get_current_user)):
     """Require any ministry role (officer or admin) or super admin."""
     if current_user.role not in ["super_admin", "ministry_admin", "ministry_officer"]:
         raise HTTPException(
@@ -183,7 +436,7 @@ async def require_ministry_access(current_user: UserDB = Depends(get_current_use
         )
     return current_user
 
-def check_ministry_permission(user: UserDB, ministry_id: int) -> bool:
+def check_ministry_permission(user: Principal, ministry_id: int) -> bool:
     """Check if user has permission to access specific ministry."""
     # Super admins can access all ministries
     if user.role == "super_admin":
@@ -195,7 +448,7 @@ def check_ministry_permission(user: UserDB, ministry_id: int) -> bool:
     
     return False
 
-async def verify_ministry_access(ministry_id: int, current_user: UserDB = Depends(get_current_user)):
+async def verify_ministry_access(ministry_id: int, current_user: Principal = Depends(get_current_user)):
     """Verify user has access to specific ministry."""
     if not check_ministry_permission(current_user, ministry_id):
         raise HTTPException(
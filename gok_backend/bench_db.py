@@ -0,0 +1,210 @@
+# bench_db.py
+# Mixed read/write latency under concurrency: sync Session inside coroutines (the old
+# handlers) vs. AsyncSession on aiosqlite, with and without the storage profile from
+# database.py (WAL pragmas, a writer pool of DB_WRITE_POOL_SIZE, read-only reader pool),
+# and the profile with a single writer connection. Also measures how late a 10 ms
+# "WebSocket heartbeat" fires, since anything that blocks the loop delays broadcasts too.
+#
+# Every configuration runs against its own copy of the same seeded database, in a
+# rotating order, and each metric is the median over --repeat rounds.
+#
+# Usage: python bench_db.py [--requests 2000] [--rate 400] [--write-ratio 0.2] [--seed-rows 5000] [--repeat 3]
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import DB_WRITE_POOL_SIZE, make_async_engine
+from models import Base, TaxPaymentDB
+
+TAX_TYPES = ["income", "vat", "corporate", "property", "excise"]
+
+def payment_row(i: int) -> dict:
+    return {
+        "receipt_number": f"BENCH-{i:08d}",
+        "taxpayer_name": f"Taxpayer {i}",
+        "id_number": str(10000000 + i),
+        "tax_type": random.choice(TAX_TYPES),
+        "amount": round(random.uniform(100, 100000), 2),
+        "payment_method": "M-Pesa",
+        "status": "completed",
+        "created_at": datetime.utcnow(),
+    }
+
+def make_database(seed_rows: int) -> str:
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(TaxPaymentDB), [payment_row(i) for i in range(seed_rows)])
+    engine.dispose()
+    return path
+
+def fresh_copy(template: str) -> str:
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    shutil.copyfile(template, path)
+    return path
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+class Workload:
+    def __init__(self, requests: int, rate: float, write_ratio: float):
+        self.requests = requests
+        self.rate = rate
+        self.write_ratio = write_ratio
+        self.next_id = 10_000_000
+
+    def new_row(self) -> dict:
+        self.next_id += 1
+        return payment_row(self.next_id)
+
+async def sync_op(Session, workload: Workload, write: bool):
+    db = Session()
+    try:
+        if write:
+            db.add(TaxPaymentDB(**workload.new_row()))
+            db.commit()
+        else:
+            db.execute(
+                select(TaxPaymentDB).where(TaxPaymentDB.tax_type == random.choice(TAX_TYPES))
+                .order_by(TaxPaymentDB.created_at.desc()).limit(50)
+            ).scalars().all()
+    finally:
+        db.close()
+
+async def async_op(AsyncSession, workload: Workload, write: bool):
+    async with AsyncSession() as db:
+        if write:
+            db.add(TaxPaymentDB(**workload.new_row()))
+            await db.commit()
+        else:
+            (await db.execute(
+                select(TaxPaymentDB).where(TaxPaymentDB.tax_type == random.choice(TAX_TYPES))
+                .order_by(TaxPaymentDB.created_at.desc()).limit(50)
+            )).scalars().all()
+
+async def split_op(sessions, workload: Workload, write: bool):
+    """Writes go to the single writer connection, reads to the read-only pool."""
+    AsyncWriteSession, AsyncReadSession = sessions
+    await async_op(AsyncWriteSession if write else AsyncReadSession, workload, write)
+
+async def measure(op, session_factory, workload: Workload):
+    """Open-loop load: requests arrive on a fixed schedule, and latency is counted
+    from the scheduled arrival, so time spent queued behind a blocked loop shows up."""
+    reads, writes, heartbeat_delays = [], [], []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        interval = 0.01
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            heartbeat_delays.append(time.perf_counter() - started - interval)
+
+    async def request(arrival: float, write: bool):
+        await op(session_factory, workload, write)
+        (writes if write else reads).append(time.perf_counter() - arrival)
+
+    ticker = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    tasks = []
+    for i in range(workload.requests):
+        arrival = started + i / workload.rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(arrival, random.random() < workload.write_ratio)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    return {
+        "ops/s": workload.requests / elapsed,
+        "read p50": percentile(reads, 0.50) if reads else 0.0,
+        "read p99": percentile(reads, 0.99) if reads else 0.0,
+        "write p50": percentile(writes, 0.50) if writes else 0.0,
+        "write p99": percentile(writes, 0.99) if writes else 0.0,
+        "heartbeat p99": percentile(heartbeat_delays, 0.99) if heartbeat_delays else 0.0,
+    }
+
+def configurations(connections: int):
+    """name -> factory taking a database path and returning (op, session factory, engines)."""
+    def plain_sync(path):
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                               pool_size=connections, max_overflow=0)
+        return sync_op, sessionmaker(bind=engine), [engine]
+
+    def plain_async(path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=connections, max_overflow=0)
+        return async_op, async_sessionmaker(bind=engine, expire_on_commit=False), [engine]
+
+    def profiled(writers):
+        def build(path):
+            write_engine = make_async_engine(path, pool_size=writers)
+            read_engine = make_async_engine(path, read_only=True, pool_size=connections)
+            sessions = (async_sessionmaker(bind=write_engine, expire_on_commit=False),
+                        async_sessionmaker(bind=read_engine, expire_on_commit=False))
+            return split_op, sessions, [write_engine, read_engine]
+        return build
+
+    return {
+        "sync": plain_sync,
+        "async": plain_async,
+        f"profile, {DB_WRITE_POOL_SIZE}w": profiled(DB_WRITE_POOL_SIZE),
+        "profile, 1w": profiled(1),
+    }
+
+async def run(args):
+    template = make_database(args.seed_rows)
+    configs = configurations(args.connections)
+    names = list(configs)
+    rounds = {name: [] for name in names}
+
+    print(f"requests={args.requests} at {args.rate}/s, write ratio={args.write_ratio}, "
+          f"seed rows={args.seed_rows}, median of {args.repeat} (latencies in ms)")
+    for round_number in range(args.repeat):
+        # Rotate the order so no configuration always runs first (cold cache) or last
+        offset = round_number % len(names)
+        for name in names[offset:] + names[:offset]:
+            op, session_factory, engines = configs[name](fresh_copy(template))
+            workload = Workload(args.requests, args.rate, args.write_ratio)
+            try:
+                rounds[name].append(await measure(op, session_factory, workload))
+            finally:
+                for engine in engines:
+                    result = engine.dispose()
+                    if asyncio.iscoroutine(result):
+                        await result
+
+    results = {
+        name: {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        for name, runs in rounds.items()
+    }
+    print(f"{'metric':>14} | " + " | ".join(f"{name:>14}" for name in results))
+    for key in results["sync"]:
+        print(f"{key:>14} | " + " | ".join(f"{r[key]:>14.1f}" for r in results.values()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mixed read/write latency, sync vs async sessions")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=400, help="arrivals per second")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="rounds; each metric is the median")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
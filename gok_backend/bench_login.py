@@ -0,0 +1,125 @@
+# bench_login.py
+# Login throughput vs. concurrency: bcrypt inline on the event loop vs. on the hashing pool.
+# Runs on the API's engine setup (read-only pool plus the shared writer), and
+# reports how long a concurrent write waits for a writer connection meanwhile.
+#
+# Usage: python bench_login.py [--rounds 10] [--logins 64] [--concurrency 1 4 16 64]
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import bcrypt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+from database import DB_WRITE_POOL_SIZE, make_async_engine, make_engine
+from models import Base, UserDB
+
+PASSWORD = "bench-password"
+
+class Engines:
+    """Session factories built the way database.py builds the API's."""
+
+    def __init__(self, path: str):
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=make_engine(path))
+        self.AsyncWrite = async_sessionmaker(
+            bind=make_async_engine(path, pool_size=DB_WRITE_POOL_SIZE), expire_on_commit=False
+        )
+        self.AsyncRead = async_sessionmaker(bind=make_async_engine(path, read_only=True), expire_on_commit=False)
+
+def make_database(rounds: int) -> Engines:
+    """Create a throwaway SQLite database holding one user."""
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    engines = Engines(path)
+    Base.metadata.create_all(bind=engines.Session.kw["bind"])
+    db = engines.Session()
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    db.add(UserDB(office_name="BenchOffice", wallet_address="0xbench", hashed_password=hashed))
+    db.commit()
+    db.close()
+    return engines
+
+async def login_inline(engines: Engines):
+    """The old code path: bcrypt.checkpw directly inside the coroutine."""
+    db = engines.Session()
+    try:
+        user = auth.get_user(db, "BenchOffice")
+        return auth.verify_password(PASSWORD, user.hashed_password)
+    finally:
+        db.close()
+
+async def login_pooled(engines: Engines):
+    """What POST /token does: read session for the lookup, writer only to rehash."""
+    async with engines.AsyncRead() as db:
+        return await auth.authenticate_user(db, "BenchOffice", PASSWORD, engines.AsyncWrite)
+
+async def measure(login, engines: Engines, logins: int, concurrency: int):
+    """Return (logins per second, worst event-loop stall in ms, worst writer wait in ms)."""
+    worst_stall = 0.0
+    worst_write = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal worst_stall
+        interval = 0.005
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            worst_stall = max(worst_stall, time.perf_counter() - started - interval)
+
+    async def writer_probe():
+        # Stands in for a write endpoint (e.g. POST /reports) arriving during the logins
+        nonlocal worst_write
+        while not done.is_set():
+            started = time.perf_counter()
+            async with engines.AsyncWrite() as db:
+                await db.execute(text("SELECT 1"))
+            worst_write = max(worst_write, time.perf_counter() - started)
+            await asyncio.sleep(0.02)
+
+    remaining = logins
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            assert await login(engines)
+
+    ticker = asyncio.create_task(heartbeat())
+    probe = asyncio.create_task(writer_probe())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    await probe
+    return logins / elapsed, worst_stall * 1000, worst_write * 1000
+
+async def run(rounds: int, logins: int, concurrency_levels):
+    auth.BCRYPT_ROUNDS = rounds  # keep the benchmark user's hash current
+    engines = make_database(rounds)
+    print(f"bcrypt rounds={rounds}, logins per run={logins}, pool workers={auth.hashing_pool.workers}")
+    print(f"{'concurrency':>11} | {'inline/s':>9} {'stall ms':>9} {'write ms':>9} | "
+          f"{'pooled/s':>9} {'stall ms':>9} {'write ms':>9}")
+    for concurrency in concurrency_levels:
+        inline = await measure(login_inline, engines, logins, concurrency)
+        pooled = await measure(login_pooled, engines, logins, concurrency)
+        print(f"{concurrency:>11} | {inline[0]:>9.1f} {inline[1]:>9.1f} {inline[2]:>9.1f} | "
+              f"{pooled[0]:>9.1f} {pooled[1]:>9.1f} {pooled[2]:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput against concurrency")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds, args.logins, args.concurrency))
+
+if __name__ == "__main__":
+    main()
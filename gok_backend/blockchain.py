@@ -1,9 +1,14 @@
 # blockchain.py
 
 import hashlib
+import itertools
 import time
-from typing import List, Dict, Any
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Set, Tuple
 from utils import notify_user
+from audit import get_logger
+
+logger = get_logger("blockchain")
 
 class Block:
     def __init__(self, block_id: str, timestamp: str, previous_hash: str, transactions: List[Dict[str, Any]], validator: str):
@@ -23,9 +28,30 @@ class Block:
         return hashlib.sha256(block_string.encode()).hexdigest()
 
 class Blockchain:
+    """In-memory chain plus per-wallet balance bookkeeping.
+
+    `_balances` holds each wallet's confirmed balance, updated as blocks are
+    sealed, so balance lookups are O(1) instead of a scan of the chain.
+    `_reserved` holds what each wallet has in pending (admitted but not yet
+    sealed) transactions: admission deducts it, sealing moves it into the
+    confirmed balance. Admission and sealing never await, so concurrent
+    requests on the event loop can't both spend the same funds.
+
+    `_history` keeps, per wallet, the height of every block that touched it
+    and the balance after that block; `_block_times` keeps each block's
+    timestamp. Both only grow in order, so a balance as of any height or
+    time is a binary search instead of a replay of the chain.
+    """
+
     def __init__(self):
         self.chain: List[Block] = []
         self.pending_transactions: List[Dict[str, Any]] = []  # This is the correct name
+        self._transaction_counter = itertools.count()
+        self._balances: Dict[str, float] = {}
+        self._reserved: Dict[str, float] = {}
+        self._history: Dict[str, Tuple[List[int], List[float]]] = {}  # wallet -> (heights, balance after each)
+        self._block_times: List[str] = []
+        self._listeners: List[Callable[[Block], None]] = []
         self.create_genesis_block()
 
     def create_genesis_block(self):
@@ -37,66 +63,155 @@ class Blockchain:
             validator="SYSTEM"
         )
         self.chain.append(genesis_block)
+        self._seal(genesis_block)
 
-    def add_transaction(self, transaction: Dict[str, Any]) -> bool:
-        try:
-            # Extended required fields
-            required_fields = ["sender", "recipient", "amount"]
-            optional_fields = ["purpose", "approved_by", "extra_info", "ministry_id", "project_id", "category", "ministry_name"]
-            
-            if not all(field in transaction for field in required_fields):
-                print("Missing required fields")
-                return False
+    def _seal(self, block: Block):
+        """Move a newly chained block's amounts from reserved to confirmed."""
+        touched: Set[str] = set()
+        for transaction in block.transactions:
+            sender, recipient, amount = transaction["sender"], transaction["recipient"], transaction["amount"]
+            self._balances[sender] = self._balances.get(sender, 0.0) - amount
+            self._balances[recipient] = self._balances.get(recipient, 0.0) + amount
+            self._release(sender, amount)
+            touched.update((sender, recipient))
+        height = len(self.chain) - 1
+        self._block_times.append(block.timestamp)
+        for wallet in touched:
+            heights, balances = self._history.setdefault(wallet, ([], []))
+            heights.append(height)
+            balances.append(self._balances[wallet])
+        for listener in self._listeners:
+            try:
+                listener(block)
+            except Exception as e:
+                logger.exception("Block listener failed: %s", e, extra={"block_id": block.block_id})
+
+    def add_listener(self, listener: Callable[[Block], None]):
+        """Call `listener(block)` for every block sealed from now on. It runs inline, so keep it cheap."""
+        self._listeners.append(listener)
+
+    def _reserve(self, sender: str, amount: float):
+        if sender != "SYSTEM" and amount > 0:
+            self._reserved[sender] = self._reserved.get(sender, 0.0) + amount
+
+    def _release(self, sender: str, amount: float):
+        if sender in self._reserved and amount > 0:
+            remaining = self._reserved[sender] - amount
+            if remaining > 1e-9:
+                self._reserved[sender] = remaining
+            else:
+                del self._reserved[sender]
+
+    def reserved_balance(self, wallet: str) -> float:
+        """Total of the wallet's outgoing transactions that are admitted but not yet sealed."""
+        return self._reserved.get(wallet, 0.0)
+
+    def available_balance(self, wallet: str) -> float:
+        """Confirmed balance less what pending transactions will take out."""
+        return self.calculate_wallet_balance(wallet) - self.reserved_balance(wallet)
+
+    def _new_transaction(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalise a submitted transaction; raises KeyError/ValueError/TypeError if malformed."""
+        # Extended required fields
+        required_fields = ["sender", "recipient", "amount"]
+        optional_fields = ["purpose", "approved_by", "extra_info", "ministry_id", "project_id", "category", "ministry_name"]
+        
+        if not all(field in transaction for field in required_fields):
+            raise ValueError("Missing required fields")
+
+        # Convert amount to float
+        amount = float(transaction["amount"])
 
-            # Convert amount to float
-            amount = float(transaction["amount"])
-
-            # Allow negative amounts but ensure sender has sufficient balance
-            if transaction["sender"] != "SYSTEM":
-                sender_balance = self.calculate_wallet_balance(transaction["sender"])
-                if sender_balance + amount < 0:
-                    print(f"Insufficient balance: {sender_balance} + {amount} < 0")
-                    return False
-
-            # Create transaction with enhanced details including ministry fields
-            new_transaction = {
-                "sender": transaction["sender"],
-                "recipient": transaction["recipient"],
-                "amount": amount,
-                "timestamp": transaction.get("timestamp") or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                "date": time.strftime("%Y-%m-%d", time.gmtime()),
-                "purpose": transaction.get("purpose", "No purpose specified"),
-                "approved_by": transaction.get("approved_by", "Not specified"),
-                "extra_info": transaction.get("extra_info", ""),
-                "transaction_id": hashlib.sha256(f"{time.time()}{transaction['sender']}{transaction['recipient']}".encode()).hexdigest()[:16],
-                # Ministry-specific fields
-                "ministry_id": transaction.get("ministry_id"),
-                "ministry_name": transaction.get("ministry_name"),
-                "project_id": transaction.get("project_id"),
-                "category": transaction.get("category", "general"),
-                "expense_request_id": transaction.get("expense_request_id")
-            }
-
-            self.pending_transactions.append(new_transaction)
+        # Create transaction with enhanced details including ministry fields
+        return {
+            "sender": transaction["sender"],
+            "recipient": transaction["recipient"],
+            "amount": amount,
+            "timestamp": transaction.get("timestamp") or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "date": time.strftime("%Y-%m-%d", time.gmtime()),
+            "purpose": transaction.get("purpose", "No purpose specified"),
+            "approved_by": transaction.get("approved_by", "Not specified"),
+            "extra_info": transaction.get("extra_info", ""),
+            # The counter keeps ids distinct when a batch shares sender, recipient and clock tick
+            "transaction_id": hashlib.sha256(
+                f"{time.time()}{transaction['sender']}{transaction['recipient']}{next(self._transaction_counter)}".encode()
+            ).hexdigest()[:16],
+            # Ministry-specific fields
+            "ministry_id": transaction.get("ministry_id"),
+            "ministry_name": transaction.get("ministry_name"),
+            "project_id": transaction.get("project_id"),
+            "category": transaction.get("category", "general"),
+            "expense_request_id": transaction.get("expense_request_id")
+        }
+
+    def _has_sufficient_balance(self, transaction: Dict[str, Any], batch_spent: Dict[str, float]) -> bool:
+        sender = transaction["sender"]
+        if sender == "SYSTEM":
             return True
+        amount = transaction["amount"]
+        available = self.available_balance(sender) - batch_spent.get(sender, 0.0)
+        if available < amount:
+            logger.warning("Insufficient balance: %s available for %s", available, amount,
+                           extra={"wallet_address": sender})
+            return False
+        if amount > 0:
+            batch_spent[sender] = batch_spent.get(sender, 0.0) + amount
+        return True
+
+    def add_transaction(self, transaction: Dict[str, Any], require_funds: bool = True) -> bool:
+        return self.add_transactions([transaction], require_funds)
+
+    def add_transactions(self, transactions: List[Dict[str, Any]], require_funds: bool = True) -> bool:
+        """Queue several transactions for the next block: all of them, or none if any is invalid.
 
+        Each sender must have the full amount available (confirmed minus
+        reserved, less what earlier items in the batch spend). Budget flows
+        pass `require_funds=False`: their limits are enforced against the
+        ministry records, and the treasury wallet issues funds it never
+        received on chain. Admitted amounts are reserved until the block is
+        sealed either way.
+        """
+        try:
+            new_transactions = [self._new_transaction(transaction) for transaction in transactions]
         except (KeyError, ValueError, TypeError) as e:
-            print(f"Invalid transaction: {e}")
+            logger.warning("Invalid transaction: %s", e)
+            return False
+
+        batch_spent: Dict[str, float] = {}
+        if require_funds and not all(self._has_sufficient_balance(transaction, batch_spent)
+                                     for transaction in new_transactions):
             return False
 
+        for transaction in new_transactions:
+            self._reserve(transaction["sender"], transaction["amount"])
+        self.pending_transactions.extend(new_transactions)
+        return True
+
+    def _abandon(self, transactions: List[Dict[str, Any]]):
+        """Drop transactions whose block was never sealed and release what they reserved."""
+        abandoned = {transaction["transaction_id"] for transaction in transactions}
+        self.pending_transactions = [transaction for transaction in self.pending_transactions
+                                     if transaction["transaction_id"] not in abandoned]
+        for transaction in transactions:
+            self._release(transaction["sender"], transaction["amount"])
+
     async def mine_block(self, miner_address, active_connections):
+        transactions = self.pending_transactions
+        sealed = False
         try:
             block = Block(
                 block_id=str(len(self.chain)),
                 timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
                 previous_hash=self.chain[-1].current_hash if self.chain else "0",
-                transactions=self.pending_transactions,
+                transactions=transactions,
                 validator=miner_address
             )
             
             # Add block to chain and clear pending transactions
             self.chain.append(block)
             self.pending_transactions = []
+            self._seal(block)
+            sealed = True
             
             # Broadcast the new block to all connected clients
             if active_connections:
@@ -118,7 +233,7 @@ class Blockchain:
                     try:
                         await connection.send_json(message)
                     except Exception as e:
-                        print(f"Failed to send to {wallet_address}: {e}")
+                        logger.info("Failed to send to %s: %s", wallet_address, e)
                         disconnected_clients.append(wallet_address)
                 
                 # Remove disconnected clients
@@ -127,8 +242,12 @@ class Blockchain:
             
             return block
         except Exception as e:
-            print(f"Error mining block: {e}")
+            logger.exception("Error mining block: %s", e)
             raise
+        finally:
+            # Callers report a failed mine as failed, so its transactions must not linger
+            if not sealed:
+                self._abandon(transactions)
 
     def get_all_wallet_balances(self) -> Dict[str, float]:
         balances = {}
@@ -162,14 +281,20 @@ class Blockchain:
         return balances
 
     def calculate_wallet_balance(self, wallet: str) -> float:
-        balance = 0.0
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction["sender"] == wallet:
-                    balance -= transaction["amount"]  # Deduct amount sent
-                if transaction["recipient"] == wallet:
-                    balance += transaction["amount"]  # Add amount received
-        return balance
+        """Confirmed balance: received minus sent over every sealed block."""
+        return self._balances.get(wallet, 0.0)
+
+    def height_at(self, timestamp: str) -> int:
+        """Height of the last block sealed at or before `timestamp` ("%Y-%m-%dT%H:%M:%SZ"), or -1."""
+        return bisect_right(self._block_times, timestamp) - 1
+
+    def balance_at(self, wallet: str, height: int) -> float:
+        """Confirmed balance as of the end of block `height`."""
+        history = self._history.get(wallet)
+        if not history:
+            return 0.0
+        index = bisect_right(history[0], height)
+        return history[1][index - 1] if index else 0.0
 
     def get_transactions_for_wallet(self, wallet: str) -> List[Dict[str, Any]]:
         transactions = []
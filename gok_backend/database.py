@@ -1,18 +1,102 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from models import Base
 
-# Database URL with SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./gok_db.sqlite"
+# Database file with SQLite
+DATABASE_PATH = "./gok_db.sqlite"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
 
-# Create the engine (check_same_thread=False is needed for SQLite with FastAPI)
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Storage profile applied to every connection. WAL lets readers keep going
+# while a write is in progress; synchronous=NORMAL is durable across app
+# crashes under WAL and only risks the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -64000,         # KiB (negative), ~64 MB page cache per connection
+    "mmap_size": 268435456,       # 256 MB memory-mapped reads
+    "busy_timeout": 5000,         # ms to wait for the write lock before failing
+    "temp_store": "MEMORY",
+}
+
+# Read-only connections kept open for read endpoints
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+# Connections of the shared async writer engine. SQLite still runs one write
+# transaction at a time (busy_timeout queues the rest); the extra connections
+# let a request's session and the short side transactions it triggers
+# (receipt reservations, idempotency claims) proceed without waiting on each
+# other. With a single connection those would deadlock, and bench_db.py shows
+# no tail-latency gain from one anyway (its "profile, 1w" column).
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "4"))
+
+def apply_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # journal_mode is stored in the file, so only the writer sets it
+            cursor.execute("PRAGMA journal_mode=WAL")
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_sqlite_engine(engine, read_only: bool = False):
+    """Apply the storage profile to each new connection of `engine` (sync or async)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, read_only=read_only)
+
+    return engine
+
+def _read_only_url(driver: str, path: str) -> str:
+    return f"{driver}:///file:{path}?mode=ro&uri=true"
+
+def make_engine(path: str = DATABASE_PATH, read_only: bool = False, **kwargs):
+    """Sync engine with the storage profile: one writer connection, or a read-only pool."""
+    url = _read_only_url("sqlite", path) if read_only else f"sqlite:///{path}"
+    kwargs.setdefault("pool_size", DB_READ_POOL_SIZE if read_only else 1)
+    kwargs.setdefault("max_overflow", 0)
+    # check_same_thread=False is needed for SQLite with FastAPI
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+    return configure_sqlite_engine(engine, read_only=read_only)
+
+def make_async_engine(path: str = DATABASE_PATH, read_only: bool = False, **kwargs):
+    """Async (aiosqlite) counterpart of make_engine."""
+    url = _read_only_url("sqlite+aiosqlite", path) if read_only else f"sqlite+aiosqlite:///{path}"
+    kwargs.setdefault("pool_size", DB_READ_POOL_SIZE if read_only else 1)
+    kwargs.setdefault("max_overflow", 0)
+    engine = create_async_engine(url, **kwargs)
+    return configure_sqlite_engine(engine, read_only=read_only)
+
+# Writer engines. The API writes only through async_engine, which every
+# writer in the process shares (endpoints, receipt allocator, idempotency
+# store, background tasks). The sync engine is for scripts and create_all;
+# it opens no connection until one of those uses it.
+engine = make_engine()
+async_engine = make_async_engine(pool_size=DB_WRITE_POOL_SIZE)
+
+# Reader engines: read-only connections used by read endpoints
+read_engine = make_engine(read_only=True)
+async_read_engine = make_async_engine(read_only=True)
 
 # Create a SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# aiosqlite runs each statement on its own thread, so a slow query doesn't stall
+# the event loop. That thread hop isn't free: on the small queries in bench_db.py
+# the async sessions have higher p50/p99 than sync ones, and the loop stays only
+# slightly more responsive. Don't expect them to be faster per request.
+# expire_on_commit=False so attributes stay readable after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Dependency to get the database session
 def get_db():
@@ -22,6 +106,24 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get a read-only database session
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency to get an async read-only session; use it for endpoints that never write
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 # Initialize the database
 def init_db():
     try:
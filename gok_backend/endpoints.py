@@ -1,27 +1,37 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import time
 from models import UserDB
-from schemas import User, UserRegister, Token, RefreshToken, Transaction, Report, ReportUpdate
+from schemas import User, UserRegister, Token, RefreshToken, Transaction, TransactionBatch, Report, ReportUpdate
 from auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
+    Principal,
     authenticate_user,
+    access_token_claims,
     create_access_token,
     create_refresh_token,
     get_current_user,
     get_current_user_from_refresh_token,
+    require_super_admin,
     log_user_activity,
     generate_wallet_address,
-    get_password_hash,
-    revoked_tokens,
+    get_password_hash_async,
+    revoke_access_token,
     oauth2_scheme,
 )
 from blockchain import Blockchain
-from database import get_db
+from hashing import hashing_pool, HashingPoolBusy
+from database import get_async_db, get_async_read_db
 from connections import active_connections
+from audit import get_logger
+from utils import decode_cursor, decode_sequence_cursor, encode_cursor, encode_sequence_cursor
+from idempotency import IdempotentRequest, idempotent_request
+from flows import is_project_address
 
 app = FastAPI()
 router = APIRouter()
@@ -40,10 +50,15 @@ app.add_middleware(
 # Initialize blockchain
 blockchain = Blockchain()
 
+logger = get_logger("endpoints")
+
+# Largest page GET /reports will return
+REPORT_PAGE_LIMIT = 500
+
 # Endpoints
 @router.post("/register", response_model=dict)
-async def register_user(user: UserRegister, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.office_name == user.office_name).first()
+async def register_user(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(UserDB).where(UserDB.office_name == user.office_name))).scalars().first()
     if db_user: 
         raise HTTPException(status_code=400, detail="Office name already registered")
 
@@ -51,11 +66,18 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
     wallet_address = generate_wallet_address()
 
     # Check if wallet address is unique
-    db_user = db.query(UserDB).filter(UserDB.wallet_address == wallet_address).first()
+    db_user = (await db.execute(select(UserDB).where(UserDB.wallet_address == wallet_address))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Wallet address already exists")
 
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except HashingPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
     db_user = UserDB(
         office_name=user.office_name,
         wallet_address=wallet_address,
@@ -65,8 +87,8 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
     )
     db.add(db_user)
     try:
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         log_user_activity(user.office_name, "Registered new account")
         return {
             "message": "User registered successfully",
@@ -75,14 +97,21 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
             "ministry_id": db_user.ministry_id
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # ... (rest of the endpoints)
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(user: User, db: Session = Depends(get_db)):
-    authenticated_user = authenticate_user(db, user.office_name, user.password)
+async def login_for_access_token(user: User, db: AsyncSession = Depends(get_async_read_db)):
+    try:
+        authenticated_user = await authenticate_user(db, user.office_name, user.password)
+    except HashingPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
     if not authenticated_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -92,7 +121,7 @@ async def login_for_access_token(user: User, db: Session = Depends(get_db)):
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": authenticated_user.office_name}, expires_delta=access_token_expires
+        data=access_token_claims(authenticated_user), expires_delta=access_token_expires
     )
 
     refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
@@ -112,11 +141,11 @@ async def login_for_access_token(user: User, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh-token", response_model=Token)
-async def refresh_token(refresh_token: RefreshToken, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: RefreshToken, db: AsyncSession = Depends(get_async_read_db)):
     user = await get_current_user_from_refresh_token(refresh_token.refresh_token, db)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.office_name}, expires_delta=access_token_expires
+        data=access_token_claims(user), expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
@@ -126,33 +155,97 @@ async def refresh_token(refresh_token: RefreshToken, db: Session = Depends(get_d
         "office_name": user.office_name
     }
 
+@router.get("/metrics/hashing")
+async def get_hashing_metrics(current_user: Principal = Depends(require_super_admin)):
+    """Password hashing pool utilisation (queue depth, running and rejected jobs). Super Admin only."""
+    return hashing_pool.stats()
+
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
-    # Check if the token has already been revoked
-    if token in revoked_tokens:
+    # Revoke the token until it expires; fails if it was already revoked
+    if not await revoke_access_token(token):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Token has already been revoked"
         )
 
-    # Add the token to the revoked tokens set
-    revoked_tokens.add(token)
-
     return {"message": "Successfully logged out"}
 
  
 @router.get("/balance/")
-async def get_balance(current_user: UserDB = Depends(get_current_user)):
+async def get_balance(current_user: Principal = Depends(get_current_user)):
     balance = blockchain.calculate_wallet_balance(current_user.wallet_address)
     log_user_activity(current_user.office_name, f"Checked balance: {balance}")
-    return {"balance": balance}
+    return {
+        "balance": balance,
+        "pending_outgoing": blockchain.reserved_balance(current_user.wallet_address),
+        "available_balance": blockchain.available_balance(current_user.wallet_address)
+    }
+
+@router.get("/balance/{wallet}")
+async def get_balance_at(
+    wallet: str,
+    at_block: Optional[int] = Query(None, ge=0),
+    at: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Confirmed balance of any wallet as of the end of block `at_block`, or of
+    the last block sealed at or before `at` (UTC unless it has an offset).
+    With neither, as of the latest block.
+    """
+    if at_block is not None and at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either at_block or at, not both"
+        )
+    tip = len(blockchain.chain) - 1
+    if at_block is not None:
+        if at_block > tip:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Block {at_block} has not been mined yet; the chain ends at block {tip}"
+            )
+        height = at_block
+    elif at is not None:
+        if at.tzinfo is not None:
+            at = at.astimezone(timezone.utc)
+        height = blockchain.height_at(at.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    else:
+        height = tip
+
+    block = blockchain.chain[height] if height >= 0 else None
+    return {
+        "wallet": wallet,
+        "balance": blockchain.balance_at(wallet, height),
+        "block_id": block.block_id if block else None,
+        "block_timestamp": block.timestamp if block else None
+    }
+
+def blockchain_transaction_for(sender: str, transaction: Transaction) -> dict:
+    """Create blockchain transaction with enhanced details."""
+    return {
+        "sender": sender,
+        "recipient": transaction.recipient,
+        "amount": float(transaction.amount),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "purpose": getattr(transaction, 'purpose', 'No purpose specified'),
+        "approved_by": getattr(transaction, 'approved_by', 'Not specified'),
+        "extra_info": getattr(transaction, 'extra_info', ''),
+        "date": time.strftime("%Y-%m-%d", time.gmtime())
+    }
 
 @router.post("/send/")
 async def send_funds(
     transaction: Transaction,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
+    # A retry with the same Idempotency-Key gets the original result
+    if idempotency.replay is not None:
+        return idempotency.replay
+
     try:
         # Validate transaction amount
         if transaction.amount <= 0:
@@ -160,18 +253,22 @@ async def send_funds(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Amount must be positive"
             )
+        # project:{id} nodes in the fund-flow graph come only from approved expenses
+        if is_project_address(transaction.recipient):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Recipient cannot be a project address"
+            )
 
-        # Create blockchain transaction with enhanced details
-        blockchain_transaction = {
-            "sender": current_user.wallet_address,
-            "recipient": transaction.recipient,
-            "amount": float(transaction.amount),
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "purpose": getattr(transaction, 'purpose', 'No purpose specified'),
-            "approved_by": getattr(transaction, 'approved_by', 'Not specified'),
-            "extra_info": getattr(transaction, 'extra_info', ''),
-            "date": time.strftime("%Y-%m-%d", time.gmtime())
-        }
+        blockchain_transaction = blockchain_transaction_for(current_user.wallet_address, transaction)
+
+        # Funds held by other in-flight transfers are not available
+        available = blockchain.available_balance(current_user.wallet_address)
+        if transaction.amount > available:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient balance. Available: {available}, Requested: {transaction.amount}"
+            )
 
         # Add transaction to blockchain
         if not blockchain.add_transaction(blockchain_transaction):
@@ -184,7 +281,7 @@ async def send_funds(
         try:
             await blockchain.mine_block(current_user.wallet_address, active_connections)
         except Exception as e:
-            print(f"Mining error: {str(e)}")
+            logger.exception("Mining error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to mine block: {str(e)}"
@@ -198,24 +295,109 @@ async def send_funds(
         )
         log_user_activity(current_user.office_name, log_message)
 
-        return {
+        return await idempotency.save({
             "message": "Transaction successful",
             "transaction_details": blockchain_transaction
-        }
+        })
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        print(f"Transaction error: {str(e)}")
+        logger.exception("Transaction error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process transaction: {str(e)}"
         )
 
+@router.post("/send/batch")
+async def send_funds_batch(
+    batch: TransactionBatch,
+    current_user: Principal = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
+):
+    """
+    Send many transfers from the current wallet in one request, sealed into one block.
+
+    All or nothing: if any transfer is invalid, or the sender's balance
+    does not cover the total, nothing is sent and the 400 detail carries
+    a result per transfer saying which ones were at fault. Send an
+    Idempotency-Key header to make retries safe.
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+
+    sender = current_user.wallet_address
+    results = [
+        {"index": index, "recipient": transfer.recipient, "amount": transfer.amount, "status": "pending"}
+        for index, transfer in enumerate(batch.transfers)
+    ]
+
+    def reject(message: str, errors: dict):
+        for result in results:
+            if result["index"] in errors:
+                result.update(status="invalid", error=errors[result["index"]])
+            else:
+                result["status"] = "not_sent"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": message, "results": results}
+        )
+
+    errors = {}
+    for index, transfer in enumerate(batch.transfers):
+        if transfer.amount <= 0:
+            errors[index] = "Amount must be positive"
+        elif not transfer.recipient:
+            errors[index] = "Recipient is required"
+        elif transfer.recipient == sender:
+            errors[index] = "Cannot send to your own wallet"
+        elif is_project_address(transfer.recipient):
+            errors[index] = "Recipient cannot be a project address"
+    if errors:
+        reject("Invalid transfers in batch", errors)
+
+    # One balance check for the whole batch, net of other in-flight transfers
+    total = sum(float(transfer.amount) for transfer in batch.transfers)
+    available = blockchain.available_balance(sender)
+    if total > available:
+        reject(f"Insufficient balance. Available: {available}, Requested: {total}", {})
+
+    blockchain_transactions = [blockchain_transaction_for(sender, transfer) for transfer in batch.transfers]
+    if not blockchain.add_transactions(blockchain_transactions):
+        reject("Transaction validation failed", {})
+
+    try:
+        block = await blockchain.mine_block(sender, active_connections)
+    except Exception as e:
+        logger.exception("Mining error: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to mine block: {str(e)}"
+        )
+
+    # Ours are the last ones queued before sealing
+    for result, sealed in zip(results, block.transactions[-len(results):]):
+        result.update(status="sent", transaction_id=sealed["transaction_id"])
+
+    log_user_activity(
+        current_user.office_name,
+        f"Sent {total} to {len(results)} recipients in block {block.block_id}"
+    )
+
+    return await idempotency.save({
+        "message": "Batch successful",
+        "block_id": block.block_id,
+        "block_hash": block.current_hash,
+        "total_amount": total,
+        "results": results
+    })
+
 @router.get("/transactions/")
-async def get_transactions(current_user: UserDB = Depends(get_current_user)):
+async def get_transactions(current_user: Principal = Depends(get_current_user)):
     # Get transactions for the current user's wallet
     transactions = blockchain.get_transactions_for_wallet(current_user.wallet_address)
     return {"transactions": transactions}
@@ -251,12 +433,12 @@ async def get_all_transactions():
     }
 
 @router.get("/users/")
-async def get_all_users(db: Session = Depends(get_db)):
-    users = db.query(UserDB).all()
+async def get_all_users(db: AsyncSession = Depends(get_async_read_db)):
+    users = (await db.execute(select(UserDB))).scalars().all()
     return {"users": [{"office_name": user.office_name, "wallet_address": user.wallet_address} for user in users]}
 
 @router.get("/me/")
-async def get_me(current_user: UserDB = Depends(get_current_user)):
+async def get_me(current_user: Principal = Depends(get_current_user)):
     return {
         "office_name": current_user.office_name,
         "wallet_address": current_user.wallet_address
@@ -284,12 +466,14 @@ async def get_blockchain():
     }
 
 @router.get("/finance-office-wallet")
-async def get_finance_office_wallet(db: Session = Depends(get_db)):
+async def get_finance_office_wallet(db: AsyncSession = Depends(get_async_read_db)):
     """
     Get the FinanceOffice wallet address for tax payments.
     This endpoint is public to allow tax payments from any office.
     """
-    finance_office = db.query(UserDB).filter(UserDB.office_name == "FinanceOffice").first()
+    finance_office = (await db.execute(
+        select(UserDB).where(UserDB.office_name == "FinanceOffice")
+    )).scalars().first()
     if not finance_office:
         raise HTTPException(status_code=404, detail="Finance Office not found")
     
@@ -299,13 +483,19 @@ async def get_finance_office_wallet(db: Session = Depends(get_db)):
     }
 
 @router.post("/reports")
-async def submit_report(report: Report, db: Session = Depends(get_db)):
+async def submit_report(report: Report, db: AsyncSession = Depends(get_async_db)):
     """
     Submit a report about suspicious behavior.
     Public endpoint - no authentication required for citizens to report.
     """
     from models import ReportDB
     
+    if report.report_type == "automated":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Automated reports are only filed by the ledger's anomaly detector"
+        )
+    
     new_report = ReportDB(
         report_type=report.report_type,
         reported_by=report.reported_by,
@@ -316,8 +506,8 @@ async def submit_report(report: Report, db: Session = Depends(get_db)):
     )
     
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await db.refresh(new_report)
     
     return {
         "message": "Report submitted successfully",
@@ -327,11 +517,23 @@ async def submit_report(report: Report, db: Session = Depends(get_db)):
 
 @router.get("/reports")
 async def get_all_reports(
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    status_filter: Optional[str] = Query(None, alias="status"),
+    report_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=REPORT_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    updated_after: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Get all reports. Only accessible by FinanceOffice (admin).
+    Get reports, newest first. Only accessible by FinanceOffice (admin).
+
+    Pass `next_cursor` back as `cursor` for the next page. To poll for
+    changes, pass `sync_cursor` back as `updated_after`: only reports
+    created or updated since then are returned, oldest change first, with
+    a new `sync_cursor`. Changes are ordered by commit (`change_seq`), not
+    by timestamp, so a slow commit can't land behind the cursor. Counts
+    cover every status for the report type.
     """
     if current_user.office_name != "FinanceOffice":
         raise HTTPException(
@@ -341,7 +543,35 @@ async def get_all_reports(
     
     from models import ReportDB
     
-    reports = db.query(ReportDB).order_by(ReportDB.created_at.desc()).all()
+    query = select(ReportDB)
+    counts_query = select(ReportDB.status, func.count(ReportDB.id)).group_by(ReportDB.status)
+    if report_type:
+        query = query.where(ReportDB.report_type == report_type)
+        counts_query = counts_query.where(ReportDB.report_type == report_type)
+    if status_filter:
+        query = query.where(ReportDB.status == status_filter)
+    
+    if updated_after:
+        query = query.where(ReportDB.change_seq > decode_sequence_cursor(updated_after))
+        query = query.order_by(ReportDB.change_seq)
+    else:
+        if cursor:
+            created_at, report_id = decode_cursor(cursor)
+            query = query.where(tuple_(ReportDB.created_at, ReportDB.id) < (created_at, report_id))
+        query = query.order_by(ReportDB.created_at.desc(), ReportDB.id.desc())
+    
+    reports = (await db.execute(query.limit(limit))).scalars().all()
+    counts = dict((await db.execute(counts_query)).all())
+    
+    next_cursor = None
+    if updated_after:
+        sync_cursor = encode_sequence_cursor(reports[-1].change_seq) if reports else updated_after
+    else:
+        if len(reports) == limit:
+            next_cursor = encode_cursor(reports[-1].created_at, reports[-1].id)
+        # Latest change overall, so a poll from here misses nothing
+        latest = (await db.execute(select(func.max(ReportDB.change_seq)))).scalar()
+        sync_cursor = encode_sequence_cursor(latest or 0)
     
     return {
         "reports": [
@@ -354,23 +584,26 @@ async def get_all_reports(
                 "transaction_hash": report.transaction_hash,
                 "status": report.status,
                 "created_at": report.created_at.isoformat(),
+                "updated_at": report.updated_at.isoformat(),
                 "reviewed_by": report.reviewed_by,
                 "admin_notes": report.admin_notes
             }
             for report in reports
         ],
-        "total_reports": len(reports),
-        "pending_count": len([r for r in reports if r.status == "pending"]),
-        "reviewed_count": len([r for r in reports if r.status == "reviewed"]),
-        "resolved_count": len([r for r in reports if r.status == "resolved"])
+        "next_cursor": next_cursor,
+        "sync_cursor": sync_cursor,
+        "total_reports": sum(counts.values()),
+        "pending_count": counts.get("pending", 0),
+        "reviewed_count": counts.get("reviewed", 0),
+        "resolved_count": counts.get("resolved", 0)
     }
 
 @router.put("/reports/{report_id}")
 async def update_report(
     report_id: int,
     report_update: ReportUpdate,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update a report's status. Only accessible by FinanceOffice (admin).
@@ -383,7 +616,7 @@ async def update_report(
     
     from models import ReportDB
     
-    report = db.query(ReportDB).filter(ReportDB.id == report_id).first()
+    report = await db.get(ReportDB, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
@@ -392,8 +625,8 @@ async def update_report(
     if report_update.admin_notes:
         report.admin_notes = report_update.admin_notes
     
-    db.commit()
-    db.refresh(report)
+    await db.commit()
+    await db.refresh(report)
     
     return {
         "message": "Report updated successfully",
@@ -0,0 +1,173 @@
+# flows.py
+# Fund-flow graph over the chain: who paid whom, how much and how often,
+# behind the /flows endpoints. Kept up to date by a block listener, so
+# traversals never rescan the chain.
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+# Expense payments tied to a project go ministry -> project:{id} -> EXPENSE_PAID
+EXPENSE_PAID = "EXPENSE_PAID"
+# Reserved for project nodes: no wallet may send to an address starting with it
+PROJECT_PREFIX = "project:"
+MAX_HOPS = 6
+# Caps so one request can't walk the whole graph
+MAX_PATHS = 100
+MAX_EDGES = 1000
+
+def project_node(project_id: int) -> str:
+    return f"{PROJECT_PREFIX}{project_id}"
+
+def is_project_address(address: str) -> bool:
+    return address.startswith(PROJECT_PREFIX)
+
+def project_id_of(node: str) -> Optional[int]:
+    """The project id of a `project:{id}` node, or None if `node` is not one."""
+    if not is_project_address(node):
+        return None
+    value = node[len(PROJECT_PREFIX):]
+    return int(value) if value.isdigit() else None
+
+class FundFlowGraph:
+    """Adjacency index of the chain's transfers.
+
+    Each edge holds the total amount and the number of transfers from one
+    node to another. Nodes are wallet addresses, the chain's system
+    accounts (SYSTEM, EXPENSE_PAID) and `project:{id}` for projects.
+    Project nodes only come from ministry expense payments; plain transfers
+    to a `project:` address (refused by /send/ since) are left out.
+    Outgoing and incoming edges are both indexed, so walking either way
+    costs the degree of the nodes visited.
+    """
+
+    def __init__(self):
+        self._out: Dict[str, Dict[str, List[float]]] = {}  # node -> {recipient: [amount, count]}
+        self._in: Dict[str, Dict[str, List[float]]] = {}  # node -> {sender: [amount, count]}
+
+    def add_flow(self, source: str, target: str, amount: float):
+        edge = self._out.setdefault(source, {}).get(target)
+        if edge is None:
+            edge = [0.0, 0]
+            self._out[source][target] = edge
+            # Both directions share the same list
+            self._in.setdefault(target, {})[source] = edge
+        edge[0] += amount
+        edge[1] += 1
+
+    def on_block(self, block):
+        for transaction in block.transactions:
+            amount = float(transaction["amount"])
+            if amount <= 0:
+                continue
+            sender, recipient = transaction["sender"], transaction["recipient"]
+            project_id = transaction.get("project_id")
+            if recipient == EXPENSE_PAID and project_id:
+                project = project_node(project_id)
+                self.add_flow(sender, project, amount)
+                self.add_flow(project, recipient, amount)
+            elif not (is_project_address(sender) or is_project_address(recipient)):
+                self.add_flow(sender, recipient, amount)
+
+    def load(self, chain: Iterable):
+        """Index blocks sealed before the listener was registered."""
+        for block in chain:
+            self.on_block(block)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._out or node in self._in
+
+    def _adjacent(self, direction: str) -> Dict[str, Dict[str, List[float]]]:
+        return self._in if direction == "in" else self._out
+
+    def _edge(self, source: str, target: str) -> dict:
+        amount, count = self._out[source][target]
+        return {"from": source, "to": target, "amount": amount, "count": count}
+
+    def top(self, node: str, direction: str = "out", limit: int = 10) -> List[dict]:
+        """Largest counterparties of `node` by total amount: recipients ("out") or senders ("in")."""
+        neighbours = self._adjacent(direction).get(node, {})
+        ranked = sorted(neighbours.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [
+            {"node": other, "amount": amount, "count": count}
+            for other, (amount, count) in ranked
+        ]
+
+    def _distances_to(self, target: str, max_hops: int) -> Dict[str, int]:
+        """Hops from each node to `target` (walking incoming edges), up to `max_hops`."""
+        distances = {target: 0}
+        queue = deque([target])
+        while queue:
+            node = queue.popleft()
+            if distances[node] == max_hops:
+                continue
+            for sender in self._in.get(node, {}):
+                if sender not in distances:
+                    distances[sender] = distances[node] + 1
+                    queue.append(sender)
+        return distances
+
+    def paths(self, source: str, target: str, max_hops: int = 4, limit: int = 20) -> List[dict]:
+        """Simple paths from `source` to `target` of at most `max_hops` edges.
+
+        Only nodes that can still reach `target` in the hops left are
+        explored, larger edges first. Each path reports its bottleneck:
+        the most that can have gone all the way along it.
+        """
+        distances = self._distances_to(target, max_hops)
+        if source not in distances or source == target:
+            return []
+        found = []
+        path = [source]
+        on_path: Set[str] = {source}
+
+        def walk(node: str):
+            if len(found) >= limit:
+                return
+            edges = sorted(self._out.get(node, {}).items(), key=lambda item: item[1][0], reverse=True)
+            for recipient, _ in edges:
+                if recipient in on_path or distances.get(recipient, max_hops + 1) > max_hops - len(path):
+                    continue
+                path.append(recipient)
+                if recipient == target:
+                    found.append(list(path))
+                else:
+                    on_path.add(recipient)
+                    walk(recipient)
+                    on_path.discard(recipient)
+                path.pop()
+                if len(found) >= limit:
+                    return
+
+        walk(source)
+        results = []
+        for nodes in found:
+            edges = [self._edge(a, b) for a, b in zip(nodes, nodes[1:])]
+            results.append({"nodes": nodes, "amount": min(edge["amount"] for edge in edges), "edges": edges})
+        results.sort(key=lambda result: (-result["amount"], len(result["nodes"])))
+        return results
+
+    def neighbourhood(self, node: str, hops: int = 2, direction: str = "out",
+                      max_edges: int = MAX_EDGES) -> dict:
+        """Nodes within `hops` of `node` and the edges walked to reach them (breadth-first)."""
+        adjacent = self._adjacent(direction)
+        distances = {node: 0}
+        edges: List[dict] = []
+        truncated = False
+        queue = deque([node])
+        while queue and not truncated:
+            current = queue.popleft()
+            if distances[current] == hops:
+                continue
+            for other in adjacent.get(current, {}):
+                if len(edges) >= max_edges:
+                    truncated = True
+                    break
+                edges.append(self._edge(current, other) if direction == "out" else self._edge(other, current))
+                if other not in distances:
+                    distances[other] = distances[current] + 1
+                    queue.append(other)
+        return {"node": node, "hops": hops, "direction": direction,
+                "distances": distances, "edges": edges, "truncated": truncated}
+
+# Shared graph, fed by the API's chain from startup
+fund_flows = FundFlowGraph()
@@ -0,0 +1,82 @@
+# hashing.py
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# bcrypt releases the GIL while hashing, so a small thread pool gives real
+# parallelism without the start-up and pickling cost of a process pool.
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASHING_MAX_PENDING = int(os.getenv("HASHING_MAX_PENDING", "64"))
+
+class HashingPoolBusy(Exception):
+    """Raised when too many hashing jobs are already queued."""
+
+class HashingPool:
+    """Bounded thread pool for password hashing.
+
+    Keeps bcrypt off the event loop. `max_pending` caps queued plus running
+    jobs so a login burst fails fast instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int = HASHING_WORKERS, max_pending: int = HASHING_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._lock = threading.Lock()
+        self._pending = 0   # submitted and not yet finished
+        self._running = 0   # currently executing on a worker
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker."""
+        return self._pending - self._running
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._pending - self._running,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._completed += 1
+
+    def _on_done(self, future):
+        if future.cancelled():
+            # Cancelled before a worker picked it up, so _call never ran
+            with self._lock:
+                self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` on the pool and await the result."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashingPoolBusy("Password hashing pool is saturated")
+            self._pending += 1
+        future = self._executor.submit(self._call, fn, *args)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+# Shared pool used by auth.py
+hashing_pool = HashingPool()
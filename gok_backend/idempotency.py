@@ -0,0 +1,196 @@
+# idempotency.py
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from auth import Principal, get_current_user
+from database import AsyncSessionLocal
+from models import IdempotencyKeyDB
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# How long a claimed key stays in flight; a claim left by a crashed worker can be taken over after this
+IDEMPOTENCY_CLAIM_SECONDS = int(os.getenv("IDEMPOTENCY_CLAIM_SECONDS", "300"))
+# Expired rows are deleted once every this many saves
+PURGE_EVERY = 1000
+
+def request_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+class IdempotencyStore:
+    """Responses of money-moving requests, kept under the client's Idempotency-Key.
+
+    A request claims its key by inserting a row with no response yet; the
+    key is the primary key, so across every worker exactly one insert wins.
+    A conflict means the key is in flight (no response) or done (replay the
+    stored one). Only successful responses are stored: a request that
+    failed deletes its claim, so it can be retried with the same key.
+
+    Finished keys are also kept in an in-memory LRU (an OrderedDict capped
+    at `max_entries`) whose entries lapse after `ttl` seconds, so replays
+    usually skip the database.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, ttl: int = IDEMPOTENCY_TTL_SECONDS, max_entries: int = IDEMPOTENCY_CACHE_SIZE,
+                 claim_ttl: int = IDEMPOTENCY_CLAIM_SECONDS):
+        # Own short session on the shared writer engine, not the endpoint's
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.claim_ttl = claim_ttl
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()  # key -> (expires, fingerprint, response)
+        self._saves = 0
+
+    def _remember(self, key: str, expires_at: float, fingerprint: str, response: Any):
+        self._entries[key] = (expires_at, fingerprint, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[Tuple[str, Any]]:
+        """Claim `key` for a new request.
+
+        Returns None if the caller now owns the key and should run the
+        request. Otherwise returns (fingerprint, response) of the request that
+        holds it, where response is None while that request is still running.
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+            del self._entries[key]
+
+        created_at = datetime.utcnow()
+        values = {
+            "fingerprint": fingerprint,
+            "response": None,
+            "created_at": created_at,
+            "expires_at": created_at + timedelta(seconds=self.claim_ttl),
+        }
+        # A lapsed row (an expired response, or a claim whose worker died) is taken over
+        statement = insert(IdempotencyKeyDB).values(key=key, **values).on_conflict_do_update(
+            index_elements=["key"],
+            set_=values,
+            where=IdempotencyKeyDB.expires_at <= created_at
+        ).returning(IdempotencyKeyDB.key)
+        async with self.session_factory() as db:
+            claimed = (await db.execute(statement)).first() is not None
+            if not claimed:
+                row = (await db.execute(
+                    select(IdempotencyKeyDB.fingerprint, IdempotencyKeyDB.response, IdempotencyKeyDB.expires_at)
+                    .where(IdempotencyKeyDB.key == key)
+                )).one()
+            await db.commit()
+        if claimed:
+            return None
+        if row.response is None:
+            return row.fingerprint, None
+        response = json.loads(row.response)
+        self._remember(key, time.time() + (row.expires_at - created_at).total_seconds(),
+                       row.fingerprint, response)
+        return row.fingerprint, response
+
+    async def release(self, key: str):
+        """Give up a claim without a response, so the request can be retried."""
+        async with self.session_factory() as db:
+            await db.execute(delete(IdempotencyKeyDB).where(
+                IdempotencyKeyDB.key == key, IdempotencyKeyDB.response.is_(None)
+            ))
+            await db.commit()
+
+    async def save(self, key: str, fingerprint: str, response: Any):
+        """Store the response on a key claimed by this request."""
+        created_at = datetime.utcnow()
+        expires_at = created_at + timedelta(seconds=self.ttl)
+        statement = update(IdempotencyKeyDB).where(
+            IdempotencyKeyDB.key == key, IdempotencyKeyDB.response.is_(None)
+        ).values(
+            response=json.dumps(response, default=str),
+            expires_at=expires_at
+        )
+        async with self.session_factory() as db:
+            await db.execute(statement)
+            self._saves += 1
+            if self._saves % PURGE_EVERY == 0:
+                await db.execute(delete(IdempotencyKeyDB).where(IdempotencyKeyDB.expires_at <= created_at))
+            await db.commit()
+        self._remember(key, time.time() + self.ttl, fingerprint, response)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Shared store used by the money-moving endpoints
+idempotency_store = IdempotencyStore()
+
+class IdempotentRequest:
+    """What an endpoint needs to honour an Idempotency-Key: a stored `replay`, and `save()`."""
+
+    def __init__(self, key: Optional[str] = None, fingerprint: Optional[str] = None, replay: Any = None):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.replay = replay
+        self.saved = False
+
+    async def save(self, response: Any) -> Any:
+        """Store the response for replays (if the client sent a key) and return it."""
+        if self.key:
+            await idempotency_store.save(self.key, self.fingerprint, response)
+            self.saved = True
+        return response
+
+async def idempotent_request(
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Dependency for endpoints that move money.
+
+    With an Idempotency-Key header, a repeat of the same request by the same
+    user returns the first response (marked Idempotent-Replayed: true)
+    without re-validating or mining. A repeat that arrives while the first
+    is still running is a 409; reusing a key for a different request body
+    is a 422.
+    """
+    if not idempotency_key:
+        yield IdempotentRequest()
+        return
+
+    key = f"{current_user.id}:{request.method}:{request.url.path}:{idempotency_key}"
+    fingerprint = request_fingerprint(await request.body())
+    stored = await idempotency_store.claim(key, fingerprint)
+    if stored is None:
+        claim = IdempotentRequest(key, fingerprint)
+        try:
+            yield claim
+        finally:
+            if not claim.saved:
+                await idempotency_store.release(key)
+        return
+
+    stored_fingerprint, stored_response = stored
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    if stored_response is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"}
+        )
+    response.headers["Idempotent-Replayed"] = "true"
+    yield IdempotentRequest(replay=stored_response)
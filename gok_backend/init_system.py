@@ -2,22 +2,10 @@
 # Initialize the National Financial Platform with database tables and super admin
 
 import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from models import Base, UserDB
 from auth import generate_wallet_address, get_password_hash
-
-# Database URL with SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///./gok_db.sqlite"
-
-# Create the engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
-
-# Create a SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Same engine and storage profile (WAL, pragmas) as the API
+from database import SessionLocal, engine
 
 def init_database():
     """Create all database tables."""
@@ -30,6 +18,15 @@ def init_database():
         print("   - projects")
         print("   - expense_requests")
         print("   - reports")
+        print("   - tax_payments")
+        print("   - revoked_tokens")
+        print("   - tax_revenue_by_type")
+        print("   - tax_revenue_daily")
+        print("   - receipt_sequences")
+        print("   - tax_anchors")
+        print("   - tax_payment_proofs")
+        print("   - idempotency_keys")
+        print("   - spending_daily")
         return True
     except Exception as e:
         print(f"❌ Error creating database tables: {e}")
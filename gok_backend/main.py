@@ -4,6 +4,16 @@ from endpoints import router as api_router
 from ministry_endpoints import router as ministry_router
 from tax_endpoints import router as tax_router
 from connections import active_connections, manager
+from audit import setup_logging, shutdown_logging
+from anchoring import run_anchoring
+from reconciler import ledger_reconciler, run_reconciler
+from spending import spending_recorder
+from flows import fund_flows
+from anomalies import anomaly_reporter
+from revocation import revocation_store, run_revocation_purge
+from database import AsyncReadSessionLocal, AsyncSessionLocal
+from endpoints import blockchain
+import asyncio
 
 def setup_cors(app):
     app.add_middleware(
@@ -19,7 +29,10 @@ def setup_cors(app):
         ],
         allow_credentials=True,
         allow_methods=["*"],
-        allow_headers=["*"]
+        allow_headers=["*"],
+        # Keyset pagination cursor, bulk ingestion totals and idempotent replays
+        expose_headers=["X-Next-Cursor", "X-Ingest-Created", "X-Ingest-Invalid", "X-Ingest-Failed",
+                        "Idempotent-Replayed"]
     )
 
 app = FastAPI(title="National Financial Blockchain Administration Portal")
@@ -30,6 +43,75 @@ app.include_router(api_router, tags=["Core"])
 app.include_router(ministry_router, tags=["Ministry Management"])
 app.include_router(tax_router, tags=["Tax Payments"])
 
+@app.on_event("startup")
+async def start_audit_log():
+    setup_logging()
+
+@app.on_event("startup")
+async def start_tax_anchoring():
+    # Periodically anchor new tax payments onto the chain as Merkle roots
+    app.state.anchoring_task = asyncio.create_task(run_anchoring(AsyncSessionLocal, blockchain))
+
+@app.on_event("startup")
+async def start_ledger_reconciler():
+    # Opening values are taken before any request can mine a block
+    async with AsyncReadSessionLocal() as db:
+        await ledger_reconciler.baseline(db)
+    app.state.reconciler_task = asyncio.create_task(run_reconciler(ledger_reconciler, AsyncReadSessionLocal))
+
+@app.on_event("startup")
+async def start_fund_flows():
+    # Index what is already on the chain, then follow new blocks
+    fund_flows.load(blockchain.chain)
+    blockchain.add_listener(fund_flows.on_block)
+
+@app.on_event("startup")
+async def start_spending_rollups():
+    # Sealed blocks feed the daily spending rollups
+    blockchain.add_listener(spending_recorder.on_block)
+    app.state.spending_task = asyncio.create_task(spending_recorder.run(AsyncSessionLocal))
+
+@app.on_event("startup")
+async def start_anomaly_detection():
+    # Learn from what is already on the chain without reporting it, then watch new blocks
+    anomaly_reporter.detector.replay(blockchain.chain)
+    blockchain.add_listener(anomaly_reporter.on_block)
+    app.state.anomaly_task = asyncio.create_task(anomaly_reporter.run(AsyncSessionLocal))
+
+@app.on_event("startup")
+async def start_revocation_purge():
+    # Drop revocations of tokens that expired while the API was down, then keep purging
+    await revocation_store.purge_expired()
+    app.state.revocation_purge_task = asyncio.create_task(run_revocation_purge())
+
+@app.on_event("shutdown")
+async def stop_tax_anchoring():
+    app.state.anchoring_task.cancel()
+
+@app.on_event("shutdown")
+async def stop_ledger_reconciler():
+    app.state.reconciler_task.cancel()
+
+@app.on_event("shutdown")
+async def stop_revocation_purge():
+    app.state.revocation_purge_task.cancel()
+
+@app.on_event("shutdown")
+async def stop_spending_rollups():
+    # Not cancelled: the loop writes whatever was sealed since its last flush, then returns
+    spending_recorder.stop()
+    await app.state.spending_task
+
+@app.on_event("shutdown")
+async def stop_anomaly_detection():
+    anomaly_reporter.stop()
+    await app.state.anomaly_task
+
+@app.on_event("shutdown")
+async def flush_audit_log():
+    # Drain queued audit records before the process exits
+    shutdown_logging()
+
 @app.get("/")
 async def root():
     return {
@@ -1,62 +1,119 @@
 # ministry_endpoints.py
 # API endpoints for Ministry, Project, and Expense Management
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date, datetime
 import secrets
 
-from database import get_db
+from database import get_async_db, get_async_read_db
 from models import MinistryDB, ProjectDB, ExpenseRequestDB, UserDB
 from schemas import (
     MinistryCreate, MinistryUpdate, MinistryResponse, MinistryBudgetAllocate,
     MinistryTransfer, ProjectCreate, ProjectUpdate, ProjectResponse,
-    ExpenseRequestCreate, ExpenseRequestUpdate, ExpenseRequestResponse
+    ExpenseRequestCreate, ExpenseRequestUpdate, ExpenseRequestResponse, ExpenseBatchApprove
 )
 from auth import (
-    get_current_user, require_super_admin, require_ministry_admin,
+    Principal, get_current_user, require_super_admin, require_ministry_admin,
     require_ministry_access, check_ministry_permission, generate_wallet_address
 )
-from blockchain import Blockchain
 from connections import manager
+from endpoints import blockchain
+from flows import MAX_HOPS, MAX_PATHS, fund_flows, project_id_of, project_node
+from idempotency import IdempotentRequest, idempotent_request
+from reconciler import ledger_reconciler
+from spending import read_spending
 
 # Create router
 router = APIRouter()
 
-# Initialize blockchain (shared instance)
-blockchain = Blockchain()
-
 # ==================== Utility Functions ====================
 
-def generate_ministry_code(ministry_type: str, db: Session) -> str:
+async def generate_ministry_code(ministry_type: str, db: AsyncSession) -> str:
     """Generate unique ministry code like EDU-001, HLT-001, etc."""
     # Get first 3 letters of ministry type
     prefix = ministry_type[:3].upper()
     
     # Count existing ministries with this prefix
-    existing_count = db.query(MinistryDB).filter(
-        MinistryDB.code.like(f"{prefix}%")
-    ).count()
+    existing_count = (await db.execute(
+        select(func.count(MinistryDB.id)).where(MinistryDB.code.like(f"{prefix}%"))
+    )).scalar()
     
     # Generate code
     number = str(existing_count + 1).zfill(3)
     return f"{prefix}-{number}"
 
+ACTIVE_PROJECT_STATUSES = ["planning", "in_progress"]
+
+def ministry_summary_query(ministry_id: Optional[int] = None):
+    """Ministries with their project counts, computed by one grouped subquery.
+
+    Yields (MinistryDB, total_projects, active_projects) rows, so a page of
+    ministries costs one query instead of two COUNTs per ministry. With
+    `ministry_id`, both the subquery and the outer query are limited to that
+    ministry, so only its projects are counted.
+    """
+    counts = select(
+        ProjectDB.ministry_id.label("ministry_id"),
+        func.count(ProjectDB.id).label("total_projects"),
+        func.count(ProjectDB.id).filter(
+            ProjectDB.status.in_(ACTIVE_PROJECT_STATUSES)
+        ).label("active_projects")
+    ).group_by(ProjectDB.ministry_id)
+    if ministry_id is not None:
+        counts = counts.where(ProjectDB.ministry_id == ministry_id)
+    counts = counts.subquery()
+
+    query = select(
+        MinistryDB,
+        func.coalesce(counts.c.total_projects, 0),
+        func.coalesce(counts.c.active_projects, 0)
+    ).outerjoin(counts, counts.c.ministry_id == MinistryDB.id)
+    if ministry_id is not None:
+        query = query.where(MinistryDB.id == ministry_id)
+    return query
+
+def ministry_response(ministry: MinistryDB, total_projects: int, active_projects: int) -> MinistryResponse:
+    return MinistryResponse(
+        id=ministry.id,
+        name=ministry.name,
+        code=ministry.code,
+        ministry_type=ministry.ministry_type,
+        description=ministry.description,
+        wallet_address=ministry.wallet_address,
+        allocated_budget=ministry.allocated_budget,
+        used_funds=ministry.used_funds,
+        remaining_balance=ministry.allocated_budget - ministry.used_funds,
+        icon=ministry.icon,
+        color=ministry.color,
+        is_active=ministry.is_active,
+        created_at=ministry.created_at,
+        active_projects=active_projects,
+        total_projects=total_projects
+    )
+
+async def get_ministry_summary(db: AsyncSession, ministry_id: int):
+    """(MinistryDB, total_projects, active_projects) for one ministry, or None."""
+    return (await db.execute(
+        ministry_summary_query(ministry_id)
+    )).first()
+
 # ==================== Ministry Endpoints ====================
 
 @router.post("/ministries", response_model=MinistryResponse, status_code=status.HTTP_201_CREATED)
 async def create_ministry(
     ministry: MinistryCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_super_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_super_admin)
 ):
     """
     Create a new ministry (Super Admin only).
     Automatically generates wallet address and ministry code.
     """
     # Check if ministry with same name exists
-    existing = db.query(MinistryDB).filter(MinistryDB.name == ministry.name).first()
+    existing = (await db.execute(select(MinistryDB).where(MinistryDB.name == ministry.name))).scalars().first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -64,7 +121,7 @@ async def create_ministry(
         )
     
     # Generate unique code and wallet
-    ministry_code = generate_ministry_code(ministry.ministry_type, db)
+    ministry_code = await generate_ministry_code(ministry.ministry_type, db)
     wallet_address = generate_wallet_address()
     
     # Create ministry
@@ -82,27 +139,39 @@ async def create_ministry(
     )
     
     db.add(db_ministry)
-    db.commit()
-    db.refresh(db_ministry)
+    await db.flush()
+    
+    # Record any opening budget on the chain, like a later allocation
+    if db_ministry.allocated_budget > 0:
+        transaction = {
+            "sender": current_user.wallet_address,
+            "recipient": wallet_address,
+            "amount": db_ministry.allocated_budget,
+            "timestamp": datetime.utcnow().isoformat(),
+            "purpose": "Opening budget",
+            "approved_by": current_user.office_name,
+            "ministry_id": db_ministry.id,
+            "ministry_name": db_ministry.name,
+            "category": "budget_allocation"
+        }
+        if not blockchain.add_transaction(transaction, require_funds=False):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Transaction validation failed"
+            )
+        try:
+            await blockchain.mine_block(current_user.wallet_address, {})
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to mine block: {str(e)}"
+            )
+    
+    await db.commit()
+    await db.refresh(db_ministry)
     
     # Prepare response
-    response = MinistryResponse(
-        id=db_ministry.id,
-        name=db_ministry.name,
-        code=db_ministry.code,
-        ministry_type=db_ministry.ministry_type,
-        description=db_ministry.description,
-        wallet_address=db_ministry.wallet_address,
-        allocated_budget=db_ministry.allocated_budget,
-        used_funds=db_ministry.used_funds,
-        remaining_balance=db_ministry.allocated_budget - db_ministry.used_funds,
-        icon=db_ministry.icon,
-        color=db_ministry.color,
-        is_active=db_ministry.is_active,
-        created_at=db_ministry.created_at,
-        active_projects=0,
-        total_projects=0
-    )
+    response = ministry_response(db_ministry, total_projects=0, active_projects=0)
     
     # Broadcast ministry creation via WebSocket
     await manager.broadcast({
@@ -122,67 +191,43 @@ async def list_ministries(
     skip: int = 0,
     limit: int = 100,
     include_inactive: bool = False,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     List all ministries.
     Super admins see all, ministry users see only their own.
     """
-    query = db.query(MinistryDB)
+    query = ministry_summary_query()
     
     # Filter by active status
     if not include_inactive:
-        query = query.filter(MinistryDB.is_active == True)
+        query = query.where(MinistryDB.is_active == True)
     
     # Ministry users can only see their own ministry
     if current_user.role in ["ministry_admin", "ministry_officer"]:
         if current_user.ministry_id:
-            query = query.filter(MinistryDB.id == current_user.ministry_id)
+            query = query.where(MinistryDB.id == current_user.ministry_id)
         else:
             return []
     
-    ministries = query.offset(skip).limit(limit).all()
-    
-    # Build responses with project counts
-    responses = []
-    for ministry in ministries:
-        project_count = db.query(ProjectDB).filter(ProjectDB.ministry_id == ministry.id).count()
-        active_project_count = db.query(ProjectDB).filter(
-            ProjectDB.ministry_id == ministry.id,
-            ProjectDB.status.in_(["planning", "in_progress"])
-        ).count()
-        
-        responses.append(MinistryResponse(
-            id=ministry.id,
-            name=ministry.name,
-            code=ministry.code,
-            ministry_type=ministry.ministry_type,
-            description=ministry.description,
-            wallet_address=ministry.wallet_address,
-            allocated_budget=ministry.allocated_budget,
-            used_funds=ministry.used_funds,
-            remaining_balance=ministry.allocated_budget - ministry.used_funds,
-            icon=ministry.icon,
-            color=ministry.color,
-            is_active=ministry.is_active,
-            created_at=ministry.created_at,
-            active_projects=active_project_count,
-            total_projects=project_count
-        ))
-    
-    return responses
+    rows = (await db.execute(query.order_by(MinistryDB.id).offset(skip).limit(limit))).all()
+    
+    return [
+        ministry_response(ministry, total_projects, active_projects)
+        for ministry, total_projects, active_projects in rows
+    ]
 
 @router.get("/ministries/{ministry_id}", response_model=MinistryResponse)
 async def get_ministry(
     ministry_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get specific ministry details."""
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == ministry_id).first()
+    summary = await get_ministry_summary(db, ministry_id)
     
-    if not ministry:
+    if not summary:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ministry not found"
@@ -195,40 +240,17 @@ async def get_ministry(
             detail="You don't have permission to access this ministry"
         )
     
-    # Get project counts
-    project_count = db.query(ProjectDB).filter(ProjectDB.ministry_id == ministry.id).count()
-    active_project_count = db.query(ProjectDB).filter(
-        ProjectDB.ministry_id == ministry.id,
-        ProjectDB.status.in_(["planning", "in_progress"])
-    ).count()
-    
-    return MinistryResponse(
-        id=ministry.id,
-        name=ministry.name,
-        code=ministry.code,
-        ministry_type=ministry.ministry_type,
-        description=ministry.description,
-        wallet_address=ministry.wallet_address,
-        allocated_budget=ministry.allocated_budget,
-        used_funds=ministry.used_funds,
-        remaining_balance=ministry.allocated_budget - ministry.used_funds,
-        icon=ministry.icon,
-        color=ministry.color,
-        is_active=ministry.is_active,
-        created_at=ministry.created_at,
-        active_projects=active_project_count,
-        total_projects=project_count
-    )
+    return ministry_response(*summary)
 
 @router.put("/ministries/{ministry_id}", response_model=MinistryResponse)
 async def update_ministry(
     ministry_id: int,
     ministry_update: MinistryUpdate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_super_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_super_admin)
 ):
     """Update ministry details (Super Admin only)."""
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == ministry_id).first()
+    ministry = await db.get(MinistryDB, ministry_id)
     
     if not ministry:
         raise HTTPException(
@@ -250,46 +272,28 @@ async def update_ministry(
     
     ministry.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(ministry)
-    
-    # Get project counts
-    project_count = db.query(ProjectDB).filter(ProjectDB.ministry_id == ministry.id).count()
-    active_project_count = db.query(ProjectDB).filter(
-        ProjectDB.ministry_id == ministry.id,
-        ProjectDB.status.in_(["planning", "in_progress"])
-    ).count()
+    await db.commit()
     
-    return MinistryResponse(
-        id=ministry.id,
-        name=ministry.name,
-        code=ministry.code,
-        ministry_type=ministry.ministry_type,
-        description=ministry.description,
-        wallet_address=ministry.wallet_address,
-        allocated_budget=ministry.allocated_budget,
-        used_funds=ministry.used_funds,
-        remaining_balance=ministry.allocated_budget - ministry.used_funds,
-        icon=ministry.icon,
-        color=ministry.color,
-        is_active=ministry.is_active,
-        created_at=ministry.created_at,
-        active_projects=active_project_count,
-        total_projects=project_count
-    )
+    # Reload the row together with its project counts in one query
+    return ministry_response(*await get_ministry_summary(db, ministry_id))
 
 @router.post("/ministries/{ministry_id}/allocate-budget")
 async def allocate_budget(
     ministry_id: int,
     allocation: MinistryBudgetAllocate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_super_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_super_admin),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     """
     Allocate budget to a ministry (Super Admin only).
     Creates blockchain transaction from National Treasury.
+    Send an Idempotency-Key header to make retries safe.
     """
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == ministry_id).first()
+    if idempotency.replay is not None:
+        return idempotency.replay
+
+    ministry = await db.get(MinistryDB, ministry_id)
     
     if not ministry:
         raise HTTPException(
@@ -320,7 +324,7 @@ async def allocate_budget(
     }
     
     # Add transaction to blockchain
-    if not blockchain.add_transaction(transaction):
+    if not blockchain.add_transaction(transaction, require_funds=False):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Transaction validation failed"
@@ -342,8 +346,8 @@ async def allocate_budget(
     ministry.allocated_budget += allocation.amount
     ministry.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(ministry)
+    await db.commit()
+    await db.refresh(ministry)
     
     # Broadcast via WebSocket
     await manager.broadcast({
@@ -357,7 +361,7 @@ async def allocate_budget(
         }
     })
     
-    return {
+    return await idempotency.save({
         "message": "Budget allocated successfully",
         "ministry": ministry.name,
         "amount_allocated": allocation.amount,
@@ -365,18 +369,23 @@ async def allocate_budget(
         "remaining_balance": ministry.allocated_budget - ministry.used_funds,
         "block_hash": latest_block.current_hash if latest_block else None,
         "block_index": latest_block.block_id if latest_block else None
-    }
+    })
 
 @router.post("/ministries/transfer")
 async def transfer_to_ministry(
     transfer: MinistryTransfer,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(idempotent_request)
 ):
     """
     Transfer funds from National Financial Administration to another ministry.
     Only users from the National Financial Administration ministry can initiate transfers.
+    Send an Idempotency-Key header to make retries safe.
     """
+    if idempotency.replay is not None:
+        return idempotency.replay
+
     # Verify current user is from National Financial Administration
     if not current_user.ministry_id:
         raise HTTPException(
@@ -384,7 +393,7 @@ async def transfer_to_ministry(
             detail="Only ministry users can perform transfers"
         )
     
-    sender_ministry = db.query(MinistryDB).filter(MinistryDB.id == current_user.ministry_id).first()
+    sender_ministry = await db.get(MinistryDB, current_user.ministry_id)
     
     if not sender_ministry:
         raise HTTPException(
@@ -414,9 +423,7 @@ async def transfer_to_ministry(
         )
     
     # Get recipient ministry
-    recipient_ministry = db.query(MinistryDB).filter(
-        MinistryDB.id == transfer.recipient_ministry_id
-    ).first()
+    recipient_ministry = await db.get(MinistryDB, transfer.recipient_ministry_id)
     
     if not recipient_ministry:
         raise HTTPException(
@@ -464,7 +471,7 @@ async def transfer_to_ministry(
     }
     
     # Add transaction to blockchain
-    if not blockchain.add_transaction(transaction):
+    if not blockchain.add_transaction(transaction, require_funds=False):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Transaction validation failed"
@@ -488,9 +495,9 @@ async def transfer_to_ministry(
     sender_ministry.updated_at = datetime.utcnow()
     recipient_ministry.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(sender_ministry)
-    db.refresh(recipient_ministry)
+    await db.commit()
+    await db.refresh(sender_ministry)
+    await db.refresh(recipient_ministry)
     
     # Broadcast via WebSocket
     await manager.broadcast({
@@ -506,7 +513,7 @@ async def transfer_to_ministry(
         }
     })
     
-    return {
+    return await idempotency.save({
         "message": "Transfer completed successfully",
         "from_ministry": sender_ministry.name,
         "to_ministry": recipient_ministry.name,
@@ -516,16 +523,16 @@ async def transfer_to_ministry(
         "block_hash": latest_block.current_hash if latest_block else None,
         "block_index": latest_block.block_id if latest_block else None,
         "transaction_id": blockchain.chain[-1].transactions[-1].get("transaction_id") if blockchain.chain and blockchain.chain[-1].transactions else None
-    }
+    })
 
 @router.get("/ministries/{ministry_id}/transactions")
 async def get_ministry_transactions(
     ministry_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get all transactions for a specific ministry."""
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == ministry_id).first()
+    ministry = await db.get(MinistryDB, ministry_id)
     
     if not ministry:
         raise HTTPException(
@@ -574,12 +581,12 @@ async def get_ministry_transactions(
 @router.post("/projects", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(
     project: ProjectCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_ministry_access)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_access)
 ):
     """Create a new project for a ministry."""
     # Verify ministry exists
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == project.ministry_id).first()
+    ministry = await db.get(MinistryDB, project.ministry_id)
     if not ministry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -607,16 +614,16 @@ async def create_project(
     )
     
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     
     return ProjectResponse.from_orm(db_project)
 
 @router.get("/ministries/{ministry_id}/projects", response_model=List[ProjectResponse])
 async def list_ministry_projects(
     ministry_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """List all projects for a ministry."""
     # Check permission
@@ -626,18 +633,18 @@ async def list_ministry_projects(
             detail="You don't have permission to view this ministry's projects"
         )
     
-    projects = db.query(ProjectDB).filter(ProjectDB.ministry_id == ministry_id).all()
+    projects = (await db.execute(select(ProjectDB).where(ProjectDB.ministry_id == ministry_id))).scalars().all()
     return [ProjectResponse.from_orm(p) for p in projects]
 
 @router.put("/projects/{project_id}", response_model=ProjectResponse)
 async def update_project(
     project_id: int,
     project_update: ProjectUpdate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_ministry_access)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_access)
 ):
     """Update project details."""
-    project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
+    project = await db.get(ProjectDB, project_id)
     
     if not project:
         raise HTTPException(
@@ -668,8 +675,8 @@ async def update_project(
     
     project.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     
     return ProjectResponse.from_orm(project)
 
@@ -678,12 +685,12 @@ async def update_project(
 @router.post("/expense-requests", response_model=ExpenseRequestResponse, status_code=status.HTTP_201_CREATED)
 async def create_expense_request(
     expense: ExpenseRequestCreate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_ministry_access)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_access)
 ):
     """Create a new expense request."""
     # Verify ministry exists
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == expense.ministry_id).first()
+    ministry = await db.get(MinistryDB, expense.ministry_id)
     if not ministry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -699,7 +706,7 @@ async def create_expense_request(
     
     # Verify project if specified
     if expense.project_id:
-        project = db.query(ProjectDB).filter(ProjectDB.id == expense.project_id).first()
+        project = await db.get(ProjectDB, expense.project_id)
         if not project or project.ministry_id != expense.ministry_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -718,8 +725,8 @@ async def create_expense_request(
     )
     
     db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    await db.commit()
+    await db.refresh(db_expense)
     
     # Broadcast via WebSocket
     await manager.broadcast({
@@ -738,8 +745,8 @@ async def create_expense_request(
 async def list_ministry_expense_requests(
     ministry_id: int,
     status_filter: str = None,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """List expense requests for a ministry."""
     # Check permission
@@ -749,22 +756,39 @@ async def list_ministry_expense_requests(
             detail="You don't have permission to view this ministry's expense requests"
         )
     
-    query = db.query(ExpenseRequestDB).filter(ExpenseRequestDB.ministry_id == ministry_id)
+    query = select(ExpenseRequestDB).where(ExpenseRequestDB.ministry_id == ministry_id)
     
     if status_filter:
-        query = query.filter(ExpenseRequestDB.status == status_filter)
+        query = query.where(ExpenseRequestDB.status == status_filter)
     
-    expenses = query.order_by(ExpenseRequestDB.requested_at.desc()).all()
+    expenses = (await db.execute(query.order_by(ExpenseRequestDB.requested_at.desc()))).scalars().all()
     return [ExpenseRequestResponse.from_orm(e) for e in expenses]
 
+async def claim_pending_expenses(db: AsyncSession, expense_ids: List[int], **values) -> bool:
+    """Move pending expense requests to a new status; False if any was no longer pending.
+
+    A conditional UPDATE, so of two concurrent approvals (or an approval and
+    a rejection) only one can claim a request. The claim is part of the
+    caller's transaction and is rolled back with it.
+    """
+    result = await db.execute(
+        update(ExpenseRequestDB)
+        .where(ExpenseRequestDB.id.in_(expense_ids), ExpenseRequestDB.status == "pending")
+        .values(**values)
+    )
+    if result.rowcount != len(expense_ids):
+        await db.rollback()
+        return False
+    return True
+
 @router.put("/expense-requests/{expense_id}/approve")
 async def approve_expense_request(
     expense_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_ministry_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_admin)
 ):
     """Approve an expense request and create blockchain transaction."""
-    expense = db.query(ExpenseRequestDB).filter(ExpenseRequestDB.id == expense_id).first()
+    expense = await db.get(ExpenseRequestDB, expense_id)
     
     if not expense:
         raise HTTPException(
@@ -772,18 +796,34 @@ async def approve_expense_request(
             detail="Expense request not found"
         )
     
+    if not check_ministry_permission(current_user, expense.ministry_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to approve this ministry's expenses"
+        )
+    
     if expense.status != "pending":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Expense request is already {expense.status}"
         )
     
-    # Get ministry
-    ministry = db.query(MinistryDB).filter(MinistryDB.id == expense.ministry_id).first()
+    approved_at = datetime.utcnow()
+    if not await claim_pending_expenses(
+        db, [expense_id], status="approved", approved_by=current_user.office_name, approved_at=approved_at
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Expense request was approved or rejected by another request"
+        )
+    
+    # Get ministry (read after the claim, so concurrent approvals see each other's spending)
+    ministry = await db.get(MinistryDB, expense.ministry_id)
     
     # Check if ministry has sufficient budget
     remaining_budget = ministry.allocated_budget - ministry.used_funds
     if expense.amount > remaining_budget:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Insufficient budget. Available: {remaining_budget}, Requested: {expense.amount}"
@@ -804,7 +844,8 @@ async def approve_expense_request(
     }
     
     # Add transaction to blockchain
-    if not blockchain.add_transaction(transaction):
+    if not blockchain.add_transaction(transaction, require_funds=False):
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Transaction validation failed"
@@ -814,6 +855,7 @@ async def approve_expense_request(
     try:
         await blockchain.mine_block(ministry.wallet_address, {})
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to mine block: {str(e)}"
@@ -822,10 +864,7 @@ async def approve_expense_request(
     # Get the latest block
     latest_block = blockchain.chain[-1] if blockchain.chain else None
     
-    # Update expense request
-    expense.status = "approved"
-    expense.approved_by = current_user.office_name
-    expense.approved_at = datetime.utcnow()
+    # Update expense request (status, approver and time were set by the claim)
     expense.transaction_hash = latest_block.current_hash if latest_block else None
     
     # Update ministry used funds
@@ -833,11 +872,11 @@ async def approve_expense_request(
     
     # Update project spent if applicable
     if expense.project_id:
-        project = db.query(ProjectDB).filter(ProjectDB.id == expense.project_id).first()
+        project = await db.get(ProjectDB, expense.project_id)
         if project:
             project.spent += expense.amount
     
-    db.commit()
+    await db.commit()
     
     # Broadcast via WebSocket
     await manager.broadcast({
@@ -846,7 +885,7 @@ async def approve_expense_request(
             "expense_id": expense_id,
             "ministry_id": ministry.id,
             "amount": expense.amount,
-            "block_hash": new_block["hash"],
+            "block_hash": expense.transaction_hash,
             "new_remaining_budget": ministry.allocated_budget - ministry.used_funds
         }
     })
@@ -855,19 +894,164 @@ async def approve_expense_request(
         "message": "Expense approved and transaction recorded",
         "expense_id": expense_id,
         "amount": expense.amount,
-        "block_hash": new_block["hash"],
+        "block_hash": expense.transaction_hash,
         "ministry_remaining_budget": ministry.allocated_budget - ministry.used_funds
     }
 
+@router.post("/expense-requests/approve-batch")
+async def approve_expense_requests(
+    batch: ExpenseBatchApprove,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_admin)
+):
+    """
+    Approve several expense requests at once, sealed into a single block.
+
+    All or nothing: every request must exist, be pending and belong to a
+    ministry the caller may approve for, and each ministry's remaining
+    budget must cover the sum of its requests. Database updates commit in
+    one transaction, followed by one broadcast.
+    """
+    expense_ids = list(dict.fromkeys(batch.expense_ids))
+    expenses = (await db.execute(
+        select(ExpenseRequestDB).where(ExpenseRequestDB.id.in_(expense_ids)).order_by(ExpenseRequestDB.id)
+    )).scalars().all()
+
+    missing = sorted(set(expense_ids) - {expense.id for expense in expenses})
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Expense requests not found: {missing}"
+        )
+
+    forbidden = [expense.id for expense in expenses if not check_ministry_permission(current_user, expense.ministry_id)]
+    if forbidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You don't have permission to approve expense requests: {forbidden}"
+        )
+
+    not_pending = [expense.id for expense in expenses if expense.status != "pending"]
+    if not_pending:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Expense requests are not pending: {not_pending}"
+        )
+
+    timestamp = datetime.utcnow()
+    if not await claim_pending_expenses(
+        db, expense_ids, status="approved", approved_by=current_user.office_name, approved_at=timestamp
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Some expense requests were approved or rejected by another request"
+        )
+
+    # Check each ministry's budget once against its combined requests
+    requested = {}
+    for expense in expenses:
+        requested[expense.ministry_id] = requested.get(expense.ministry_id, 0.0) + expense.amount
+    ministries = {
+        ministry.id: ministry
+        for ministry in (await db.execute(
+            select(MinistryDB).where(MinistryDB.id.in_(requested))
+        )).scalars()
+    }
+    for ministry_id, amount in requested.items():
+        ministry = ministries[ministry_id]
+        remaining_budget = ministry.allocated_budget - ministry.used_funds
+        if amount > remaining_budget:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient budget for ministry {ministry_id}. Available: {remaining_budget}, Requested: {amount}"
+            )
+
+    project_ids = {expense.project_id for expense in expenses if expense.project_id}
+    projects = {
+        project.id: project
+        for project in (await db.execute(
+            select(ProjectDB).where(ProjectDB.id.in_(project_ids))
+        )).scalars()
+    } if project_ids else {}
+
+    transactions = [
+        {
+            "sender": ministries[expense.ministry_id].wallet_address,
+            "recipient": "EXPENSE_PAID",
+            "amount": expense.amount,
+            "timestamp": timestamp.isoformat(),
+            "purpose": expense.purpose,
+            "approved_by": current_user.office_name,
+            "ministry_id": expense.ministry_id,
+            "project_id": expense.project_id,
+            "expense_request_id": expense.id,
+            "category": expense.category or "general_expense"
+        }
+        for expense in expenses
+    ]
+
+    if not blockchain.add_transactions(transactions, require_funds=False):
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transaction validation failed"
+        )
+
+    try:
+        block = await blockchain.mine_block(current_user.wallet_address, {})
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to mine block: {str(e)}"
+        )
+
+    for expense in expenses:
+        expense.transaction_hash = block.current_hash
+        ministries[expense.ministry_id].used_funds += expense.amount
+        project = projects.get(expense.project_id)
+        if project:
+            project.spent += expense.amount
+
+    await db.commit()
+
+    remaining_budgets = {
+        ministry_id: ministry.allocated_budget - ministry.used_funds
+        for ministry_id, ministry in ministries.items()
+    }
+
+    await manager.broadcast({
+        "type": "expenses_approved",
+        "data": {
+            "expenses": [
+                {"expense_id": expense.id, "ministry_id": expense.ministry_id, "amount": expense.amount}
+                for expense in expenses
+            ],
+            "total_amount": sum(requested.values()),
+            "block_hash": block.current_hash,
+            "new_remaining_budgets": remaining_budgets
+        }
+    })
+
+    return {
+        "message": f"{len(expenses)} expenses approved and recorded in one block",
+        "expense_ids": [expense.id for expense in expenses],
+        "total_amount": sum(requested.values()),
+        "block_id": block.block_id,
+        "block_hash": block.current_hash,
+        "ministry_remaining_budgets": remaining_budgets
+    }
+
 @router.put("/expense-requests/{expense_id}/reject")
 async def reject_expense_request(
     expense_id: int,
     update: ExpenseRequestUpdate,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(require_ministry_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_ministry_admin)
 ):
     """Reject an expense request."""
-    expense = db.query(ExpenseRequestDB).filter(ExpenseRequestDB.id == expense_id).first()
+    expense = await db.get(ExpenseRequestDB, expense_id)
     
     if not expense:
         raise HTTPException(
@@ -875,6 +1059,12 @@ async def reject_expense_request(
             detail="Expense request not found"
         )
     
+    if not check_ministry_permission(current_user, expense.ministry_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to reject this ministry's expenses"
+        )
+    
     if expense.status != "pending":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -882,14 +1072,196 @@ async def reject_expense_request(
         )
     
     # Update expense request
-    expense.status = "rejected"
-    expense.rejected_by = current_user.office_name
-    expense.rejected_at = datetime.utcnow()
-    expense.rejection_reason = update.rejection_reason
+    if not await claim_pending_expenses(
+        db, [expense_id], status="rejected", rejected_by=current_user.office_name,
+        rejected_at=datetime.utcnow(), rejection_reason=update.rejection_reason
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Expense request was approved or rejected by another request"
+        )
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": "Expense request rejected",
         "expense_id": expense_id
     }
+
+# ==================== Spending Analytics ====================
+
+@router.get("/ministries/{ministry_id}/spending")
+async def get_ministry_spending(
+    ministry_id: int,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    project_id: Optional[int] = None,
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Paid expenses over time for one ministry, per day, week (from Monday) or month.
+    Served from the daily rollups, so the cost depends on the date range, not the chain.
+    """
+    if not check_ministry_permission(current_user, ministry_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to view this ministry's spending"
+        )
+    
+    series = await read_spending(
+        db, granularity, start_date=start_date, end_date=end_date,
+        ministry_id=ministry_id, project_id=project_id, category=category
+    )
+    return {
+        "ministry_id": ministry_id,
+        "granularity": granularity,
+        "total_amount": sum(point["total_amount"] for point in series),
+        "payment_count": sum(point["payment_count"] for point in series),
+        "series": series
+    }
+
+@router.get("/analytics/spending")
+async def get_spending_analytics(
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    ministry_id: Optional[int] = None,
+    category: Optional[str] = None,
+    by_ministry: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_super_admin)
+):
+    """
+    Government-wide paid expenses over time (Super Admin only).
+    With `by_ministry`, each period is split per ministry.
+    """
+    series = await read_spending(
+        db, granularity, by_ministry=by_ministry, start_date=start_date, end_date=end_date,
+        ministry_id=ministry_id, category=category
+    )
+    return {
+        "granularity": granularity,
+        "total_amount": sum(point["total_amount"] for point in series),
+        "payment_count": sum(point["payment_count"] for point in series),
+        "series": series
+    }
+
+# ==================== Fund Flows ====================
+
+async def flow_labels(db: AsyncSession, nodes) -> dict:
+    """Ministry, office and project names for the nodes of a fund-flow answer."""
+    nodes = set(nodes)
+    project_ids = {node: project_id_of(node) for node in nodes}
+    wallets = [node for node, project_id in project_ids.items() if project_id is None]
+    project_ids = [project_id for project_id in project_ids.values() if project_id is not None]
+    labels = {}
+    if wallets:
+        labels.update((await db.execute(
+            select(UserDB.wallet_address, UserDB.office_name).where(UserDB.wallet_address.in_(wallets))
+        )).all())
+        labels.update((await db.execute(
+            select(MinistryDB.wallet_address, MinistryDB.name).where(MinistryDB.wallet_address.in_(wallets))
+        )).all())
+    if project_ids:
+        labels.update(
+            (project_node(project_id), name)
+            for project_id, name in (await db.execute(
+                select(ProjectDB.id, ProjectDB.name).where(ProjectDB.id.in_(project_ids))
+            )).all()
+        )
+    return labels
+
+def require_flow_node(node: str):
+    if node not in fund_flows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No transfers involve {node}"
+        )
+
+@router.get("/flows/paths")
+async def get_flow_paths(
+    source: str,
+    target: str,
+    max_hops: int = Query(4, ge=1, le=MAX_HOPS),
+    limit: int = Query(20, ge=1, le=MAX_PATHS),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_super_admin)
+):
+    """
+    Routes money took from `source` to `target` (e.g. the treasury wallet to
+    `project:{id}`), each with the largest amount that can have gone all the
+    way along it (Super Admin only).
+    """
+    require_flow_node(source)
+    require_flow_node(target)
+    paths = fund_flows.paths(source, target, max_hops=max_hops, limit=limit)
+    return {
+        "source": source,
+        "target": target,
+        "paths": paths,
+        "labels": await flow_labels(db, (node for path in paths for node in path["nodes"]))
+    }
+
+@router.get("/flows/{node}/destinations")
+async def get_flow_destinations(
+    node: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_super_admin)
+):
+    """Where a wallet's (or project's) money went, largest totals first (Super Admin only)."""
+    require_flow_node(node)
+    destinations = fund_flows.top(node, "out", limit)
+    return {
+        "node": node,
+        "destinations": destinations,
+        "labels": await flow_labels(db, [node] + [d["node"] for d in destinations])
+    }
+
+@router.get("/flows/{node}/sources")
+async def get_flow_sources(
+    node: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_super_admin)
+):
+    """Where a wallet's (or project's) money came from, largest totals first (Super Admin only)."""
+    require_flow_node(node)
+    sources = fund_flows.top(node, "in", limit)
+    return {
+        "node": node,
+        "sources": sources,
+        "labels": await flow_labels(db, [node] + [s["node"] for s in sources])
+    }
+
+@router.get("/flows/{node}/reach")
+async def get_flow_reach(
+    node: str,
+    hops: int = Query(2, ge=1, le=MAX_HOPS),
+    direction: str = Query("out", pattern="^(in|out)$"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(require_super_admin)
+):
+    """
+    Every flow within `hops` transfers of a node: downstream of it ("out")
+    or upstream ("in"). Super Admin only.
+    """
+    require_flow_node(node)
+    reach = fund_flows.neighbourhood(node, hops, direction)
+    reach["labels"] = await flow_labels(db, reach["distances"])
+    return reach
+
+# ==================== Reconciliation ====================
+
+@router.get("/reconciliation")
+async def get_reconciliation_status(
+    current_user: Principal = Depends(require_super_admin)
+):
+    """
+    Latest ledger-vs-database reconciliation (Super Admin only).
+    Lists ministry and project columns that disagree with the chain.
+    """
+    return ledger_reconciler.status()
@@ -1,6 +1,6 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, ForeignKey, Enum, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -84,6 +84,10 @@ class MinistryDB(Base):
 # Project Model - Ministry projects
 class ProjectDB(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Per-ministry project listings and the grouped project counts
+        Index("ix_projects_ministry_id_status", "ministry_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     ministry_id = Column(Integer, ForeignKey("ministries.id"), nullable=False)
@@ -111,6 +115,11 @@ class ProjectDB(Base):
 # Expense Request Model - Budget allocation requests
 class ExpenseRequestDB(Base):
     __tablename__ = "expense_requests"
+    __table_args__ = (
+        # Ministry expense listings, newest first, with and without a status filter
+        Index("ix_expense_requests_ministry_id_status_requested_at", "ministry_id", "status", "requested_at"),
+        Index("ix_expense_requests_ministry_id_requested_at", "ministry_id", "requested_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     ministry_id = Column(Integer, ForeignKey("ministries.id"), nullable=False)
@@ -159,24 +168,65 @@ class UserDB(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
+    # Bumped whenever role, ministry, wallet or password change; tokens issued
+    # earlier have their claims re-checked (see auth.PrincipalCache)
+    credentials_changed_at = Column(DateTime, nullable=True, index=True)
 
 # Report Model for suspicious activity reporting
+# Next report change number, taken inside the INSERT/UPDATE itself. SQLite
+# runs one write transaction at a time, so change_seq follows commit order,
+# which updated_at (stamped before commit) does not.
+NEXT_REPORT_CHANGE_SEQ = text("(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM reports)")
+
 class ReportDB(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_created_at", "created_at"),
+        Index("ix_reports_status_created_at", "status", "created_at"),
+        Index("ix_reports_report_type_created_at", "report_type", "created_at"),
+        Index("ix_reports_change_seq", "change_seq", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    report_type = Column(String(100))  # 'tax_payment' or 'citizen_portal'
+    report_type = Column(String(100))  # 'tax_payment', 'citizen_portal' or 'automated' (anomalies.py)
     reported_by = Column(String(255))  # Email or name of reporter
     subject = Column(String(255))
     description = Column(Text)
     transaction_hash = Column(String(255), nullable=True)  # Optional reference
     status = Column(String(50), default="pending")  # pending, reviewed, resolved
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, default=NEXT_REPORT_CHANGE_SEQ, onupdate=NEXT_REPORT_CHANGE_SEQ)
     reviewed_by = Column(String(255), nullable=True)
     admin_notes = Column(Text, nullable=True)
 
+# Revoked Token Model - Logged-out tokens, kept until they expire
+class RevokedTokenDB(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, index=True, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+# Idempotency Key Model - Stored responses of money-moving requests, replayed on retry
+class IdempotencyKeyDB(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(512), primary_key=True)  # "{user id}:{method}:{path}:{Idempotency-Key}"
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the request body
+    response = Column(Text, nullable=True)  # JSON; NULL while the claiming request is still running
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
 # Tax Payment Model - For citizen tax payments
 class TaxPaymentDB(Base):
     __tablename__ = "tax_payments"
+    __table_args__ = (
+        # Admin listing is newest first, optionally filtered by type or status
+        Index("ix_tax_payments_created_at", "created_at"),
+        Index("ix_tax_payments_tax_type_created_at", "tax_type", "created_at"),
+        Index("ix_tax_payments_status_created_at", "status", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     receipt_number = Column(String(100), unique=True, index=True, nullable=False)
@@ -199,3 +249,70 @@ class TaxPaymentDB(Base):
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Tax Revenue Counters - Running totals maintained alongside tax_payments
+class TaxRevenueByTypeDB(Base):
+    __tablename__ = "tax_revenue_by_type"
+
+    tax_type = Column(String(50), primary_key=True)
+    payment_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TaxRevenueDailyDB(Base):
+    __tablename__ = "tax_revenue_daily"
+
+    day = Column(Date, primary_key=True)  # UTC date of TaxPaymentDB.created_at
+    payment_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+
+# Receipt Sequence Model - Per-year counter behind TX-{year}-{number} receipts
+class ReceiptSequenceDB(Base):
+    __tablename__ = "receipt_sequences"
+
+    year = Column(Integer, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=0)  # first counter not yet reserved
+
+# Spending Rollup Model - Paid expenses per day, ministry, project and category
+class SpendingDailyDB(Base):
+    __tablename__ = "spending_daily"
+    __table_args__ = (
+        Index("ix_spending_daily_ministry_id_day", "ministry_id", "day"),
+    )
+
+    day = Column(Date, primary_key=True)  # UTC date of the chain transaction
+    ministry_id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, primary_key=True)  # 0 when not tied to a project
+    category = Column(String(100), primary_key=True)
+    payment_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    min_amount = Column(Float, nullable=False)
+    max_amount = Column(Float, nullable=False)
+
+# Tax Anchor Model - One Merkle root per batch of tax payments written to the chain
+class TaxAnchorDB(Base):
+    __tablename__ = "tax_anchors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    merkle_root = Column(String(64), unique=True, nullable=False)
+    leaf_count = Column(Integer, nullable=False)
+    first_payment_id = Column(Integer, nullable=False)
+    last_payment_id = Column(Integer, index=True, nullable=False)
+
+    # Where the root was recorded on the chain, kept so receipts can be
+    # verified without the (in-memory) chain that mined it
+    block_id = Column(String(50), nullable=False)
+    block_height = Column(Integer, nullable=True)
+    block_hash = Column(String(64), nullable=False)
+    transaction_id = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Tax Payment Proof Model - Merkle inclusion proof linking a payment to its anchor
+class TaxPaymentProofDB(Base):
+    __tablename__ = "tax_payment_proofs"
+
+    payment_id = Column(Integer, ForeignKey("tax_payments.id"), primary_key=True)
+    anchor_id = Column(Integer, ForeignKey("tax_anchors.id"), index=True, nullable=False)
+    leaf_index = Column(Integer, nullable=False)
+    leaf_hash = Column(String(64), nullable=False)
+    proof = Column(Text, nullable=False)  # JSON list of [sibling hash, "L" | "R"]
@@ -0,0 +1,106 @@
+# query_counts.py
+# Check that the ministry reads cost the same number of SQL statements no
+# matter how many ministries there are or how many projects they have (no N+1
+# lookups per ministry or per project). Runs the router functions against
+# throwaway databases for every combination of sizes, counting statements with
+# a before_cursor_execute listener, and exits non-zero if a count changes.
+#
+# Usage: python query_counts.py [--ministries 1 10 50] [--projects 0 1 10 50]
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from auth import Principal
+from database import make_async_engine, make_engine
+from models import Base, MinistryDB, ProjectDB
+
+ADMIN = Principal(id=1, office_name="QueryCounts", wallet_address="0xquerycounts", role="super_admin")
+
+def make_database(ministries: int, projects: int) -> str:
+    """A fresh database with `ministries` ministries of `projects` projects each."""
+    path = os.path.join(tempfile.mkdtemp(), "counts.sqlite")
+    engine = make_engine(path)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(MinistryDB), [
+            {"name": f"Ministry {i}", "code": f"M{i:03d}", "ministry_type": "health",
+             "wallet_address": f"0xministry{i}", "allocated_budget": 0.0, "used_funds": 0.0,
+             "is_active": True, "created_at": now}
+            for i in range(1, ministries + 1)
+        ])
+        rows = [
+            {"ministry_id": m, "name": f"Project {m}-{p}", "budget": 0.0, "spent": 0.0,
+             "status": "in_progress" if p % 2 else "completed", "created_at": now}
+            for m in range(1, ministries + 1) for p in range(projects)
+        ]
+        if rows:
+            conn.execute(insert(ProjectDB), rows)
+    engine.dispose()
+    return path
+
+def calls():
+    """(name, coroutine factory) pairs mirroring the ministry read endpoints."""
+    from ministry_endpoints import get_ministry, list_ministries
+
+    return [
+        ("list ministries", lambda db: list_ministries(skip=0, limit=100, include_inactive=False,
+                                                       db=db, current_user=ADMIN)),
+        ("get ministry", lambda db: get_ministry(ministry_id=1, db=db, current_user=ADMIN)),
+    ]
+
+async def count_statements(path: str) -> dict:
+    engine = make_async_engine(path, read_only=True)
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    counts = {}
+    try:
+        for name, call in calls():
+            # PRAGMAs run on connect, so start counting once the connection is open
+            async with Session() as db:
+                await db.connection()
+                statements.clear()
+                await call(db)
+            counts[name] = len(statements)
+    finally:
+        await engine.dispose()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fail if ministry reads issue more statements as ministries or projects grow")
+    parser.add_argument("--ministries", type=int, nargs="+", default=[1, 10, 50],
+                        help="number of ministries for each run")
+    parser.add_argument("--projects", type=int, nargs="+", default=[0, 1, 10, 50],
+                        help="projects per ministry for each run")
+    args = parser.parse_args()
+
+    sizes = list(itertools.product(args.ministries, args.projects))
+    results = {
+        size: asyncio.run(count_statements(make_database(*size)))
+        for size in sizes
+    }
+    failures = 0
+    for name, _ in calls():
+        counts = [results[size][name] for size in sizes]
+        grows = len(set(counts)) > 1
+        failures += grows
+        per_size = ", ".join(f"{ministries}x{projects}: {count}"
+                             for (ministries, projects), count in zip(sizes, counts))
+        print(f"{'FAIL' if grows else 'ok':>4}  {name} (ministries x projects): {per_size}")
+    if failures:
+        print(f"{failures} reads issue more statements as ministries or projects grow")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# query_plans.py
+# Check that the hot API queries are served by indexes. Runs EXPLAIN QUERY PLAN
+# for each one and exits non-zero if any falls back to a full table scan or
+# sorts in a temp b-tree.
+#
+# Usage: python query_plans.py                      # fresh schema built from models.py
+#        python query_plans.py --database gok_db.sqlite   # an existing (migrated) database
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, tuple_
+
+from models import Base, ExpenseRequestDB, MinistryDB, ProjectDB, ReportDB, TaxPaymentDB
+
+# "SCAN tax_payments" with no index; "SCAN ... USING [COVERING] INDEX" is an index walk
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: LEFT-JOIN)?$")
+MATERIALIZE = re.compile(r"^MATERIALIZE (\w+)$")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+def hot_queries():
+    """(name, statement) pairs mirroring the queries in the routers."""
+    from ministry_endpoints import ministry_summary_query
+    from spending import spending_query
+
+    since = datetime.utcnow() - timedelta(days=30)
+    tax_listing = select(TaxPaymentDB).order_by(TaxPaymentDB.created_at.desc()).limit(100)
+    expenses = select(ExpenseRequestDB).where(ExpenseRequestDB.ministry_id == 1)
+    return [
+        ("ministry summary", ministry_summary_query(1)),
+        ("ministry projects", select(ProjectDB).where(ProjectDB.ministry_id == 1)),
+        ("ministry expenses", expenses.order_by(ExpenseRequestDB.requested_at.desc())),
+        ("ministry expenses by status", expenses.where(ExpenseRequestDB.status == "pending")
+            .order_by(ExpenseRequestDB.requested_at.desc())),
+        ("tax payments", tax_listing),
+        ("tax payments page", select(TaxPaymentDB)
+            .where(tuple_(TaxPaymentDB.created_at, TaxPaymentDB.id) < (since, 1000))
+            .order_by(TaxPaymentDB.created_at.desc(), TaxPaymentDB.id.desc()).limit(100)),
+        ("tax payments by status", tax_listing.where(TaxPaymentDB.status == "completed")),
+        ("tax payments by type", tax_listing.where(TaxPaymentDB.tax_type == "income")),
+        ("recent tax payments", select(func.count(TaxPaymentDB.id)).where(TaxPaymentDB.created_at >= since)),
+        ("tax receipt lookup", select(TaxPaymentDB).where(TaxPaymentDB.receipt_number == "TX-2026-000001")),
+        ("reports", select(ReportDB).order_by(ReportDB.created_at.desc())),
+        ("reports by status", select(ReportDB).where(ReportDB.status == "pending")
+            .order_by(ReportDB.created_at.desc())),
+        ("report status counts", select(ReportDB.status, func.count(ReportDB.id)).group_by(ReportDB.status)),
+        ("reports page", select(ReportDB)
+            .where(tuple_(ReportDB.created_at, ReportDB.id) < (since, 1000))
+            .order_by(ReportDB.created_at.desc(), ReportDB.id.desc()).limit(100)),
+        ("reports by type", select(ReportDB).where(ReportDB.report_type == "tax_payment")
+            .order_by(ReportDB.created_at.desc(), ReportDB.id.desc()).limit(100)),
+        ("reports changed since", select(ReportDB)
+            .where(ReportDB.change_seq > 1000).order_by(ReportDB.change_seq).limit(100)),
+        ("latest report change", select(func.max(ReportDB.change_seq))),
+        ("ministry spending", spending_query("day", since.date(), ministry_id=1)),
+        ("ministry spending by month", spending_query("month", since.date(), ministry_id=1)),
+    ]
+
+def explain(conn, statement):
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+def problems(plan):
+    found = []
+    # Scanning a materialized subquery reads its (small) result, not a table
+    subqueries = {m.group(1) for m in map(MATERIALIZE.match, plan) if m}
+    for detail in plan:
+        scan = FULL_SCAN.match(detail)
+        if scan and scan.group(1) not in subqueries:
+            found.append(detail)
+        elif detail.startswith(TEMP_SORT):
+            found.append(detail)
+    return found
+
+def check(database: str) -> int:
+    engine = create_engine(f"sqlite:///{database}")
+    failures = 0
+    with engine.connect() as conn:
+        for name, statement in hot_queries():
+            plan = explain(conn, statement)
+            bad = problems(plan)
+            failures += bool(bad)
+            print(f"{'FAIL' if bad else 'ok':>4}  {name}: {'; '.join(plan)}")
+    engine.dispose()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a hot query needs a full table scan")
+    parser.add_argument("--database", help="SQLite file to check (default: fresh schema from models.py)")
+    args = parser.parse_args()
+
+    database = args.database
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(), "plans.sqlite")
+        engine = create_engine(f"sqlite:///{database}")
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+
+    failures = check(database)
+    if failures:
+        print(f"{failures} hot queries are not index-backed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# receipts.py
+
+import asyncio
+import hashlib
+import hmac
+import os
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import AsyncSessionLocal
+from models import ReceiptSequenceDB, TaxPaymentDB
+
+RECEIPT_KEY = os.getenv("RECEIPT_KEY", "your-receipt-key")  # Change this in production
+RECEIPT_BATCH_SIZE = int(os.getenv("RECEIPT_BATCH_SIZE", "100"))
+# Receipts per IN (...) lookup when screening a batch for legacy clashes
+LOOKUP_CHUNK = 500
+
+# Receipts keep the TX-{year}-{6 digits} format: 10^6 numbers per year,
+# split into two 3-digit halves for the Feistel network below
+HALF_DOMAIN = 1000
+RECEIPTS_PER_YEAR = HALF_DOMAIN * HALF_DOMAIN
+FEISTEL_ROUNDS = 4
+
+class ReceiptNumbersExhausted(Exception):
+    """Raised when every receipt number for a year has been handed out."""
+
+class ReceiptPermutation:
+    """Keyed permutation of 0..999999, so sequential counters map to unguessable numbers.
+
+    A balanced Feistel network over two base-1000 halves with modular
+    addition: each round is invertible, so every counter maps to a distinct
+    number without storing or checking anything. The year is mixed into the
+    round function, giving each year its own ordering.
+    """
+
+    def __init__(self, key: str = RECEIPT_KEY, rounds: int = FEISTEL_ROUNDS):
+        self.key = key.encode("utf-8")
+        self.rounds = rounds
+
+    def _round(self, year: int, round_index: int, half: int) -> int:
+        message = f"{year}:{round_index}:{half}".encode("ascii")
+        digest = hmac.new(self.key, message, hashlib.sha256).digest()
+        return int.from_bytes(digest[:4], "big") % HALF_DOMAIN
+
+    def encode(self, year: int, counter: int) -> int:
+        left, right = divmod(counter, HALF_DOMAIN)
+        for round_index in range(self.rounds):
+            left, right = right, (left + self._round(year, round_index, right)) % HALF_DOMAIN
+        return left * HALF_DOMAIN + right
+
+    def decode(self, year: int, number: int) -> int:
+        left, right = divmod(number, HALF_DOMAIN)
+        for round_index in reversed(range(self.rounds)):
+            left, right = (right - self._round(year, round_index, left)) % HALF_DOMAIN, left
+        return left * HALF_DOMAIN + right
+
+def format_receipt(year: int, number: int) -> str:
+    return f"TX-{year}-{number:06d}"
+
+class ReceiptAllocator:
+    """Hands out unique receipt numbers from a per-year counter.
+
+    Counters are reserved from the `receipt_sequences` table `batch_size` at
+    a time, so the database is touched once per batch; every other call is
+    an in-memory pop. Reservations commit on their own short transaction
+    (not the caller's), so a rolled-back payment can only leave a gap and
+    never a reused number.
+
+    Receipts issued before this allocator were random, so each fresh batch
+    is checked against `tax_payments` with an indexed lookup and any clashes
+    are dropped.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = RECEIPT_BATCH_SIZE,
+                 permutation: ReceiptPermutation = None):
+        # Own short session on the shared writer engine, not the caller's
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.permutation = permutation or ReceiptPermutation()
+        self._blocks: Dict[int, List[str]] = {}  # year -> unused receipts, next one last
+        self._lock = asyncio.Lock()
+
+    async def _reserve(self, year: int, count: int) -> Tuple[int, int]:
+        """Atomically advance the year's counter by `count`; returns [start, end)."""
+        statement = insert(ReceiptSequenceDB).values(year=year, next_value=count)
+        statement = statement.on_conflict_do_update(
+            index_elements=["year"],
+            set_={"next_value": ReceiptSequenceDB.next_value + count}
+        ).returning(ReceiptSequenceDB.next_value)
+        async with self.session_factory() as db:
+            end = (await db.execute(statement)).scalar_one()
+            await db.commit()
+        return end - count, end
+
+    async def _refill(self, year: int, minimum: int):
+        block = self._blocks.setdefault(year, [])
+        while len(block) < minimum:
+            start, end = await self._reserve(year, max(self.batch_size, minimum - len(block)))
+            if start >= RECEIPTS_PER_YEAR:
+                raise ReceiptNumbersExhausted(f"All receipt numbers for {year} are in use")
+            candidates = [
+                format_receipt(year, self.permutation.encode(year, counter))
+                for counter in range(start, min(end, RECEIPTS_PER_YEAR))
+            ]
+            taken = set()
+            async with self.session_factory() as db:
+                for i in range(0, len(candidates), LOOKUP_CHUNK):
+                    chunk = candidates[i:i + LOOKUP_CHUNK]
+                    taken.update((await db.execute(
+                        select(TaxPaymentDB.receipt_number).where(TaxPaymentDB.receipt_number.in_(chunk))
+                    )).scalars())
+            fresh = [receipt for receipt in candidates if receipt not in taken]
+            fresh.reverse()
+            block[:0] = fresh
+
+    async def allocate_many(self, year: int, count: int) -> List[str]:
+        """Return `count` unused receipt numbers for `year`."""
+        if count <= 0:
+            return []
+        async with self._lock:
+            await self._refill(year, count)
+            block = self._blocks[year]
+            taken = block[len(block) - count:]
+            del block[len(block) - count:]
+        taken.reverse()
+        return taken
+
+    async def allocate(self, year: int) -> str:
+        return (await self.allocate_many(year, 1))[0]
+
+# Shared allocator used by tax_endpoints.py
+receipt_allocator = ReceiptAllocator()
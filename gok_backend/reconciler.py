@@ -0,0 +1,161 @@
+# reconciler.py
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from audit import get_logger
+from endpoints import blockchain
+from models import MinistryDB, ProjectDB
+
+logger = get_logger("reconciler")
+
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "5"))
+# Differences below this are rounding, not drift
+DRIFT_TOLERANCE = 0.01
+
+DriftKey = Tuple[str, int, str]  # (kind, id, column)
+
+class LedgerReconciler:
+    """Checks the ministry and project money columns against the chain.
+
+    `allocated_budget`, `used_funds` and `spent` are updated by the
+    endpoints next to the transactions they mine, but nothing ties the two
+    together. Each pass applies only the blocks sealed since the last
+    checkpoint to running per-ministry and per-project totals, then
+    compares `opening value + chain total` with the columns.
+
+    The chain lives in memory and starts over with the process, so the
+    opening values are the columns as they stood when `baseline()` ran at
+    startup, before any request could mine. A difference must show up on
+    two passes in a row to be reported: the endpoints commit a moment after
+    they mine, and a pass can land in between.
+    """
+
+    def __init__(self, blockchain, tolerance: float = DRIFT_TOLERANCE):
+        self.blockchain = blockchain
+        self.tolerance = tolerance
+        self.checkpoint = 0  # index of the next block to apply
+        self.opening_ministries: Dict[int, Tuple[float, float]] = {}  # id -> (allocated, used)
+        self.opening_projects: Dict[int, float] = {}  # id -> spent
+        self.allocated: Dict[int, float] = {}
+        self.used: Dict[int, float] = {}
+        self.spent: Dict[int, float] = {}
+        self.drift: List[dict] = []
+        self.last_run: Optional[datetime] = None
+        self._suspects: Set[DriftKey] = set()
+
+    async def baseline(self, db: AsyncSession):
+        """Record the columns as opening values and start from the current chain tip."""
+        self.opening_ministries = {
+            ministry_id: (allocated or 0.0, used or 0.0)
+            for ministry_id, allocated, used in (await db.execute(
+                select(MinistryDB.id, MinistryDB.allocated_budget, MinistryDB.used_funds)
+            )).all()
+        }
+        self.opening_projects = {
+            project_id: spent or 0.0
+            for project_id, spent in (await db.execute(select(ProjectDB.id, ProjectDB.spent))).all()
+        }
+        self.allocated, self.used, self.spent = {}, {}, {}
+        self.checkpoint = len(self.blockchain.chain)
+
+    def apply_block(self, block, ministry_wallets: Dict[str, int]):
+        for transaction in block.transactions:
+            amount = transaction["amount"]
+            category = transaction.get("category")
+            ministry_id = transaction.get("ministry_id")
+            if category == "budget_allocation" and ministry_id:
+                self.allocated[ministry_id] = self.allocated.get(ministry_id, 0.0) + amount
+            elif category == "ministry_transfer":
+                sender = ministry_wallets.get(transaction["sender"])
+                recipient = ministry_wallets.get(transaction["recipient"])
+                if sender:
+                    self.used[sender] = self.used.get(sender, 0.0) + amount
+                if recipient:
+                    self.allocated[recipient] = self.allocated.get(recipient, 0.0) + amount
+            elif transaction["recipient"] == "EXPENSE_PAID" and ministry_id:
+                self.used[ministry_id] = self.used.get(ministry_id, 0.0) + amount
+                project_id = transaction.get("project_id")
+                if project_id:
+                    self.spent[project_id] = self.spent.get(project_id, 0.0) + amount
+
+    async def run_once(self, db: AsyncSession) -> List[dict]:
+        """Apply newly sealed blocks, compare with the database, and return confirmed drift."""
+        ministries = (await db.execute(
+            select(MinistryDB.id, MinistryDB.wallet_address, MinistryDB.allocated_budget, MinistryDB.used_funds)
+        )).all()
+        projects = (await db.execute(select(ProjectDB.id, ProjectDB.spent))).all()
+
+        chain = self.blockchain.chain
+        if self.checkpoint < len(chain):
+            ministry_wallets = {row.wallet_address: row.id for row in ministries}
+            for block in chain[self.checkpoint:]:
+                self.apply_block(block, ministry_wallets)
+            self.checkpoint = len(chain)
+
+        found: Dict[DriftKey, Tuple[float, float]] = {}
+        for ministry_id, _, allocated, used in ministries:
+            opening_allocated, opening_used = self.opening_ministries.get(ministry_id, (0.0, 0.0))
+            expected = {
+                "allocated_budget": opening_allocated + self.allocated.get(ministry_id, 0.0),
+                "used_funds": opening_used + self.used.get(ministry_id, 0.0),
+            }
+            recorded = {"allocated_budget": allocated or 0.0, "used_funds": used or 0.0}
+            for column in expected:
+                if abs(recorded[column] - expected[column]) > self.tolerance:
+                    found[("ministry", ministry_id, column)] = (recorded[column], expected[column])
+        for project_id, spent in projects:
+            expected_spent = self.opening_projects.get(project_id, 0.0) + self.spent.get(project_id, 0.0)
+            if abs((spent or 0.0) - expected_spent) > self.tolerance:
+                found[("project", project_id, "spent")] = (spent or 0.0, expected_spent)
+
+        confirmed = []
+        for key, (recorded, expected) in found.items():
+            if key not in self._suspects:
+                continue
+            kind, row_id, column = key
+            confirmed.append({
+                "kind": kind,
+                "id": row_id,
+                "column": column,
+                "recorded": recorded,
+                "expected": expected,
+                "difference": recorded - expected
+            })
+            if not any(d["kind"] == kind and d["id"] == row_id and d["column"] == column for d in self.drift):
+                logger.warning("Ledger drift on %s %d %s: recorded %s, chain says %s", kind, row_id, column,
+                               recorded, expected, extra={"event": "ledger_drift", "amount": recorded - expected})
+        self._suspects = set(found)
+        self.drift = confirmed
+        self.last_run = datetime.utcnow()
+        return confirmed
+
+    def status(self) -> dict:
+        return {
+            "checkpoint": self.checkpoint,
+            "chain_length": len(self.blockchain.chain),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "in_sync": not self.drift,
+            "drift": self.drift
+        }
+
+# Shared reconciler for the API's chain
+ledger_reconciler = LedgerReconciler(blockchain)
+
+async def run_reconciler(reconciler: LedgerReconciler, session_factory,
+                         interval: float = RECONCILE_INTERVAL_SECONDS):
+    """Background loop: reconcile, then sleep `interval` seconds."""
+    while True:
+        try:
+            async with session_factory() as db:
+                await reconciler.run_once(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Ledger reconciliation failed: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,139 @@
+# revocation.py
+
+import asyncio
+import hashlib
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from audit import get_logger
+from database import AsyncReadSessionLocal, AsyncSessionLocal
+from models import RevokedTokenDB
+
+# How often a worker looks for revocations made by other workers
+REVOCATION_SYNC_INTERVAL_SECONDS = 1.0
+# How often rows for expired tokens are deleted
+REVOCATION_PURGE_INTERVAL_SECONDS = 3600.0
+
+logger = get_logger("revocation")
+
+def token_id(payload: dict, token: str) -> str:
+    """The revocation key for a token: its jti claim, or a digest for older tokens."""
+    jti = payload.get("jti")
+    if jti:
+        return jti
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+
+class TokenRevocationStore:
+    """Revoked token ids that disappear once the token would have expired anyway.
+
+    Membership checks hit an in-memory dict (O(1)). A min-heap ordered by
+    expiry drops entries as their tokens lapse, so memory is bounded by the
+    revoked tokens that are still live. Every revocation is also written to
+    the `revoked_tokens` table, which survives restarts and is polled (by
+    row id, at most once per `sync_interval`) to pick up revocations made by
+    other worker processes. Rows for expired tokens are deleted by
+    `run_revocation_purge`.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal,
+                 sync_interval: float = REVOCATION_SYNC_INTERVAL_SECONDS,
+                 read_session_factory=AsyncReadSessionLocal):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self.sync_interval = sync_interval
+        self._expiry: Dict[str, float] = {}       # jti -> exp (epoch seconds)
+        self._heap: List[Tuple[float, str]] = []  # (exp, jti)
+        self._last_row_id = 0
+        self._last_sync = 0.0
+        self._lock = asyncio.Lock()
+
+    def _remember(self, jti: str, expires_at: float):
+        if jti not in self._expiry:
+            heapq.heappush(self._heap, (expires_at, jti))
+        self._expiry[jti] = expires_at
+
+    def _expire(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._heap)
+            if self._expiry.get(jti) == expires_at:
+                del self._expiry[jti]
+
+    async def sync(self, force: bool = False):
+        """Load revocations written since the last sync, including other workers'."""
+        if not force and time.time() - self._last_sync < self.sync_interval:
+            return
+        async with self._lock:
+            now = time.time()
+            # Another request may have synced while this one waited for the lock
+            if not force and now - self._last_sync < self.sync_interval:
+                return
+            self._last_sync = now
+            async with self.read_session_factory() as db:
+                rows = (await db.execute(
+                    select(RevokedTokenDB.id, RevokedTokenDB.jti, RevokedTokenDB.expires_at).where(
+                        RevokedTokenDB.id > self._last_row_id,
+                        RevokedTokenDB.expires_at > datetime.utcfromtimestamp(now)
+                    ).order_by(RevokedTokenDB.id)
+                )).all()
+            for row_id, jti, expires_at in rows:
+                self._remember(jti, _epoch(expires_at))
+                self._last_row_id = row_id
+            self._expire(now)
+
+    async def is_revoked(self, jti: str) -> bool:
+        await self.sync()
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    async def revoke(self, jti: str, expires_at: Optional[float]) -> bool:
+        """Revoke a token id until `expires_at`. Returns False if it was already revoked."""
+        if await self.is_revoked(jti):
+            return False
+        expires_at = expires_at or time.time()
+        async with self._lock:
+            async with self.session_factory() as db:
+                exists = (await db.execute(
+                    select(RevokedTokenDB.id).where(RevokedTokenDB.jti == jti)
+                )).first()
+                if exists is None:
+                    db.add(RevokedTokenDB(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+                    await db.commit()
+            self._remember(jti, expires_at)
+        return exists is None
+
+    async def purge_expired(self) -> int:
+        """Delete rows for tokens that have expired. Returns the number removed."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(RevokedTokenDB).where(RevokedTokenDB.expires_at <= datetime.utcnow())
+            )
+            await db.commit()
+        self._expire(time.time())
+        return result.rowcount
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+def _epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+# Shared store used by auth.py and the logout endpoint
+revocation_store = TokenRevocationStore()
+
+async def run_revocation_purge(store: TokenRevocationStore = revocation_store,
+                               interval: float = REVOCATION_PURGE_INTERVAL_SECONDS):
+    """Background loop: every `interval` seconds, delete rows for expired tokens."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await store.purge_expired()
+            if removed:
+                logger.info("Purged %d expired token revocations", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Revocation purge failed: %s", e)
@@ -122,6 +122,9 @@ class ExpenseRequestUpdate(BaseModel):
     status: str
     rejection_reason: Optional[str] = None
 
+class ExpenseBatchApprove(BaseModel):
+    expense_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
 class ExpenseRequestResponse(BaseModel):
     id: int
     ministry_id: int
@@ -154,6 +157,9 @@ class Transaction(BaseModel):
     project_id: Optional[int] = None
     category: Optional[str] = None
 
+class TransactionBatch(BaseModel):
+    transfers: List[Transaction] = Field(..., min_length=1, max_length=1000)
+
 # ==================== Report Schemas ====================
 
 class Report(BaseModel):
@@ -0,0 +1,269 @@
+# spending.py
+# Daily spending rollups per ministry, project and category, behind
+# /ministries/{id}/spending and /analytics/spending. Sealed blocks feed them
+# through a block listener; the CLI rebuilds them from approved expense
+# requests or checks them for drift.
+#
+# Usage: python spending.py rebuild    # backfill / recompute all rollups
+#        python spending.py check      # exit non-zero if rollups disagree with expense_requests
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import deque
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from audit import get_logger
+from models import ExpenseRequestDB, SpendingDailyDB
+
+logger = get_logger("spending")
+
+# Sealed spending waits at most this long before it is written
+SPENDING_FLUSH_SECONDS = float(os.getenv("SPENDING_FLUSH_SECONDS", "1"))
+# project_id for spending not tied to a project, so the key has no NULLs
+NO_PROJECT = 0
+DEFAULT_CATEGORY = "general_expense"
+GRANULARITIES = ("day", "week", "month")
+
+SpendingKey = Tuple[date, int, int, str]  # (day, ministry_id, project_id, category)
+Spending = Tuple[SpendingKey, float]
+
+def block_spending(block) -> List[Spending]:
+    """Paid expenses in a block, as (key, amount)."""
+    spending = []
+    for transaction in block.transactions:
+        if transaction["recipient"] != "EXPENSE_PAID" or not transaction.get("ministry_id"):
+            continue
+        key = (
+            date.fromisoformat(transaction["date"]),
+            transaction["ministry_id"],
+            transaction.get("project_id") or NO_PROJECT,
+            transaction.get("category") or DEFAULT_CATEGORY,
+        )
+        spending.append((key, float(transaction["amount"])))
+    return spending
+
+def _rollup(spending: Iterable[Spending]) -> Dict[SpendingKey, List[float]]:
+    """Group amounts by key into [count, total, min, max]."""
+    rows: Dict[SpendingKey, List[float]] = {}
+    for key, amount in spending:
+        row = rows.get(key)
+        if row is None:
+            rows[key] = [1, amount, amount, amount]
+        else:
+            row[0] += 1
+            row[1] += amount
+            row[2] = min(row[2], amount)
+            row[3] = max(row[3], amount)
+    return rows
+
+def _increment(key: SpendingKey, count: int, total: float, minimum: float, maximum: float):
+    """INSERT ... ON CONFLICT DO UPDATE folding a group of payments into a rollup row."""
+    table = SpendingDailyDB.__table__
+    day, ministry_id, project_id, category = key
+    statement = insert(table).values(
+        day=day, ministry_id=ministry_id, project_id=project_id, category=category,
+        payment_count=count, total_amount=total, min_amount=minimum, max_amount=maximum
+    )
+    return statement.on_conflict_do_update(
+        index_elements=["day", "ministry_id", "project_id", "category"],
+        set_={
+            "payment_count": table.c.payment_count + statement.excluded.payment_count,
+            "total_amount": table.c.total_amount + statement.excluded.total_amount,
+            # Two-argument min()/max() are SQLite's scalar functions
+            "min_amount": func.min(table.c.min_amount, statement.excluded.min_amount),
+            "max_amount": func.max(table.c.max_amount, statement.excluded.max_amount),
+        }
+    )
+
+async def record_spending(db: AsyncSession, spending: Iterable[Spending]):
+    """Fold payments into the rollups inside the caller's transaction: one upsert per key."""
+    for key, (count, total, minimum, maximum) in _rollup(spending).items():
+        await db.execute(_increment(key, int(count), total, minimum, maximum))
+
+class SpendingRecorder:
+    """Block listener that feeds the spending rollups.
+
+    `on_block` runs inline when a block is sealed, so it only extracts the
+    paid expenses and queues them. `run` writes the queue in one
+    transaction, woken by each sealed block and at most every
+    `SPENDING_FLUSH_SECONDS`; a failed write is retried on the next flush.
+    `stop()` makes `run` flush once more and return.
+    """
+
+    def __init__(self):
+        self._queue: deque = deque()
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def on_block(self, block):
+        spending = block_spending(block)
+        if spending:
+            self._queue.extend(spending)
+            self._wake.set()
+
+    async def flush(self, session_factory) -> int:
+        if not self._queue:
+            return 0
+        batch = list(self._queue)
+        self._queue.clear()
+        try:
+            async with session_factory() as db:
+                await record_spending(db, batch)
+                await db.commit()
+        except Exception:
+            self._queue.extendleft(reversed(batch))
+            raise
+        return len(batch)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    async def run(self, session_factory, interval: float = SPENDING_FLUSH_SECONDS):
+        self._stopping = False
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush(session_factory)
+            except Exception as e:
+                logger.exception("Spending rollup flush failed: %s", e)
+
+# Shared recorder, registered on the API's chain at startup
+spending_recorder = SpendingRecorder()
+
+def period_column(granularity: str):
+    """SQL expression for the first day of the day/week (Monday)/month containing `day`."""
+    if granularity == "week":
+        return func.date(SpendingDailyDB.day, "-6 days", "weekday 1")
+    if granularity == "month":
+        return func.strftime("%Y-%m-01", SpendingDailyDB.day)
+    return SpendingDailyDB.day
+
+def spending_query(
+    granularity: str = "day",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    ministry_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    category: Optional[str] = None,
+    by_ministry: bool = False
+):
+    """Rollups summed per period (and ministry). Dates are [start_date, end_date]."""
+    period = period_column(granularity).label("period")
+    columns = [period]
+    if by_ministry:
+        columns.append(SpendingDailyDB.ministry_id)
+    query = select(
+        *columns,
+        func.sum(SpendingDailyDB.payment_count).label("payment_count"),
+        func.sum(SpendingDailyDB.total_amount).label("total_amount"),
+        func.min(SpendingDailyDB.min_amount).label("min_amount"),
+        func.max(SpendingDailyDB.max_amount).label("max_amount"),
+    )
+    if ministry_id is not None:
+        query = query.where(SpendingDailyDB.ministry_id == ministry_id)
+    if project_id is not None:
+        query = query.where(SpendingDailyDB.project_id == project_id)
+    if category:
+        query = query.where(SpendingDailyDB.category == category)
+    if start_date:
+        query = query.where(SpendingDailyDB.day >= start_date)
+    if end_date:
+        query = query.where(SpendingDailyDB.day <= end_date)
+    return query.group_by(*columns).order_by(*columns)
+
+async def read_spending(db: AsyncSession, granularity: str = "day", by_ministry: bool = False, **filters) -> List[dict]:
+    """Spending series from the rollups; `filters` are those of `spending_query`."""
+    query = spending_query(granularity, by_ministry=by_ministry, **filters)
+    series = []
+    for row in (await db.execute(query)).all():
+        point = {
+            "period": str(row.period),
+            "payment_count": row.payment_count,
+            "total_amount": float(row.total_amount),
+            "min_amount": float(row.min_amount),
+            "max_amount": float(row.max_amount),
+        }
+        if by_ministry:
+            point["ministry_id"] = row.ministry_id
+        series.append(point)
+    return series
+
+def _recomputed(db: Session) -> Dict[SpendingKey, List[float]]:
+    """Rollup values recomputed from approved expense requests."""
+    rows = db.execute(
+        select(ExpenseRequestDB.approved_at, ExpenseRequestDB.ministry_id, ExpenseRequestDB.project_id,
+               ExpenseRequestDB.category, ExpenseRequestDB.amount)
+        .where(ExpenseRequestDB.status == "approved", ExpenseRequestDB.approved_at.isnot(None))
+    )
+    return _rollup(
+        ((approved_at.date(), ministry_id, project_id or NO_PROJECT, category or DEFAULT_CATEGORY), amount)
+        for approved_at, ministry_id, project_id, category, amount in rows
+    )
+
+def rebuild(db: Session) -> int:
+    """Replace the rollups with values recomputed from expense_requests."""
+    rows = _recomputed(db)
+    db.query(SpendingDailyDB).delete()
+    db.add_all(
+        SpendingDailyDB(day=day, ministry_id=ministry_id, project_id=project_id, category=category,
+                        payment_count=int(count), total_amount=total, min_amount=minimum, max_amount=maximum)
+        for (day, ministry_id, project_id, category), (count, total, minimum, maximum) in rows.items()
+    )
+    db.commit()
+    return len(rows)
+
+def check(db: Session, tolerance: float = 0.01) -> List[str]:
+    """Compare rollups with expense_requests. Returns a list of human-readable mismatches."""
+    expected = _recomputed(db)
+    stored = {
+        (row.day, row.ministry_id, row.project_id, row.category):
+            [row.payment_count, row.total_amount, row.min_amount, row.max_amount]
+        for row in db.query(SpendingDailyDB)
+    }
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want = expected.get(key, [0, 0.0, 0.0, 0.0])
+        have = stored.get(key, [0, 0.0, 0.0, 0.0])
+        if want[0] != have[0] or any(abs(w - h) > tolerance for w, h in zip(want[1:], have[1:])):
+            mismatches.append(
+                f"{key}: rollup has {have[0]} / {have[1]:.2f}, expense_requests has {want[0]} / {want[1]:.2f}"
+            )
+    return mismatches
+
+def main():
+    from database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Rebuild or check the spending rollups")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    SpendingDailyDB.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild(db)} spending rollup rows")
+        else:
+            mismatches = check(db)
+            for line in mismatches:
+                print(line)
+            if mismatches:
+                sys.exit(1)
+            print("Spending rollups match expense_requests")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
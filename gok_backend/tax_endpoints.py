@@ -1,39 +1,73 @@
-# tax_endpoints.py
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db
-from models import TaxPaymentDB
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncReadSessionLocal, AsyncSessionLocal, get_async_db, get_async_read_db
+from models import TaxAnchorDB, TaxPaymentDB, TaxPaymentProofDB
+from auth import Principal, require_finance_office
 from schemas import TaxPaymentCreate, TaxPaymentResponse
+from receipts import ReceiptNumbersExhausted, receipt_allocator
+from tax_stats import read_tax_stats, record_tax_payment
+from tax_ingest import ingest_payments
+from anchoring import anchor_pending_payments, payment_leaf, verify_proof
+from endpoints import blockchain
+from utils import decode_cursor, encode_cursor
 from typing import List, Optional
 from datetime import datetime
-import random
-import string
+import csv
+import io
+import json
+import tempfile
 
 router = APIRouter()
 
-def generate_receipt_number():
-    """Generate a unique receipt number"""
-    year = datetime.now().year
-    random_part = ''.join(random.choices(string.digits, k=6))
-    return f"TX-{year}-{random_part}"
+# Uploads and result files larger than this spill from memory to disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Rows fetched per round trip by the streaming export
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = [
+    "id", "receipt_number", "taxpayer_name", "id_number", "phone_number", "email",
+    "tax_type", "amount", "payment_method", "status", "transaction_hash", "created_at"
+]
+
+def filter_tax_payments(
+    query,
+    status: Optional[str] = None,
+    tax_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None
+):
+    """Apply the listing/export filters. Dates are [start_date, end_date)."""
+    if status:
+        query = query.where(TaxPaymentDB.status == status)
+    if tax_type:
+        query = query.where(TaxPaymentDB.tax_type == tax_type)
+    if start_date:
+        query = query.where(TaxPaymentDB.created_at >= start_date)
+    if end_date:
+        query = query.where(TaxPaymentDB.created_at < end_date)
+    if min_amount is not None:
+        query = query.where(TaxPaymentDB.amount >= min_amount)
+    if max_amount is not None:
+        query = query.where(TaxPaymentDB.amount <= max_amount)
+    return query
 
 @router.post("/tax-payments", response_model=TaxPaymentResponse)
-def create_tax_payment(
+async def create_tax_payment(
     payment: TaxPaymentCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit a new tax payment from citizen portal
     """
     try:
-        # Generate unique receipt number
-        receipt_number = generate_receipt_number()
-        
-        # Ensure receipt is unique
-        while db.query(TaxPaymentDB).filter(TaxPaymentDB.receipt_number == receipt_number).first():
-            receipt_number = generate_receipt_number()
-        
+        # Allocate a unique receipt number (no lookups in the common case)
+        created_at = datetime.utcnow()
+        receipt_number = await receipt_allocator.allocate(created_at.year)
+
         # Create tax payment record
         db_payment = TaxPaymentDB(
             receipt_number=receipt_number,
@@ -44,107 +78,272 @@ def create_tax_payment(
             tax_type=payment.tax_type,
             amount=payment.amount,
             payment_method=payment.payment_method,
-            status="completed"
+            status="completed",
+            created_at=created_at
         )
-        
+
         db.add(db_payment)
-        db.commit()
-        db.refresh(db_payment)
-        
+        # Revenue counters are updated in the same transaction as the payment
+        await record_tax_payment(db, payment.tax_type, payment.amount, created_at)
+        await db.commit()
+        await db.refresh(db_payment)
+
         return db_payment
-    
+
+    except ReceiptNumbersExhausted as e:
+        await db.rollback()
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to process tax payment: {str(e)}")
 
+@router.post("/tax-payments/bulk")
+async def bulk_create_tax_payments(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    current_user: Principal = Depends(require_finance_office)
+):
+    """
+    Ingest a settlement file of tax payments (Finance Office only).
+
+    The request body is a CSV file with a header row using the
+    TaxPaymentCreate field names, or JSONL with one payment object per line.
+    Responds with a CSV of per-row results (line, status, receipt_number,
+    error); totals are in the X-Ingest-Created/Invalid/Failed headers.
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+
+    results = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", newline="", encoding="utf-8")
+    with io.TextIOWrapper(upload, encoding="utf-8-sig", newline="") as source:
+        summary = await ingest_payments(source, format, results, AsyncSessionLocal)
+    results.seek(0)
+
+    def stream_results():
+        with results:
+            yield from iter(lambda: results.read(64 * 1024), "")
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": 'attachment; filename="ingest-results.csv"',
+            "X-Ingest-Created": str(summary["created"]),
+            "X-Ingest-Invalid": str(summary["invalid"]),
+            "X-Ingest-Failed": str(summary["failed"]),
+        }
+    )
+
 @router.get("/tax-payments", response_model=List[TaxPaymentResponse])
-def get_tax_payments(
+async def get_tax_payments(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     tax_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Get all tax payments for admin portal
+    Get all tax payments for admin portal, newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` for the next
+    page; it seeks straight to the position instead of skipping rows.
+    `skip` still works for old clients but gets slower on deep pages.
     """
-    query = db.query(TaxPaymentDB)
-    
-    if status:
-        query = query.filter(TaxPaymentDB.status == status)
-    
-    if tax_type:
-        query = query.filter(TaxPaymentDB.tax_type == tax_type)
-    
-    payments = query.order_by(TaxPaymentDB.created_at.desc()).offset(skip).limit(limit).all()
+    query = filter_tax_payments(
+        select(TaxPaymentDB), status, tax_type, start_date, end_date, min_amount, max_amount
+    )
+
+    if cursor:
+        created_at, payment_id = decode_cursor(cursor)
+        query = query.where(tuple_(TaxPaymentDB.created_at, TaxPaymentDB.id) < (created_at, payment_id))
+    elif skip:
+        query = query.offset(skip)
+
+    query = query.order_by(TaxPaymentDB.created_at.desc(), TaxPaymentDB.id.desc()).limit(limit)
+    payments = (await db.execute(query)).scalars().all()
+
+    if len(payments) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(payments[-1].created_at, payments[-1].id)
     return payments
 
+@router.get("/tax-payments/export")
+async def export_tax_payments(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    status: Optional[str] = None,
+    tax_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    current_user: Principal = Depends(require_finance_office)
+):
+    """
+    Stream filtered tax payments as CSV or JSONL (Finance Office only).
+    Rows are read from a server-side cursor in chunks, so memory stays flat
+    however many payments match.
+    """
+    # Plain column rows, not ORM objects, so nothing accumulates in an identity map
+    columns = [TaxPaymentDB.__table__.c[name] for name in EXPORT_COLUMNS]
+    query = filter_tax_payments(
+        select(*columns), status, tax_type, start_date, end_date, min_amount, max_amount
+    ).order_by(TaxPaymentDB.created_at, TaxPaymentDB.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+    def row_values(row):
+        values = list(row)
+        values[-1] = row.created_at.isoformat() if row.created_at else None
+        return values
+
+    def encode_chunk(rows) -> str:
+        buffer = io.StringIO()
+        if format == "csv":
+            csv.writer(buffer).writerows(row_values(row) for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row_values(row)))) + "\n")
+        return buffer.getvalue()
+
+    async def stream_rows():
+        if format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        # Own session: the request's dependencies are torn down before the body streams
+        async with AsyncReadSessionLocal() as db:
+            result = await db.stream(query)
+            async for partition in result.partitions():
+                yield encode_chunk(partition)
+
+    media_type = "text/csv" if format == "csv" else "application/jsonl"
+    filename = f"tax-payments-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/tax-payments/stats/summary")
-def get_tax_payment_stats(
-    db: Session = Depends(get_db)
+async def get_tax_payment_stats(
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Get tax payment statistics for dashboard
-    """
-    from sqlalchemy import func
-    
-    total_payments = db.query(func.count(TaxPaymentDB.id)).scalar() or 0
-    total_revenue = db.query(func.sum(TaxPaymentDB.amount)).scalar() or 0
-    
-    # By tax type
-    by_type = db.query(
-        TaxPaymentDB.tax_type,
-        func.count(TaxPaymentDB.id).label('count'),
-        func.sum(TaxPaymentDB.amount).label('total')
-    ).group_by(TaxPaymentDB.tax_type).all()
-    
-    # Recent payments count (last 30 days)
-    from datetime import timedelta
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_count = db.query(func.count(TaxPaymentDB.id)).filter(
-        TaxPaymentDB.created_at >= thirty_days_ago
-    ).scalar() or 0
-    
-    return {
-        "total_payments": total_payments,
-        "total_revenue": float(total_revenue),
-        "recent_payments_30days": recent_count,
-        "by_tax_type": [
-            {
-                "tax_type": item[0],
-                "count": item[1],
-                "total_amount": float(item[2]) if item[2] else 0
-            }
-            for item in by_type
-        ]
-    }
+    Get tax payment statistics for dashboard.
+    Served from the revenue counter tables; see tax_stats.py to rebuild them.
+    """
+    return await read_tax_stats(db)
 
 @router.get("/tax-payments/receipt/{receipt_number}", response_model=TaxPaymentResponse)
-def get_tax_payment_by_receipt(
+async def get_tax_payment_by_receipt(
     receipt_number: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get a tax payment by receipt number
     """
-    payment = db.query(TaxPaymentDB).filter(TaxPaymentDB.receipt_number == receipt_number).first()
-    
+    result = await db.execute(select(TaxPaymentDB).where(TaxPaymentDB.receipt_number == receipt_number))
+    payment = result.scalars().first()
+
     if not payment:
         raise HTTPException(status_code=404, detail="Tax payment not found")
-    
+
     return payment
 
+@router.get("/tax-payments/receipt/{receipt_number}/verify")
+async def verify_tax_payment(
+    receipt_number: str,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Check a receipt against its on-chain anchor.
+    `record_matches` is false if the stored payment changed after anchoring;
+    `proof_valid` checks the Merkle path up to the anchored root; `on_chain`
+    checks that the root is in the anchoring block. When that block is not
+    on the running chain (e.g. after a restart) it can't be checked, so
+    `on_chain` is null and `checked_against` is "anchor_record": only the
+    anchor recorded in the database was available.
+    """
+    payment = (await db.execute(
+        select(TaxPaymentDB).where(TaxPaymentDB.receipt_number == receipt_number)
+    )).scalars().first()
+    if not payment:
+        raise HTTPException(status_code=404, detail="Tax payment not found")
+
+    row = (await db.execute(
+        select(TaxPaymentProofDB, TaxAnchorDB)
+        .join(TaxAnchorDB, TaxAnchorDB.id == TaxPaymentProofDB.anchor_id)
+        .where(TaxPaymentProofDB.payment_id == payment.id)
+    )).first()
+    if not row:
+        return {"receipt_number": receipt_number, "anchored": False}
+    proof, anchor = row
+
+    leaf = payment_leaf(payment)
+    height = anchor.block_height
+    block = blockchain.chain[height] if height is not None and height < len(blockchain.chain) else None
+    if block is not None and block.current_hash == anchor.block_hash:
+        on_chain = any(
+            tx.get("transaction_id") == anchor.transaction_id and anchor.merkle_root in tx.get("extra_info", "")
+            for tx in block.transactions
+        )
+        checked_against = "running_chain"
+    else:
+        # The anchor row alone doesn't prove the block exists; don't claim it does
+        on_chain = None
+        checked_against = "anchor_record"
+    return {
+        "receipt_number": receipt_number,
+        "anchored": True,
+        "record_matches": leaf == proof.leaf_hash,
+        "proof_valid": verify_proof(leaf, json.loads(proof.proof), anchor.merkle_root),
+        "on_chain": on_chain,
+        "checked_against": checked_against,
+        "leaf_hash": leaf,
+        "leaf_index": proof.leaf_index,
+        "proof": json.loads(proof.proof),
+        "merkle_root": anchor.merkle_root,
+        "block_id": anchor.block_id,
+        "block_height": anchor.block_height,
+        "block_hash": anchor.block_hash,
+        "transaction_id": anchor.transaction_id,
+        "anchored_at": anchor.created_at
+    }
+
+@router.post("/tax-payments/anchor")
+async def anchor_tax_payments(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_finance_office)
+):
+    """
+    Anchor pending tax payments now instead of waiting for the background task (Finance Office only).
+    """
+    anchors = []
+    while (anchor := await anchor_pending_payments(db, blockchain)) is not None:
+        anchors.append({
+            "merkle_root": anchor.merkle_root,
+            "leaf_count": anchor.leaf_count,
+            "block_id": anchor.block_id,
+            "block_height": anchor.block_height,
+            "block_hash": anchor.block_hash,
+            "transaction_id": anchor.transaction_id
+        })
+    return {"anchors": anchors}
+
 @router.get("/tax-payments/{payment_id}", response_model=TaxPaymentResponse)
-def get_tax_payment(
+async def get_tax_payment(
     payment_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get a specific tax payment by ID
     """
-    payment = db.query(TaxPaymentDB).filter(TaxPaymentDB.id == payment_id).first()
-    
+    payment = await db.get(TaxPaymentDB, payment_id)
+
     if not payment:
         raise HTTPException(status_code=404, detail="Tax payment not found")
-    
+
     return payment
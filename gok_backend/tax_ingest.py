@@ -0,0 +1,159 @@
+# tax_ingest.py
+# Bulk ingestion of tax payment files (M-Pesa / card settlements), shared by the
+# POST /tax-payments/bulk endpoint and this CLI.
+#
+# Usage: python tax_ingest.py payments.csv [--format csv|jsonl] [--output results.csv] [--chunk-size 1000]
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from typing import IO, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from models import TaxPaymentDB
+from receipts import receipt_allocator
+from schemas import TaxPaymentCreate
+from tax_stats import record_tax_payments
+
+INGEST_CHUNK_SIZE = 1000
+RESULT_COLUMNS = ["line", "status", "receipt_number", "error"]
+
+def read_rows(source: IO[str], format: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, dict or parse error message) for each record in a text file."""
+    if format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            # Empty CSV cells mean "not given" for the optional fields
+            yield reader.line_num, {key: value for key, value in row.items() if key and value != ""}
+    else:
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"Invalid JSON: {e.msg}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Expected a JSON object"
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+class IngestResult:
+    """Writes one result row per input record and keeps running totals."""
+
+    def __init__(self, output: IO[str]):
+        self.writer = csv.writer(output)
+        self.writer.writerow(RESULT_COLUMNS)
+        self.created = 0
+        self.invalid = 0
+        self.failed = 0
+
+    def record(self, line: int, status: str, receipt_number: str = "", error: str = ""):
+        self.writer.writerow([line, status, receipt_number, error])
+        if status == "created":
+            self.created += 1
+        elif status == "invalid":
+            self.invalid += 1
+        else:
+            self.failed += 1
+
+    def summary(self) -> dict:
+        return {"created": self.created, "invalid": self.invalid, "failed": self.failed}
+
+async def _insert_chunk(session_factory, chunk: List[Tuple[int, object]], result: IngestResult):
+    """Insert the valid payments in `chunk`, then record results for every entry in line order.
+
+    `chunk` holds (line, TaxPaymentCreate) for valid rows and (line, error message) for invalid ones.
+    """
+    payments = [(line, entry) for line, entry in chunk if isinstance(entry, TaxPaymentCreate)]
+    created_at = datetime.utcnow()
+    # Reserve receipts before opening the write transaction
+    receipts = await receipt_allocator.allocate_many(created_at.year, len(payments))
+    rows = [
+        {
+            **payment.model_dump(),
+            "receipt_number": receipt_number,
+            "status": "completed",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        for (line, payment), receipt_number in zip(payments, receipts)
+    ]
+    failure = None
+    if rows:
+        try:
+            async with session_factory() as db:
+                await db.execute(insert(TaxPaymentDB), rows)  # executemany
+                await record_tax_payments(db, ((row["tax_type"], row["amount"], created_at) for row in rows))
+                await db.commit()
+        except Exception as e:
+            failure = f"Chunk not saved: {e}"
+
+    receipt_by_line = {line: receipt for (line, payment), receipt in zip(payments, receipts)}
+    for line, entry in chunk:
+        if isinstance(entry, str):
+            result.record(line, "invalid", error=entry)
+        elif failure:
+            result.record(line, "failed", error=failure)
+        else:
+            result.record(line, "created", receipt_by_line[line])
+
+async def ingest_payments(source: IO[str], format: str, output: IO[str], session_factory,
+                          chunk_size: int = INGEST_CHUNK_SIZE) -> dict:
+    """Validate and insert every record in `source`, writing per-row results as CSV to `output`.
+
+    Valid rows are inserted `chunk_size` at a time, each chunk in its own
+    transaction together with its revenue counter updates. A failing chunk
+    is reported row by row and does not stop the rest of the file.
+    """
+    result = IngestResult(output)
+    chunk: List[Tuple[int, object]] = []
+    for line, record in read_rows(source, format):
+        if isinstance(record, str):
+            chunk.append((line, record))
+        else:
+            try:
+                chunk.append((line, TaxPaymentCreate.model_validate(record)))
+            except ValidationError as e:
+                chunk.append((line, validation_message(e)))
+        if len(chunk) >= chunk_size:
+            await _insert_chunk(session_factory, chunk, result)
+            chunk = []
+    if chunk:
+        await _insert_chunk(session_factory, chunk, result)
+    return result.summary()
+
+def main():
+    from database import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk-load tax payments from a CSV or JSONL file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--output", help="per-row result CSV (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or ("jsonl" if args.path.endswith(".jsonl") else "csv")
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    try:
+        with open(args.path, newline="", encoding="utf-8-sig") as source:
+            summary = asyncio.run(ingest_payments(source, format, output, AsyncSessionLocal, args.chunk_size))
+    finally:
+        if args.output:
+            output.close()
+    print(f"{summary} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if summary["invalid"] or summary["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# tax_stats.py
+# Running tax revenue counters behind /tax-payments/stats/summary, and a CLI to
+# rebuild them from tax_payments or check them for drift.
+#
+# Usage: python tax_stats.py rebuild    # backfill / recompute all counters
+#        python tax_stats.py check      # exit non-zero if counters disagree with tax_payments
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import TaxPaymentDB, TaxRevenueByTypeDB, TaxRevenueDailyDB
+
+# Days of per-day counters summed for the "recent" figure
+RECENT_WINDOW_DAYS = 30
+
+def _increment(table, key: dict, amount: float, count: int = 1):
+    """INSERT ... ON CONFLICT DO UPDATE adding `count` payments totalling `amount` to a counter row."""
+    statement = insert(table).values(**key, payment_count=count, total_amount=amount)
+    return statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            "payment_count": table.c.payment_count + statement.excluded.payment_count,
+            "total_amount": table.c.total_amount + statement.excluded.total_amount,
+        }
+    )
+
+async def record_tax_payment(db: AsyncSession, tax_type: str, amount: float, created_at: datetime):
+    """Add a payment to the counters inside the caller's transaction.
+
+    Call before committing the TaxPaymentDB row so both land (or roll back) together.
+    """
+    await record_tax_payments(db, [(tax_type, amount, created_at)])
+
+async def record_tax_payments(db: AsyncSession, payments: Iterable[Tuple[str, float, datetime]]):
+    """Batch form of record_tax_payment: one upsert per tax type and per day touched."""
+    by_type = defaultdict(lambda: [0, 0.0])
+    by_day = defaultdict(lambda: [0, 0.0])
+    for tax_type, amount, created_at in payments:
+        for totals in (by_type[tax_type], by_day[created_at.date()]):
+            totals[0] += 1
+            totals[1] += amount
+    for tax_type, (count, amount) in by_type.items():
+        await db.execute(_increment(TaxRevenueByTypeDB.__table__, {"tax_type": tax_type}, amount, count))
+    for day, (count, amount) in by_day.items():
+        await db.execute(_increment(TaxRevenueDailyDB.__table__, {"day": day}, amount, count))
+
+async def read_tax_stats(db: AsyncSession, today: date = None) -> dict:
+    """Summary for the dashboard from the counter tables (no scan of tax_payments)."""
+    today = today or datetime.utcnow().date()
+    by_type = (await db.execute(
+        select(TaxRevenueByTypeDB).order_by(TaxRevenueByTypeDB.tax_type)
+    )).scalars().all()
+    recent_count = (await db.execute(
+        select(func.sum(TaxRevenueDailyDB.payment_count)).where(
+            TaxRevenueDailyDB.day > today - timedelta(days=RECENT_WINDOW_DAYS)
+        )
+    )).scalar() or 0
+
+    return {
+        "total_payments": sum(row.payment_count for row in by_type),
+        "total_revenue": float(sum(row.total_amount for row in by_type)),
+        "recent_payments_30days": recent_count,
+        "by_tax_type": [
+            {
+                "tax_type": row.tax_type,
+                "count": row.payment_count,
+                "total_amount": float(row.total_amount)
+            }
+            for row in by_type
+        ]
+    }
+
+def _recomputed(db: Session):
+    """Counter values recomputed from tax_payments: (by_type, by_day) dicts of (count, total)."""
+    by_type = {
+        tax_type: (count, total or 0.0)
+        for tax_type, count, total in db.execute(
+            select(TaxPaymentDB.tax_type, func.count(TaxPaymentDB.id), func.sum(TaxPaymentDB.amount))
+            .group_by(TaxPaymentDB.tax_type)
+        )
+    }
+    day = func.date(TaxPaymentDB.created_at)
+    by_day = {
+        date.fromisoformat(value): (count, total or 0.0)
+        for value, count, total in db.execute(
+            select(day, func.count(TaxPaymentDB.id), func.sum(TaxPaymentDB.amount))
+            .where(TaxPaymentDB.created_at.isnot(None))
+            .group_by(day)
+        )
+    }
+    return by_type, by_day
+
+def rebuild(db: Session):
+    """Replace both counter tables with values recomputed from tax_payments."""
+    by_type, by_day = _recomputed(db)
+    db.query(TaxRevenueByTypeDB).delete()
+    db.query(TaxRevenueDailyDB).delete()
+    db.add_all(
+        TaxRevenueByTypeDB(tax_type=tax_type, payment_count=count, total_amount=total)
+        for tax_type, (count, total) in by_type.items()
+    )
+    db.add_all(
+        TaxRevenueDailyDB(day=day, payment_count=count, total_amount=total)
+        for day, (count, total) in by_day.items()
+    )
+    db.commit()
+    return len(by_type), len(by_day)
+
+def check(db: Session, tolerance: float = 0.01):
+    """Compare counters with tax_payments. Returns a list of human-readable mismatches."""
+    by_type, by_day = _recomputed(db)
+    stored_type = {
+        row.tax_type: (row.payment_count, row.total_amount) for row in db.query(TaxRevenueByTypeDB)
+    }
+    stored_day = {
+        row.day: (row.payment_count, row.total_amount) for row in db.query(TaxRevenueDailyDB)
+    }
+
+    mismatches = []
+    for label, expected, stored in (("tax_type", by_type, stored_type), ("day", by_day, stored_day)):
+        for key in sorted(set(expected) | set(stored), key=str):
+            want_count, want_total = expected.get(key, (0, 0.0))
+            have_count, have_total = stored.get(key, (0, 0.0))
+            if want_count != have_count or abs(want_total - have_total) > tolerance:
+                mismatches.append(
+                    f"{label}={key}: counters have {have_count} / {have_total:.2f}, "
+                    f"tax_payments has {want_count} / {want_total:.2f}"
+                )
+    return mismatches
+
+def main():
+    from database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Rebuild or check the tax revenue counters")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+
+    TaxRevenueByTypeDB.__table__.create(bind=engine, checkfirst=True)
+    TaxRevenueDailyDB.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            types, days = rebuild(db)
+            print(f"Rebuilt counters for {types} tax types over {days} days")
+        else:
+            mismatches = check(db)
+            for line in mismatches:
+                print(line)
+            if mismatches:
+                sys.exit(1)
+            print("Tax revenue counters match tax_payments")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
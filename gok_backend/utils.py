@@ -1,5 +1,36 @@
 # utils.py
 
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for a (timestamp, id) position."""
+    raw = f"{moment.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; a malformed cursor is a 400."""
+    try:
+        moment, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(moment), int(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_sequence_cursor(sequence: int) -> str:
+    """Opaque cursor for a position in a change sequence."""
+    return base64.urlsafe_b64encode(f"seq|{sequence}".encode("utf-8")).decode("ascii")
+
+def decode_sequence_cursor(cursor: str) -> int:
+    """Inverse of encode_sequence_cursor; a malformed cursor is a 400."""
+    try:
+        kind, sequence = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        if kind != "seq":
+            raise ValueError(kind)
+        return int(sequence)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 async def notify_user(wallet_address: str, message: str, active_connections: dict):
     """Send a notification to a specific user."""
     if wallet_address in active_connections:
@@ -35,6 +35,7 @@ def add_funds_to_national_wallet():
         auditor_remarks="Added funds to national wallet",
         smart_contract={}
     )
+    blockchain.flush_validators()
 
     print(f"Added {amount} to the national wallet.")
 
@@ -74,6 +75,7 @@ def send_funds(sender_wallet: str, recipient_wallet: str, amount: float):
             auditor_remarks=f"Sent funds from {sender_wallet} to {recipient_wallet}",
             smart_contract={}
         )
+        blockchain.flush_validators()
         print(f"Sent {amount} from {sender_wallet} to {recipient_wallet}.")
 
 def list_validators():